@@ -1,20 +1,31 @@
 import os
+import time
 
-from flask import Flask
-from flask_cors import CORS
+_IMPORT_START = time.perf_counter()
 
-from proxy.config import OPENAI_BASE_URL
-from proxy.logger import logger
-from proxy.routes import register_routes
+from flask import Flask  # noqa: E402
+from flask_cors import CORS  # noqa: E402
 
+from proxy.access_log import _configure_logging  # noqa: E402
+from proxy.config import get_config  # noqa: E402
+from proxy.drain import _serve  # noqa: E402
+from proxy.lifecycle import _check_import_budget, _start_warmup  # noqa: E402
+from proxy.logger import logger  # noqa: E402
+from proxy.reload import _install_reload_triggers  # noqa: E402
+from proxy.routes import register_routes  # noqa: E402
+
+_configure_logging()
 app = Flask(__name__)
 app.url_map.strict_slashes = False
 CORS(app)
 register_routes(app)
+_install_reload_triggers()
+_check_import_budget(_IMPORT_START)
+_start_warmup()
 
 
 if __name__ == "__main__":
     host = os.getenv("PROXY_HOST", "0.0.0.0")
     port = int(os.getenv("PROXY_PORT", "8000"))
-    logger.info("Starting proxy on %s:%s (upstream=%s)", host, port, OPENAI_BASE_URL)
-    app.run(host=host, port=port, threaded=True)
+    logger.info("Starting proxy on %s:%s (upstream=%s)", host, port, get_config().upstream[0])
+    _serve(app, host, port)
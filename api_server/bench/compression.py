@@ -0,0 +1,94 @@
+"""Size and CPU cost of response compression for each available encoding.
+
+Compresses a streamed chat completion (one SSE frame per chunk, flushed after
+every frame as the proxy sends it) and a large non-streaming tool-call
+response. Encodings whose optional package is missing are skipped.
+
+    python bench/compression.py --chunks 2000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+os.environ.setdefault("PROXY_WARMUP", "false")
+
+from proxy.compression import _STREAM_FACTORIES, _compress_body, _compress_frames, _level  # noqa: E402
+
+
+def _chat_frames(chunks):
+    frames = []
+    for index in range(chunks):
+        chunk = {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion.chunk",
+            "created": 1700000000,
+            "model": "gpt-bench",
+            "choices": [{"index": 0, "delta": {"content": f"token{index % 97} "}, "finish_reason": None}],
+        }
+        frames.append(f"data: {json.dumps(chunk)}\n\n")
+    frames.append("data: [DONE]\n\n")
+    return frames
+
+
+def _tool_call_body(size_kb):
+    line = "def handler_%d(request):\n    return respond(request, status=200)\n\n"
+    content = "".join(line % index for index in range(size_kb * 1024 // len(line) + 1))[: size_kb * 1024]
+    arguments = json.dumps({"path": "src/handlers.py", "content": content})
+    completion = {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion",
+        "created": 1700000000,
+        "model": "gpt-bench",
+        "choices": [
+            {
+                "index": 0,
+                "message": {
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": [
+                        {"id": "call_1", "type": "function", "function": {"name": "write_file", "arguments": arguments}}
+                    ],
+                },
+                "finish_reason": "tool_calls",
+            }
+        ],
+    }
+    return json.dumps(completion).encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--body-kb", type=int, default=80)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    frames = _chat_frames(args.chunks)
+    body = _tool_call_body(args.body_kb)
+    frames_in = sum(len(frame) for frame in frames)
+    print(f"stream: {len(frames)} frames, {frames_in / 1024:.0f} KB; body: {len(body) / 1024:.0f} KB")
+    for encoding in _STREAM_FACTORIES:
+        frame_seconds = body_seconds = None
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            frames_out = sum(len(part) for part in _compress_frames(iter(frames), encoding))
+            elapsed = time.perf_counter() - start
+            frame_seconds = elapsed if frame_seconds is None else min(frame_seconds, elapsed)
+            start = time.perf_counter()
+            body_out = len(_compress_body(body, encoding))
+            elapsed = time.perf_counter() - start
+            body_seconds = elapsed if body_seconds is None else min(body_seconds, elapsed)
+        print(
+            f"  {encoding:4s} level {_level(encoding)}: "
+            f"stream {frames_out / 1024:6.1f} KB ({frames_out / frames_in:5.1%}) {frame_seconds / len(frames) * 1e6:5.1f} us/frame; "
+            f"body {body_out / 1024:6.1f} KB ({body_out / len(body):5.1%}) {body_seconds * 1000:5.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Fail when importing the proxy app takes longer than its start-up budget.
+
+Imports ``app`` in fresh interpreters (warm-up disabled, so only import work
+is measured), keeps the fastest of ``--runs`` attempts and exits with status 1
+when it exceeds ``--budget-ms`` (default ``PROXY_IMPORT_BUDGET_MS`` or 1000) or
+when the OpenAI SDK, whose import is deferred to warm-up, was imported.
+``--profile`` prints the slowest modules from ``python -X importtime``.
+
+    python bench/import_budget.py --runs 5 --budget-ms 800
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+print(json.dumps({"ms": (time.perf_counter() - start) * 1000.0, "openai": "openai" in sys.modules}))
+"""
+
+
+def _measure(env):
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE], cwd=APP_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _slowest_modules(env, count):
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"], cwd=APP_DIR, env=env, capture_output=True, text=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("PROXY_IMPORT_BUDGET_MS", "1000")))
+    parser.add_argument("--profile", action="store_true")
+    args = parser.parse_args()
+
+    env = dict(os.environ, PROXY_WARMUP="false")
+    results = [_measure(env) for _ in range(max(args.runs, 1))]
+    best = min(result["ms"] for result in results)
+    print(f"import app: best {best:.1f} ms of {len(results)} runs (budget {args.budget_ms:.0f} ms)")
+    if args.profile:
+        for cumulative_us, self_us, name in _slowest_modules(env, 15):
+            print(f"  {cumulative_us / 1000.0:8.1f} ms  {self_us / 1000.0:7.1f} ms self  {name}")
+    failures = []
+    if best > args.budget_ms:
+        failures.append(f"import took {best:.1f} ms, over the {args.budget_ms:.0f} ms budget")
+    if any(result["openai"] for result in results):
+        failures.append("the openai SDK is imported at start-up; it should load during warm-up")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
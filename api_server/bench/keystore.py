@@ -0,0 +1,107 @@
+"""Load, lookup and reload cost of a large key store.
+
+Writes N keys (by SHA-256, with a name and a rate limit) to a JSON file and
+to a SQLite database, then times loading each, looking keys up (a repeated
+hot key, every valid key in turn, and invalid keys) and reloading the store
+the way a changed file is picked up.
+
+    python bench/keystore.py --keys 100000
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+os.environ.setdefault("PROXY_WARMUP", "false")
+
+from proxy import keystore  # noqa: E402
+from proxy.keystore import _key_digest  # noqa: E402
+
+
+def _tokens(count):
+    return [f"sk-bench-{index:08d}" for index in range(count)]
+
+
+def _entries(tokens):
+    return [
+        {"key_sha256": _key_digest(token), "name": f"team-{index % 500}", "limits": {"requests_per_minute": 600}}
+        for index, token in enumerate(tokens)
+    ]
+
+
+def _write_json(path, entries):
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump({"keys": entries}, handle)
+
+
+def _write_sqlite(path, entries):
+    connection = sqlite3.connect(path)
+    try:
+        connection.execute("CREATE TABLE api_keys (key_sha256 TEXT PRIMARY KEY, name TEXT, limits TEXT)")
+        connection.executemany(
+            "INSERT INTO api_keys VALUES (?, ?, ?)",
+            [(entry["key_sha256"], entry["name"], json.dumps(entry["limits"])) for entry in entries],
+        )
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def _best(repeat, function):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _lookup_us(store, tokens):
+    start = time.perf_counter()
+    for token in tokens:
+        store.lookup(token)
+    return (time.perf_counter() - start) / len(tokens) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    tokens = _tokens(args.keys)
+    entries = _entries(tokens)
+    with tempfile.TemporaryDirectory() as directory:
+        for name, write in (("keys.json", _write_json), ("keys.sqlite", _write_sqlite)):
+            path = os.path.join(directory, name)
+            write(path, entries)
+            keystore.KEYSTORE_PATH = path
+            load_seconds, store = _best(args.repeat, keystore._build_keystore)
+            assert len(store) == args.keys
+            reload_seconds, _ = _best(args.repeat, keystore._reload_keystore)
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            print(
+                f"{name:11s} {size_mb:5.1f} MB: load {load_seconds * 1000:7.1f} ms, "
+                f"reload {reload_seconds * 1000:7.1f} ms"
+            )
+
+        store = keystore._STORE
+        hot = [tokens[0]] * args.lookups
+        valid = [tokens[index % len(tokens)] for index in range(args.lookups)]
+        invalid = [f"sk-wrong-{index:08d}" for index in range(args.lookups)]
+        print(f"lookup ({args.lookups} per case, cache {keystore.AUTH_CACHE_SIZE}):")
+        print(f"  hot key      {_lookup_us(store, hot):5.2f} us")
+        print(f"  every key    {_lookup_us(store, valid):5.2f} us")
+        print(f"  invalid key  {_lookup_us(store, invalid):5.2f} us")
+
+
+if __name__ == "__main__":
+    main()
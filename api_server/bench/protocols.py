@@ -0,0 +1,169 @@
+"""Proxy CPU per request for translated versus passthrough chat completions.
+
+Sends the same conversation through the proxy to a model served over the
+Responses API (translated to and from chat completions) and to one declared
+chat-native with ``PROXY_MODEL_PROTOCOLS`` (forwarded as is), streaming and
+non-streaming. The upstream is an in-process ``httpx.MockTransport``, so the
+figures are the proxy's and the SDK's own CPU time.
+
+    python bench/protocols.py --requests 300
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+os.environ.setdefault("PROXY_WARMUP", "false")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+os.environ["PROXY_MODEL_PROTOCOLS"] = json.dumps({"local-*": "chat"})
+
+import httpx  # noqa: E402
+from openai import OpenAI  # noqa: E402
+
+from app import app  # noqa: E402
+from proxy import client as proxy_client  # noqa: E402
+from proxy.config import get_config  # noqa: E402
+
+WORDS = [f"token{index} " for index in range(200)]
+TEXT = "".join(WORDS)
+USAGE = {
+    "input_tokens": 400,
+    "output_tokens": len(WORDS),
+    "total_tokens": 400 + len(WORDS),
+    "input_tokens_details": {"cached_tokens": 0},
+    "output_tokens_details": {"reasoning_tokens": 0},
+}
+RESPONSE = {
+    "id": "resp_bench",
+    "object": "response",
+    "created_at": 1700000000,
+    "model": "gpt-bench",
+    "status": "completed",
+    "output": [
+        {
+            "type": "message",
+            "id": "msg_bench",
+            "role": "assistant",
+            "status": "completed",
+            "content": [{"type": "output_text", "text": TEXT, "annotations": []}],
+        }
+    ],
+    "usage": USAGE,
+    "parallel_tool_calls": True,
+    "tool_choice": "auto",
+    "tools": [],
+}
+COMPLETION = {
+    "id": "chatcmpl-bench",
+    "object": "chat.completion",
+    "created": 1700000000,
+    "model": "local-bench",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": TEXT}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 400, "completion_tokens": len(WORDS), "total_tokens": 400 + len(WORDS)},
+}
+
+
+def _sse(events, done=False):
+    body = "".join(f"data: {json.dumps(event)}\n\n" for event in events)
+    return (body + ("data: [DONE]\n\n" if done else "")).encode("utf-8")
+
+
+RESPONSE_STREAM = _sse(
+    [{"type": "response.created", "sequence_number": 0, "response": dict(RESPONSE, status="in_progress", output=[])}]
+    + [
+        {
+            "type": "response.output_text.delta",
+            "sequence_number": index + 1,
+            "item_id": "msg_bench",
+            "output_index": 0,
+            "content_index": 0,
+            "delta": word,
+            "logprobs": [],
+        }
+        for index, word in enumerate(WORDS)
+    ]
+    + [{"type": "response.completed", "sequence_number": len(WORDS) + 1, "response": RESPONSE}]
+)
+COMPLETION_STREAM = _sse(
+    [
+        {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion.chunk",
+            "created": 1700000000,
+            "model": "local-bench",
+            "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}],
+        }
+        for word in WORDS
+    ],
+    done=True,
+)
+
+
+def _upstream(request):
+    stream = json.loads(request.content).get("stream")
+    if request.url.path.endswith("/responses"):
+        if stream:
+            return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=RESPONSE_STREAM)
+        return httpx.Response(200, json=RESPONSE)
+    if stream:
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=COMPLETION_STREAM)
+    return httpx.Response(200, json=COMPLETION)
+
+
+def _install_upstream():
+    config = get_config()
+    proxy_client._CLIENT_UPSTREAM = config.upstream
+    proxy_client.CLIENT_CACHE[config.openai_api_key] = OpenAI(
+        api_key=config.openai_api_key,
+        base_url="http://upstream.invalid/v1",
+        max_retries=0,
+        http_client=httpx.Client(transport=httpx.MockTransport(_upstream)),
+    )
+
+
+def _messages():
+    messages = []
+    for turn in range(10):
+        messages.append({"role": "user", "content": f"question {turn} " * 20})
+        messages.append({"role": "assistant", "content": f"answer {turn} " * 20})
+    messages.append({"role": "user", "content": "Summarise the conversation."})
+    return messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--warmup", type=int, default=30)
+    args = parser.parse_args()
+
+    for name in ("openai-proxy", httpx.__name__):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    _install_upstream()
+    test_client = app.test_client()
+    messages = _messages()
+
+    def post(model, stream):
+        response = test_client.post("/v1/chat/completions", json={"model": model, "stream": stream, "messages": messages})
+        body = response.get_data()
+        if response.status_code != 200:
+            raise SystemExit(f"{model} stream={stream}: HTTP {response.status_code} {body[:200]!r}")
+
+    print(f"CPU per request over {args.requests} requests")
+    for stream in (False, True):
+        for model, label in (("gpt-bench", "translated"), ("local-bench", "passthrough")):
+            for _ in range(args.warmup):
+                post(model, stream)
+            start = time.process_time()
+            for _ in range(args.requests):
+                post(model, stream)
+            elapsed = time.process_time() - start
+            print(f"  {'stream' if stream else 'json':6s} {label:12s} {elapsed / args.requests * 1000:7.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Memory held by in-flight translated chat streams.
+
+Opens ``--streams`` Responses-to-chat translations and leaves each paused
+mid-stream with one finished tool call and one half-streamed call, the state
+a busy proxy holds between upstream events. Reports the growth in resident
+set size (RSS) per 1,000 streams, then repeats the run under tracemalloc to
+attribute the Python allocations.
+
+    python bench/stream_memory.py --streams 1000
+"""
+
+import argparse
+import gc
+import os
+import resource
+import sys
+import tracemalloc
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+os.environ.setdefault("PROXY_WARMUP", "false")
+
+from proxy.streaming import _stream_chat_sse  # noqa: E402
+
+ARGUMENTS = '{"path": "notes.txt", "content": "' + "x" * 4000 + '"}'
+
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Peak rather than current RSS, which is still an upper bound here; KiB on Linux, bytes on macOS.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _call_events(output_index, call_id, deltas=None):
+    events = [
+        {
+            "type": "response.output_item.added",
+            "output_index": output_index,
+            "item": {"type": "function_call", "call_id": call_id, "name": "write_file", "arguments": ""},
+        }
+    ]
+    chunks = [ARGUMENTS[offset:offset + 100] for offset in range(0, len(ARGUMENTS), 100)]
+    for chunk in chunks[:deltas]:
+        events.append({"type": "response.function_call_arguments.delta", "output_index": output_index, "delta": chunk})
+    if deltas is None:
+        events.append(
+            {"type": "response.function_call_arguments.done", "output_index": output_index, "arguments": ARGUMENTS}
+        )
+    return events
+
+
+def _events():
+    events = [{"type": "response.created", "response": {"id": "resp_bench", "model": "gpt-bench", "created_at": 1}}]
+    events.append({"type": "response.output_text.delta", "delta": "Writing the file. "})
+    return events + _call_events(1, "call_done") + _call_events(2, "call_open", deltas=20)
+
+
+def _upstream(events):
+    # Each upstream event is a fresh object, as when parsed off the wire, so retained deltas count against the stream.
+    for event in events:
+        event = dict(event)
+        if "delta" in event:
+            event["delta"] = (event["delta"] + " ")[:-1]
+        yield event
+
+
+def _open_streams(count, events):
+    streams = []
+    for _ in range(count):
+        stream = _stream_chat_sse(_upstream(events))
+        for _ in range(len(events) - 1):
+            next(stream)
+        streams.append(stream)
+    return streams
+
+
+def _close(streams):
+    for stream in streams:
+        stream.close()
+    streams.clear()
+    gc.collect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--streams", type=int, default=1000)
+    args = parser.parse_args()
+
+    events = _events()
+    per_thousand = 1000.0 / args.streams / (1024 * 1024)
+    # Warm the allocator and the module caches so the baseline excludes one-off growth.
+    _close(_open_streams(min(args.streams, 50), events))
+
+    rss_before = _rss_bytes()
+    streams = _open_streams(args.streams, events)
+    gc.collect()
+    rss = _rss_bytes() - rss_before
+    _close(streams)
+
+    tracemalloc.start()
+    traced_before = tracemalloc.get_traced_memory()[0]
+    streams = _open_streams(args.streams, events)
+    gc.collect()
+    traced = tracemalloc.get_traced_memory()[0] - traced_before
+    tracemalloc.stop()
+    _close(streams)
+
+    print(f"{args.streams} in-flight streams")
+    print(f"  RSS         {rss * per_thousand:7.2f} MiB per 1,000 streams")
+    print(f"  tracemalloc {traced * per_thousand:7.2f} MiB per 1,000 streams")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Cost of collecting and validating streamed tool-call arguments.
+
+Streams one large file-writing argument document in small deltas and times
+plain string concatenation against :class:`ToolArgumentAccumulator` with and
+without incremental schema validation. Best of ``--repeat`` runs.
+
+    python bench/tool_args.py --size-kb 144 --delta 20
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+os.environ.setdefault("PROXY_WARMUP", "false")
+
+from proxy.tool_args import ToolArgumentAccumulator  # noqa: E402
+
+SCHEMA = {
+    "type": "object",
+    "properties": {"path": {"type": "string"}, "content": {"type": "string"}},
+    "required": ["path", "content"],
+    "additionalProperties": False,
+}
+
+
+def _deltas(size_kb, delta):
+    line = "    print('line %d of a generated file')\n"
+    content = "".join(line % index for index in range(size_kb * 1024 // len(line) + 1))[: size_kb * 1024]
+    document = json.dumps({"path": "src/generated.py", "content": content})
+    return document, [document[offset:offset + delta] for offset in range(0, len(document), delta)]
+
+
+def _concatenate(deltas):
+    text = ""
+    for delta in deltas:
+        text += delta
+    json.loads(text)
+
+
+def _accumulate(deltas, validate):
+    accumulator = ToolArgumentAccumulator(SCHEMA, validate=validate)
+    for delta in deltas:
+        accumulator.append(delta)
+    accumulator.finish()
+
+
+def _best_ms(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = (time.perf_counter() - start) * 1000.0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-kb", type=int, default=144)
+    parser.add_argument("--delta", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    document, deltas = _deltas(args.size_kb, args.delta)
+    print(f"{len(document) / 1024:.0f} KB of arguments in {len(deltas)} deltas of {args.delta} chars")
+    cases = [
+        ("string concatenation", lambda: _concatenate(deltas)),
+        ("accumulator", lambda: _accumulate(deltas, validate=False)),
+        ("accumulator + validation", lambda: _accumulate(deltas, validate=True)),
+    ]
+    for label, function in cases:
+        print(f"  {label:26s} {_best_ms(function, args.repeat):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
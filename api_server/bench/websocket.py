@@ -0,0 +1,134 @@
+"""Requests per second and proxy CPU for streamed completions over HTTP and over one WebSocket.
+
+Runs the proxy in a child process on a local port, with the same in-process
+mock upstream as ``bench/protocols.py``, and sends the same streamed chat
+completion ``--requests`` times with ``--concurrency`` in flight: over HTTP
+with a new connection per request, then multiplexed over a single ``/v1/ws``
+connection. Proxy CPU is the child's process time (which includes the mock
+upstream, the same for both paths), so the client's cost is not counted in
+it. ``--model local-bench`` uses the chat-native model, whose cheaper
+per-event work leaves more of the transport cost visible.
+
+    python bench/websocket.py --requests 1600 --concurrency 16
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+os.environ.setdefault("PROXY_WARMUP", "false")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+import simple_websocket  # noqa: E402
+
+from protocols import _install_upstream, _messages  # noqa: E402
+
+
+def _serve(conn):
+    import httpx
+    from werkzeug.serving import make_server
+
+    from app import app
+
+    for name in ("openai-proxy", "werkzeug", httpx.__name__):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    _install_upstream()
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    conn.send(server.server_port)
+    while conn.recv() is not None:
+        conn.send(time.process_time())
+
+
+def _http_run(port, body, requests, concurrency):
+    headers = {"Content-Type": "application/json", "Authorization": "Bearer sk-bench"}
+    payload = json.dumps(body)
+    remaining = [requests]
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            connection = http.client.HTTPConnection("127.0.0.1", port)
+            try:
+                connection.request("POST", "/v1/chat/completions", payload, headers)
+                response = connection.getresponse()
+                data = response.read()
+            finally:
+                connection.close()
+            if response.status != 200 or b"[DONE]" not in data:
+                raise SystemExit(f"HTTP {response.status}: {data[:200]!r}")
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def _ws_run(port, body, requests, concurrency):
+    ws = simple_websocket.Client(f"ws://127.0.0.1:{port}/v1/ws", headers={"Authorization": "Bearer sk-bench"})
+    try:
+        sent = done = 0
+        while done < requests:
+            while sent < requests and sent - done < concurrency:
+                ws.send(json.dumps({"type": "request", "id": str(sent), "body": body}))
+                sent += 1
+            message = json.loads(ws.receive(timeout=30))
+            if message.get("type") == "error":
+                raise SystemExit(f"WebSocket error: {message}")
+            if message.get("type") == "done":
+                done += 1
+    finally:
+        ws.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1600)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--model", default="gpt-bench")
+    args = parser.parse_args()
+
+    conn, child_conn = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=_serve, args=(child_conn,), daemon=True)
+    server.start()
+    port = conn.recv()
+    body = {"model": args.model, "stream": True, "messages": _messages()}
+
+    def proxy_cpu():
+        conn.send("cpu")
+        return conn.recv()
+
+    print(f"{args.requests} streamed requests to {args.model}, {args.concurrency} in flight")
+    try:
+        for label, run in (("HTTP, connection per request", _http_run), ("one WebSocket", _ws_run)):
+            run(port, body, args.warmup, args.concurrency)
+            cpu = proxy_cpu()
+            start = time.perf_counter()
+            run(port, body, args.requests, args.concurrency)
+            elapsed = time.perf_counter() - start
+            cpu = proxy_cpu() - cpu
+            print(
+                f"  {label:29s} {args.requests / elapsed:7.1f} req/s, "
+                f"proxy CPU {cpu / args.requests * 1000:6.3f} ms/request"
+            )
+    finally:
+        conn.send(None)
+        server.join(5)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import atexit
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+
+from flask import g, request
+
+from .config import (
+    ACCESS_LOG_BACKUPS,
+    ACCESS_LOG_MAX_BYTES,
+    ACCESS_LOG_PATH,
+    LOG_ASYNC,
+    LOG_QUEUE_SIZE,
+)
+from .logger import logger
+from .metrics import _incr
+from .timing import _export_timing
+
+access_logger = logging.getLogger("openai-proxy.access")
+
+_CONFIGURE_LOCK = threading.Lock()
+_CONFIGURED = False
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the writer falls behind."""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _incr("log.dropped")
+
+
+def _start_listener(handlers):
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return _DroppingQueueHandler(log_queue)
+
+
+def _configure_logging():
+    """Move log formatting and I/O to background writer threads and set up the access log file.
+
+    Safe to call more than once; only the first call changes handlers.
+    """
+    global _CONFIGURED
+    with _CONFIGURE_LOCK:
+        if _CONFIGURED:
+            return
+        _CONFIGURED = True
+    root = logging.getLogger()
+    if LOG_ASYNC and root.handlers:
+        handlers = list(root.handlers)
+        for handler in handlers:
+            root.removeHandler(handler)
+        root.addHandler(_start_listener(handlers))
+    if ACCESS_LOG_PATH:
+        file_handler = logging.handlers.RotatingFileHandler(
+            ACCESS_LOG_PATH,
+            maxBytes=ACCESS_LOG_MAX_BYTES,
+            backupCount=ACCESS_LOG_BACKUPS,
+            encoding="utf-8",
+        )
+        file_handler.setFormatter(logging.Formatter("%(message)s"))
+        access_logger.addHandler(_start_listener([file_handler]) if LOG_ASYNC else file_handler)
+        access_logger.setLevel(logging.INFO)
+        access_logger.propagate = False
+
+
+def _access_context():
+    """Snapshot request fields for the access record; streams finish after the request context is gone."""
+    return {
+        "request_id": g.get("request_id"),
+        "start_time": g.get("start_time") or time.time(),
+        "method": request.method,
+        "path": request.path,
+        "key_hash": g.get("key_hash"),
+        "model": g.get("model"),
+        "bytes_in": request.content_length,
+        "estimated_tokens": g.get("estimated_tokens"),
+        "timing": g.get("timing"),
+    }
+
+
+def _log_access(context, status, bytes_out=None, stream=False):
+    """Write the single access record for a finished request."""
+    end = time.time()
+    timing = context.get("timing")
+    record = {
+        "ts": datetime.datetime.fromtimestamp(end, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+        "request_id": context.get("request_id"),
+        "method": context.get("method"),
+        "path": context.get("path"),
+        "status": status,
+        "stream": stream,
+        "duration_ms": round((end - context["start_time"]) * 1000.0, 2),
+        "key_hash": context.get("key_hash"),
+        "model": context.get("model"),
+        "bytes_in": context.get("bytes_in"),
+        "bytes_out": bytes_out,
+        "estimated_tokens": context.get("estimated_tokens"),
+    }
+    if timing is not None:
+        record["timings"] = {name: round(duration, 2) for name, _, duration in timing.spans}
+        _export_timing(timing, record["method"], record["path"], status)
+    if access_logger.handlers:
+        access_logger.info(json.dumps(record, separators=(",", ":")))
+    else:
+        logger.info("request.complete %s", json.dumps(record, separators=(",", ":")))
@@ -1,38 +1,52 @@
-from openai import OpenAI
-
-from .config import (
-    OPENAI_API_KEY,
-    OPENAI_BASE_URL,
-    OPENAI_MAX_RETRIES,
-    OPENAI_ORGANIZATION,
-    OPENAI_PROJECT,
-    OPENAI_TIMEOUT,
-    PROXY_FORWARD_AUTH_HEADER,
-)
+from flask import g, has_app_context
+
+from .config import PROXY_FORWARD_AUTH_HEADER, UPSTREAM_COMPRESS_REQUESTS, get_config
 
 CLIENT_CACHE = {}
+_CLIENT_UPSTREAM = None
 
 
 def _get_client(api_key):
+    global _CLIENT_UPSTREAM
+    upstream = get_config().upstream
+    if upstream != _CLIENT_UPSTREAM:
+        # Reloaded upstream settings: build new clients; in-flight requests keep their old ones.
+        CLIENT_CACHE.clear()
+        _CLIENT_UPSTREAM = upstream
     client = CLIENT_CACHE.get(api_key)
     if client is None:
+        # Deferred: the SDK and its generated models dominate process start-up time.
+        from openai import OpenAI
+
+        http_client = None
+        if UPSTREAM_COMPRESS_REQUESTS:
+            from .http_transport import _compressing_http_client
+
+            http_client = _compressing_http_client()
+        base_url, timeout, _, organization, project = upstream
         client = OpenAI(
             api_key=api_key,
-            base_url=OPENAI_BASE_URL,
-            timeout=OPENAI_TIMEOUT,
-            max_retries=OPENAI_MAX_RETRIES,
-            organization=OPENAI_ORGANIZATION,
-            project=OPENAI_PROJECT,
+            base_url=base_url,
+            timeout=timeout,
+            # Retries are made by upstream._with_retries, under the deadline and retry budget.
+            max_retries=0,
+            organization=organization,
+            project=project,
+            http_client=http_client,
         )
         CLIENT_CACHE[api_key] = client
     return client
 
 
 def _resolve_upstream_key(incoming_token):
+    policy = g.get("key_policy") if has_app_context() else None
+    if policy is not None and policy.upstream_key:
+        return policy.upstream_key
     if PROXY_FORWARD_AUTH_HEADER:
         if not incoming_token:
             raise ValueError("Missing Authorization header for upstream forwarding.")
         return incoming_token
-    if OPENAI_API_KEY:
-        return OPENAI_API_KEY
+    api_key = get_config().openai_api_key
+    if api_key:
+        return api_key
     raise ValueError("OPENAI_API_KEY is not set.")
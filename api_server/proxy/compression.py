@@ -0,0 +1,260 @@
+import io
+import zlib
+
+from werkzeug.wsgi import get_input_stream
+
+from .config import (
+    COMPRESSION_ENABLED,
+    COMPRESSION_ENCODINGS,
+    COMPRESSION_LEVEL,
+    COMPRESSION_MIN_BYTES,
+    COMPRESSION_STREAMS,
+    MAX_DECOMPRESSED_BYTES,
+)
+from .logger import logger
+from .metrics import _incr
+
+try:  # Optional: pip install zstandard
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+try:  # Optional: pip install brotli
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+_COMPRESSIBLE_MIMETYPES = {"application/json"}
+_STREAM_MIMETYPES = {"text/event-stream", "application/x-ndjson"}
+_DEFAULT_LEVELS = {"gzip": 6, "zstd": 3, "br": 4}
+_READ_CHUNK = 64 * 1024
+
+
+class RequestBodyError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class _GzipStream:
+    def __init__(self, level):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush(zlib.Z_FINISH)
+
+
+class _ZstdStream:
+    def __init__(self, level):
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self.compressor.compress(data) + self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+class _BrotliStream:
+    def __init__(self, level):
+        self.compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self.compressor.process(data) + self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+_STREAM_FACTORIES = {"gzip": _GzipStream}
+if zstandard is not None:
+    _STREAM_FACTORIES["zstd"] = _ZstdStream
+if brotli is not None:
+    _STREAM_FACTORIES["br"] = _BrotliStream
+
+_SERVER_ENCODINGS = [name for name in COMPRESSION_ENCODINGS if name in _STREAM_FACTORIES]
+if COMPRESSION_ENABLED and len(_SERVER_ENCODINGS) < len(COMPRESSION_ENCODINGS):
+    logger.info(
+        "Response compression using %s (missing optional packages for the rest of %s).",
+        _SERVER_ENCODINGS,
+        COMPRESSION_ENCODINGS,
+    )
+
+
+def _level(encoding):
+    return COMPRESSION_LEVEL if COMPRESSION_LEVEL is not None else _DEFAULT_LEVELS[encoding]
+
+
+def _parse_accept_encoding(header):
+    preferences = {}
+    for part in (header or "").split(","):
+        token, _, params = part.partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        preferences[token] = quality
+    return preferences
+
+
+def _negotiate_encoding(header):
+    preferences = _parse_accept_encoding(header)
+    best = None
+    best_quality = 0.0
+    for encoding in _SERVER_ENCODINGS:
+        quality = preferences.get(encoding, preferences.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def _compress_body(data, encoding):
+    stream = _STREAM_FACTORIES[encoding](_level(encoding))
+    return stream.compress(data) + stream.finish()
+
+
+def _compress_frames(frames, encoding):
+    """Compress an SSE/NDJSON body, flushing after every frame so no event is held back."""
+    stream = _STREAM_FACTORIES[encoding](_level(encoding))
+    bytes_in = 0
+    bytes_out = 0
+    try:
+        for frame in frames:
+            data = frame.encode("utf-8") if isinstance(frame, str) else frame
+            if not data:
+                continue
+            compressed = stream.compress(data)
+            bytes_in += len(data)
+            bytes_out += len(compressed)
+            yield compressed
+        tail = stream.finish()
+        bytes_out += len(tail)
+        yield tail
+    finally:
+        close = getattr(frames, "close", None)
+        if close is not None:
+            close()
+        _incr("compression.bytes_in", bytes_in)
+        _incr("compression.bytes_out", bytes_out)
+
+
+def _compress_response(response, accept_encoding):
+    """Apply negotiated Content-Encoding to a JSON or streaming response in place."""
+    if not COMPRESSION_ENABLED or not _SERVER_ENCODINGS:
+        return response
+    if response.direct_passthrough or "Content-Encoding" in response.headers:
+        return response
+    if response.status_code < 200 or response.status_code in {204, 304}:
+        return response
+    streamed = response.is_streamed
+    if streamed:
+        if not COMPRESSION_STREAMS or response.mimetype not in _STREAM_MIMETYPES:
+            return response
+    elif response.mimetype not in _COMPRESSIBLE_MIMETYPES:
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = _negotiate_encoding(accept_encoding)
+    if encoding is None:
+        return response
+    if streamed:
+        response.response = _compress_frames(response.response, encoding)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESSION_MIN_BYTES:
+            return response
+        compressed = _compress_body(data, encoding)
+        _incr("compression.bytes_in", len(data))
+        _incr("compression.bytes_out", len(compressed))
+        response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    _incr(f"compression.responses.{encoding}")
+    return response
+
+
+class _InflateReader:
+    """File-like view of a deflate/gzip stream that never inflates more than ``size`` bytes per read."""
+
+    def __init__(self, stream, wbits):
+        self.stream = stream
+        self.decompressor = zlib.decompressobj(wbits)
+
+    def read(self, size):
+        while True:
+            data = self.decompressor.unconsumed_tail
+            if not data:
+                data = self.stream.read(_READ_CHUNK)
+                if not data:
+                    return self.decompressor.flush()
+            output = self.decompressor.decompress(data, size)
+            if output:
+                return output
+
+
+_REQUEST_DECODERS = {
+    "gzip": lambda stream: _InflateReader(stream, 31),
+    "x-gzip": lambda stream: _InflateReader(stream, 31),
+    "deflate": lambda stream: _InflateReader(stream, 15),
+}
+if zstandard is not None:
+    _REQUEST_DECODERS["zstd"] = lambda stream: zstandard.ZstdDecompressor().stream_reader(stream)
+
+
+def _read_decompressed(reader):
+    parts = []
+    total = 0
+    while True:
+        chunk = reader.read(_READ_CHUNK)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > MAX_DECOMPRESSED_BYTES:
+            raise RequestBodyError(
+                f"Decompressed request body exceeds {MAX_DECOMPRESSED_BYTES} bytes.",
+                status=413,
+            )
+        parts.append(chunk)
+    return b"".join(parts)
+
+
+def _decompress_request_body(environ):
+    """Swap a compressed WSGI input for its decoded bytes before Flask parses the body."""
+    encoding = environ.get("HTTP_CONTENT_ENCODING", "").strip().lower()
+    if not encoding or encoding == "identity":
+        return
+    decoder = _REQUEST_DECODERS.get(encoding)
+    if decoder is None:
+        raise RequestBodyError(f"Unsupported Content-Encoding: {encoding}.", status=415)
+    counted = _CountingStream(get_input_stream(environ))
+    try:
+        data = _read_decompressed(decoder(counted))
+    except RequestBodyError:
+        raise
+    except Exception as exc:  # zlib.error, zstandard.ZstdError
+        raise RequestBodyError(f"Could not decode {encoding} request body: {exc}.")
+    environ["wsgi.input"] = io.BytesIO(data)
+    environ["CONTENT_LENGTH"] = str(len(data))
+    environ.pop("HTTP_CONTENT_ENCODING", None)
+    _incr("request_decompression.bytes_in", counted.bytes_read)
+    _incr("request_decompression.bytes_out", len(data))
+
+
+class _CountingStream:
+    def __init__(self, stream):
+        self.stream = stream
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.bytes_read += len(data)
+        return data
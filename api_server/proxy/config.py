@@ -1,5 +1,7 @@
 import json
 import os
+import threading
+import time
 
 from .logger import logger
 
@@ -32,15 +34,15 @@ def _load_dotenv():
         logger.warning("Failed to load .env file %s: %s", dotenv_path, exc)
 
 
-def _bool_env(name, default=False):
-    value = os.getenv(name)
+def _bool_env(name, default=False, env=None):
+    value = (os.environ if env is None else env).get(name)
     if value is None:
         return default
     return value.strip().lower() in {"1", "true", "yes", "y", "on"}
 
 
-def _json_env(name, default):
-    raw = os.getenv(name)
+def _json_env(name, default, env=None):
+    raw = (os.environ if env is None else env).get(name)
     if not raw:
         return default
     try:
@@ -50,6 +52,22 @@ def _json_env(name, default):
         return default
 
 
+def _int_env(name, default, env=None):
+    try:
+        return int((os.environ if env is None else env).get(name, str(default)))
+    except ValueError:
+        logger.warning("Invalid integer in %s, using default.", name)
+        return default
+
+
+def _float_env(name, default, env=None):
+    try:
+        return float((os.environ if env is None else env).get(name, str(default)))
+    except ValueError:
+        logger.warning("Invalid number in %s, using default.", name)
+        return default
+
+
 def _normalize_base_url(base_url):
     trimmed = base_url.rstrip("/")
     if not trimmed.endswith("/v1"):
@@ -57,51 +75,179 @@ def _normalize_base_url(base_url):
     return trimmed
 
 
+def _read_config_file(path):
+    """Read a JSON object of ``ENV_NAME: value`` settings; structured values are re-encoded as JSON."""
+    with open(path, "r", encoding="utf-8") as handle:
+        data = json.load(handle)
+    if not isinstance(data, dict):
+        raise ValueError("config file must contain a JSON object")
+    values = {}
+    for name, value in data.items():
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value)
+        elif isinstance(value, bool):
+            value = "true" if value else "false"
+        elif value is None:
+            continue
+        values[str(name)] = str(value)
+    return values
+
+
 _load_dotenv()
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_BASE_URL = _normalize_base_url(
-    os.getenv("OPENAI_BASE_URL", "https://api.openai.com")
-)
-OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "120"))
-OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
-OPENAI_ORGANIZATION = os.getenv("OPENAI_ORGANIZATION")
-OPENAI_PROJECT = os.getenv("OPENAI_PROJECT")
+CONFIG_FILE = os.getenv("PROXY_CONFIG_FILE") or None
+CONFIG_RELOAD_INTERVAL = _float_env("PROXY_CONFIG_RELOAD_INTERVAL", 2.0)
+# Environment before the config file is applied; reloads layer the file over this again.
+_BASE_ENV = dict(os.environ)
+if CONFIG_FILE:
+    try:
+        os.environ.update(_read_config_file(CONFIG_FILE))
+    except (OSError, ValueError) as exc:
+        logger.warning("Failed to load config file %s: %s", CONFIG_FILE, exc)
 
 PROXY_REQUIRE_API_KEY = _bool_env("PROXY_REQUIRE_API_KEY", False)
 PROXY_API_KEYS = [
     key.strip() for key in os.getenv("PROXY_API_KEYS", "").split(",") if key.strip()
 ]
+PROXY_ADMIN_API_KEYS = [
+    key.strip() for key in os.getenv("PROXY_ADMIN_API_KEYS", "").split(",") if key.strip()
+]
 PROXY_FORWARD_AUTH_HEADER = _bool_env("PROXY_FORWARD_AUTH_HEADER", False)
 ALLOW_UNAUTHENTICATED_HEALTH = _bool_env("ALLOW_UNAUTHENTICATED_HEALTH", False)
-LOG_TOOL_CALLS = _bool_env("PROXY_LOG_TOOL_CALLS", False)
-try:
-    LOG_MAX_CHARS = int(os.getenv("PROXY_LOG_MAX_CHARS", "2000"))
-except ValueError:
-    LOG_MAX_CHARS = 2000
-LOG_PAYLOADS = _bool_env("PROXY_LOG_PAYLOADS", False)
-try:
-    LOG_PAYLOAD_MAX_CHARS = int(os.getenv("PROXY_LOG_PAYLOAD_MAX_CHARS", "4000"))
-except ValueError:
-    LOG_PAYLOAD_MAX_CHARS = 4000
-try:
-    LOG_PAYLOAD_MAX_ITEMS = int(os.getenv("PROXY_LOG_PAYLOAD_MAX_ITEMS", "50"))
-except ValueError:
-    LOG_PAYLOAD_MAX_ITEMS = 50
-try:
-    LOG_PAYLOAD_MAX_DEPTH = int(os.getenv("PROXY_LOG_PAYLOAD_MAX_DEPTH", "6"))
-except ValueError:
-    LOG_PAYLOAD_MAX_DEPTH = 6
-LOG_STREAM_EVENTS = _bool_env("PROXY_LOG_STREAM_EVENTS", False)
-
-OPENAI_PARAM_DEFAULTS = _json_env("OPENAI_PARAM_DEFAULTS", {})
-OPENAI_PARAM_OVERRIDES = _json_env("OPENAI_PARAM_OVERRIDES", {})
-OPENAI_PARAM_DROP = {
-    key.strip()
-    for key in os.getenv("OPENAI_PARAM_DROP", "").split(",")
-    if key.strip()
-}
-PROXY_TOOL_SCHEMA_OVERRIDES = _json_env("PROXY_TOOL_SCHEMA_OVERRIDES", {})
+TOOL_ARGS_VALIDATION = os.getenv("PROXY_TOOL_ARGS_VALIDATION", "off").strip().lower()
+if TOOL_ARGS_VALIDATION not in {"off", "warn", "error", "repair"}:
+    logger.warning("Invalid PROXY_TOOL_ARGS_VALIDATION=%s, using off.", TOOL_ARGS_VALIDATION)
+    TOOL_ARGS_VALIDATION = "off"
+
+STREAM_RESUME_ENABLED = _bool_env("PROXY_STREAM_RESUME", False)
+STREAM_RESUME_TTL = _float_env("PROXY_STREAM_RESUME_TTL", 300.0)
+STREAM_RESUME_MAX_BYTES = _int_env("PROXY_STREAM_RESUME_MAX_BYTES", 4 * 1024 * 1024)
+STREAM_RESUME_MAX_STREAMS = _int_env("PROXY_STREAM_RESUME_MAX_STREAMS", 1000)
+
+BATCH_MAX_REQUESTS = _int_env("PROXY_BATCH_MAX_REQUESTS", 10000)
+BATCH_MAX_WORKERS = _int_env("PROXY_BATCH_MAX_WORKERS", 16)
+BATCH_PER_KEY_CONCURRENCY = _int_env("PROXY_BATCH_PER_KEY_CONCURRENCY", 4)
+
+ADAPTIVE_LIMIT_ENABLED = _bool_env("PROXY_ADAPTIVE_LIMIT", False)
+ADAPTIVE_LIMIT_INITIAL = _int_env("PROXY_ADAPTIVE_LIMIT_INITIAL", 16)
+ADAPTIVE_LIMIT_MIN = _int_env("PROXY_ADAPTIVE_LIMIT_MIN", 1)
+ADAPTIVE_LIMIT_MAX = _int_env("PROXY_ADAPTIVE_LIMIT_MAX", 256)
+ADAPTIVE_LIMIT_QUEUE_TIMEOUT = _float_env("PROXY_ADAPTIVE_LIMIT_QUEUE_TIMEOUT", 30.0)
+ADAPTIVE_LIMIT_MAX_QUEUE = _int_env("PROXY_ADAPTIVE_LIMIT_MAX_QUEUE", 1000)
+ADAPTIVE_LIMIT_TOLERANCE = _float_env("PROXY_ADAPTIVE_LIMIT_TOLERANCE", 2.0)
+ADAPTIVE_LIMIT_BACKOFF = _float_env("PROXY_ADAPTIVE_LIMIT_BACKOFF", 0.5)
+
+COMPRESSION_ENABLED = _bool_env("PROXY_COMPRESSION", False)
+COMPRESSION_STREAMS = _bool_env("PROXY_COMPRESSION_STREAMS", True)
+COMPRESSION_MIN_BYTES = _int_env("PROXY_COMPRESSION_MIN_BYTES", 1024)
+COMPRESSION_ENCODINGS = [
+    name.strip().lower()
+    for name in os.getenv("PROXY_COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",")
+    if name.strip()
+]
+COMPRESSION_LEVEL = _int_env("PROXY_COMPRESSION_LEVEL", 0) or None
+REQUEST_DECOMPRESSION_ENABLED = _bool_env("PROXY_REQUEST_DECOMPRESSION", True)
+MAX_DECOMPRESSED_BYTES = _int_env("PROXY_MAX_DECOMPRESSED_BYTES", 64 * 1024 * 1024)
+UPSTREAM_COMPRESS_REQUESTS = _bool_env("PROXY_UPSTREAM_COMPRESS_REQUESTS", False)
+UPSTREAM_COMPRESS_MIN_BYTES = _int_env("PROXY_UPSTREAM_COMPRESS_MIN_BYTES", 4096)
+
+CONTENT_STORE_ENABLED = _bool_env("PROXY_CONTENT_STORE", False)
+CONTENT_STORE_MAX_BYTES = _int_env("PROXY_CONTENT_STORE_MAX_BYTES", 64 * 1024 * 1024)
+CONTENT_STORE_AUTO = _bool_env("PROXY_CONTENT_STORE_AUTO", False)
+CONTENT_STORE_MIN_BYTES = _int_env("PROXY_CONTENT_STORE_MIN_BYTES", 1024)
+CONTENT_STORE_DIR = os.getenv("PROXY_CONTENT_STORE_DIR") or None
+
+TOKEN_ESTIMATION_ENABLED = _bool_env("PROXY_TOKEN_ESTIMATION", False)
+TOKENIZER = os.getenv("PROXY_TOKENIZER", "heuristic").strip() or "heuristic"
+TOKEN_CACHE_SIZE = _int_env("PROXY_TOKEN_CACHE_SIZE", 8192)
+CONTEXT_POLICY = os.getenv("PROXY_CONTEXT_POLICY", "off").strip().lower()
+if CONTEXT_POLICY not in {"off", "reject", "drop_oldest", "truncate_tool_outputs"}:
+    logger.warning("Invalid PROXY_CONTEXT_POLICY=%s, using off.", CONTEXT_POLICY)
+    CONTEXT_POLICY = "off"
+MODEL_CONTEXT_WINDOWS = _json_env("PROXY_MODEL_CONTEXT_WINDOWS", {})
+if not isinstance(MODEL_CONTEXT_WINDOWS, dict):
+    logger.warning("PROXY_MODEL_CONTEXT_WINDOWS must be a JSON object, ignoring.")
+    MODEL_CONTEXT_WINDOWS = {}
+DEFAULT_CONTEXT_WINDOW = _int_env("PROXY_DEFAULT_CONTEXT_WINDOW", 0)
+
+TIMING_ENABLED = _bool_env("PROXY_TIMING", False)
+TIMING_EXPORT = os.getenv("PROXY_TIMING_EXPORT", "").strip().lower()
+if TIMING_EXPORT not in {"", "file", "otlp"}:
+    logger.warning("Invalid PROXY_TIMING_EXPORT=%s, export disabled.", TIMING_EXPORT)
+    TIMING_EXPORT = ""
+TIMING_EXPORT_PATH = os.getenv("PROXY_TIMING_EXPORT_PATH", "timing.jsonl")
+TIMING_OTLP_ENDPOINT = os.getenv("PROXY_TIMING_OTLP_ENDPOINT", "http://127.0.0.1:4318/v1/traces")
+
+PROFILER_MAX_SECONDS = _float_env("PROXY_PROFILER_MAX_SECONDS", 300.0)
+PROFILER_DEFAULT_INTERVAL_MS = _float_env("PROXY_PROFILER_INTERVAL_MS", 10.0)
+
+LOG_ASYNC = _bool_env("PROXY_LOG_ASYNC", True)
+LOG_QUEUE_SIZE = _int_env("PROXY_LOG_QUEUE_SIZE", 100000)
+ACCESS_LOG_PATH = os.getenv("PROXY_ACCESS_LOG") or None
+ACCESS_LOG_MAX_BYTES = _int_env("PROXY_ACCESS_LOG_MAX_BYTES", 100 * 1024 * 1024)
+ACCESS_LOG_BACKUPS = _int_env("PROXY_ACCESS_LOG_BACKUPS", 5)
+
+UPSTREAM_STREAM_ALWAYS = _bool_env("PROXY_UPSTREAM_STREAM_ALWAYS", False)
+UPSTREAM_IDLE_TIMEOUT = _float_env("PROXY_UPSTREAM_IDLE_TIMEOUT", 0.0)
+NONSTREAM_KEEPALIVE_INTERVAL = _float_env("PROXY_NONSTREAM_KEEPALIVE_INTERVAL", 0.0)
+SSE_HEARTBEAT_INTERVAL = _float_env("PROXY_SSE_HEARTBEAT_INTERVAL", 0.0)
+FORWARD_REASONING_SUMMARY = _bool_env("PROXY_FORWARD_REASONING_SUMMARY", False)
+KEYSTORE_PATH = os.getenv("PROXY_KEYSTORE") or None
+KEYSTORE_RELOAD_INTERVAL = _float_env("PROXY_KEYSTORE_RELOAD_INTERVAL", 5.0)
+AUTH_CACHE_SIZE = _int_env("PROXY_AUTH_CACHE_SIZE", 10000)
+MODEL_PROTOCOLS = _json_env("PROXY_MODEL_PROTOCOLS", {})
+if not isinstance(MODEL_PROTOCOLS, dict):
+    logger.warning("PROXY_MODEL_PROTOCOLS must be a JSON object, ignoring.")
+    MODEL_PROTOCOLS = {}
+DEFAULT_PROTOCOL = os.getenv("PROXY_DEFAULT_PROTOCOL", "responses").strip().lower()
+if DEFAULT_PROTOCOL not in {"responses", "chat"}:
+    logger.warning("Invalid PROXY_DEFAULT_PROTOCOL=%s, using responses.", DEFAULT_PROTOCOL)
+    DEFAULT_PROTOCOL = "responses"
+PROTOCOL_AUTODETECT = _bool_env("PROXY_PROTOCOL_AUTODETECT", False)
+PROTOCOL_CATALOG_TTL = _float_env("PROXY_PROTOCOL_CATALOG_TTL", 600.0)
+EMBEDDINGS_BATCH_MAX_INPUTS = _int_env("PROXY_EMBEDDINGS_BATCH_MAX_INPUTS", 256)
+EMBEDDINGS_BATCH_WINDOW_MS = _float_env("PROXY_EMBEDDINGS_BATCH_WINDOW_MS", 5.0)
+EMBEDDINGS_CACHE_MAX_BYTES = _int_env("PROXY_EMBEDDINGS_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+EMBEDDINGS_CACHE_DIR = os.getenv("PROXY_EMBEDDINGS_CACHE_DIR") or None
+ENABLE_TOOL_EXECUTION = _bool_env("ENABLE_TOOL_EXECUTION", False)
+TOOL_MODULE = os.getenv("PROXY_TOOL_MODULE", "function_tools")
+TOOL_MAX_WORKERS = max(_int_env("PROXY_TOOL_MAX_WORKERS", 8), 1)
+TOOL_TIMEOUT = _float_env("PROXY_TOOL_TIMEOUT", 30.0)
+TOOL_MAX_ROUNDS = max(_int_env("PROXY_TOOL_MAX_ROUNDS", 5), 1)
+MAX_N = max(_int_env("PROXY_MAX_N", 8), 1)
+FANOUT_MAX_WORKERS = max(_int_env("PROXY_FANOUT_MAX_WORKERS", 32), 1)
+WS_MAX_STREAMS = max(_int_env("PROXY_WS_MAX_STREAMS", 16), 1)
+WS_SEND_QUEUE = max(_int_env("PROXY_WS_SEND_QUEUE", 256), 1)
+WS_PING_INTERVAL = _float_env("PROXY_WS_PING_INTERVAL", 25.0)
+SHADOW_BASE_URL = os.getenv("PROXY_SHADOW_BASE_URL") or None
+if SHADOW_BASE_URL:
+    SHADOW_BASE_URL = _normalize_base_url(SHADOW_BASE_URL)
+SHADOW_API_KEY = os.getenv("PROXY_SHADOW_API_KEY") or None
+if SHADOW_BASE_URL and not SHADOW_API_KEY:
+    logger.warning("PROXY_SHADOW_BASE_URL is set without PROXY_SHADOW_API_KEY; mirroring is off.")
+SHADOW_MODEL = os.getenv("PROXY_SHADOW_MODEL") or None
+SHADOW_SAMPLE_RATE = min(max(_float_env("PROXY_SHADOW_SAMPLE_RATE", 0.0), 0.0), 1.0)
+SHADOW_QUEUE_SIZE = _int_env("PROXY_SHADOW_QUEUE_SIZE", 100)
+SHADOW_WORKERS = _int_env("PROXY_SHADOW_WORKERS", 2)
+SHADOW_TIMEOUT = _float_env("PROXY_SHADOW_TIMEOUT", 120.0)
+SHADOW_MAX_RECORDS = _int_env("PROXY_SHADOW_MAX_RECORDS", 500)
+DRAIN_TIMEOUT = _float_env("PROXY_DRAIN_TIMEOUT", 300.0)
+LISTEN_FD = _int_env("PROXY_LISTEN_FD", -1)
+HANDOFF_PARENT_PID = _int_env("PROXY_HANDOFF_PARENT", 0)
+RETRY_BUDGET_RATIO = max(_float_env("PROXY_RETRY_BUDGET_RATIO", 0.1), 0.0)
+RETRY_BUDGET_MIN = max(_int_env("PROXY_RETRY_BUDGET_MIN", 10), 0)
+RETRY_BUDGET_WINDOW = max(_int_env("PROXY_RETRY_BUDGET_WINDOW", 10), 1)
+RETRY_BACKOFF_BASE = _float_env("PROXY_RETRY_BACKOFF_BASE", 0.5)
+RETRY_BACKOFF_MAX = _float_env("PROXY_RETRY_BACKOFF_MAX", 8.0)
+RETRY_AFTER_MAX = _float_env("PROXY_RETRY_AFTER_MAX", 60.0)
+
+WARMUP_ENABLED = _bool_env("PROXY_WARMUP", True)
+WARMUP_CONNECT = _bool_env("PROXY_WARMUP_CONNECT", True)
+WARMUP_TIMEOUT = _float_env("PROXY_WARMUP_TIMEOUT", 5.0)
+WARMUP_RETRY_INTERVAL = _float_env("PROXY_WARMUP_RETRY_INTERVAL", 5.0)
+WARMUP_MAX_WAIT = _float_env("PROXY_WARMUP_MAX_WAIT", 300.0)
+IMPORT_BUDGET_MS = _float_env("PROXY_IMPORT_BUDGET_MS", 1000.0)
+
 
 _TASK_MANAGER_ADD_TASK_SCHEMA = {
     "type": "object",
@@ -134,3 +280,85 @@ _TASK_MANAGER_ADD_TASK_SCHEMA = {
 _DEFAULT_TOOL_SCHEMAS = {
     "mcp_task_manager_add_task": _TASK_MANAGER_ADD_TASK_SCHEMA,
 }
+
+
+class ConfigSnapshot:
+    """Immutable view of the settings that can change without a restart.
+
+    Handlers call :func:`get_config` once and read from that snapshot, so a
+    reload never mixes old and new values within one request. Derived
+    structures (param rules, merged tool schemas) are built here once per load.
+    """
+
+    __slots__ = (
+        "version",
+        "loaded_at",
+        "openai_api_key",
+        "upstream",
+        "log_max_chars",
+        "log_payloads",
+        "log_payload_max_chars",
+        "log_payload_max_items",
+        "log_payload_max_depth",
+        "log_stream_events",
+        "log_tool_calls",
+        "param_drop",
+        "param_defaults",
+        "param_overrides",
+        "tool_schemas",
+    )
+
+    def __init__(self, env, version):
+        self.version = version
+        self.loaded_at = time.time()
+        self.openai_api_key = env.get("OPENAI_API_KEY") or None
+        # Everything a cached upstream client is built from; a change invalidates the client cache.
+        self.upstream = (
+            _normalize_base_url(env.get("OPENAI_BASE_URL", "https://api.openai.com")),
+            _float_env("OPENAI_TIMEOUT", 120.0, env),
+            _int_env("OPENAI_MAX_RETRIES", 2, env),
+            env.get("OPENAI_ORGANIZATION"),
+            env.get("OPENAI_PROJECT"),
+        )
+        self.log_max_chars = _int_env("PROXY_LOG_MAX_CHARS", 2000, env)
+        self.log_payloads = _bool_env("PROXY_LOG_PAYLOADS", False, env)
+        self.log_payload_max_chars = _int_env("PROXY_LOG_PAYLOAD_MAX_CHARS", 4000, env)
+        self.log_payload_max_items = _int_env("PROXY_LOG_PAYLOAD_MAX_ITEMS", 50, env)
+        self.log_payload_max_depth = _int_env("PROXY_LOG_PAYLOAD_MAX_DEPTH", 6, env)
+        self.log_stream_events = _bool_env("PROXY_LOG_STREAM_EVENTS", False, env)
+        self.log_tool_calls = _bool_env("PROXY_LOG_TOOL_CALLS", False, env)
+        overrides = _json_env("OPENAI_PARAM_OVERRIDES", {}, env)
+        defaults = _json_env("OPENAI_PARAM_DEFAULTS", {}, env)
+        drop = {key.strip() for key in env.get("OPENAI_PARAM_DROP", "").split(",") if key.strip()}
+        # Folded so each rule touches a key at most once: a dropped key with a default
+        # always ends up with the default, and overridden keys need no drop or default.
+        self.param_overrides = {key: defaults[key] for key in drop if key in defaults}
+        self.param_overrides.update(overrides)
+        self.param_defaults = {
+            key: value for key, value in defaults.items() if key not in self.param_overrides
+        }
+        self.param_drop = frozenset(drop - set(self.param_overrides))
+        self.tool_schemas = dict(_DEFAULT_TOOL_SCHEMAS)
+        for name, schema in _json_env("PROXY_TOOL_SCHEMA_OVERRIDES", {}, env).items():
+            if isinstance(schema, dict) and schema:
+                self.tool_schemas[name] = schema
+
+
+_CONFIG_LOCK = threading.Lock()
+_CONFIG = ConfigSnapshot(os.environ, 1)
+
+
+def get_config():
+    """Return the current :class:`ConfigSnapshot`."""
+    return _CONFIG
+
+
+def _load_config_snapshot():
+    """Build the next snapshot from the startup environment plus ``PROXY_CONFIG_FILE`` and make it current."""
+    global _CONFIG
+    env = dict(_BASE_ENV)
+    if CONFIG_FILE:
+        env.update(_read_config_file(CONFIG_FILE))
+    with _CONFIG_LOCK:
+        _CONFIG = ConfigSnapshot(env, _CONFIG.version + 1)
+        return _CONFIG
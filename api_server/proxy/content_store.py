@@ -0,0 +1,170 @@
+import collections
+import hashlib
+import os
+import re
+import threading
+
+from .config import (
+    CONTENT_STORE_AUTO,
+    CONTENT_STORE_DIR,
+    CONTENT_STORE_ENABLED,
+    CONTENT_STORE_MAX_BYTES,
+    CONTENT_STORE_MIN_BYTES,
+)
+from .logger import logger
+from .metrics import _incr, _set_gauge
+
+CONTENT_REF_TYPE = "content_ref"
+_DIGEST_RE = re.compile(r"^sha256:[0-9a-f]{64}$")
+
+
+def _content_digest(data):
+    return "sha256:" + hashlib.sha256(data).hexdigest()
+
+
+def _is_valid_digest(digest):
+    return isinstance(digest, str) and bool(_DIGEST_RE.match(digest))
+
+
+class ContentStore:
+    """Namespaced content-addressed text store: in-memory LRU with an optional write-through disk tier.
+
+    Namespaces are API key fingerprints. Callers without a key have no
+    namespace, so nothing they send is stored or resolved for anyone else.
+    """
+
+    def __init__(self, max_bytes, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.entries = collections.OrderedDict()
+        self.size_bytes = 0
+        self.lock = threading.Lock()
+
+    def put(self, namespace, text):
+        if not namespace:
+            raise ValueError("Content can only be stored under an API key namespace.")
+        data = text.encode("utf-8")
+        digest = _content_digest(data)
+        key = (namespace, digest)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return digest
+            self._insert_locked(key, text, len(data))
+        if self.directory:
+            self._write_disk(key, data)
+        return digest
+
+    def get(self, namespace, digest):
+        if not namespace or not _is_valid_digest(digest):
+            return None
+        key = (namespace, digest)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry[0]
+        if not self.directory:
+            return None
+        data = self._read_disk(key)
+        if data is None:
+            return None
+        text = data.decode("utf-8")
+        with self.lock:
+            if key not in self.entries:
+                self._insert_locked(key, text, len(data))
+        _incr("content_store.disk_hits")
+        return text
+
+    def contains(self, namespace, digest):
+        if not namespace or not _is_valid_digest(digest):
+            return False
+        key = (namespace, digest)
+        with self.lock:
+            if key in self.entries:
+                return True
+        return bool(self.directory) and os.path.isfile(self._disk_path(key))
+
+    def _insert_locked(self, key, text, size):
+        if size > self.max_bytes:
+            return
+        self.entries[key] = (text, size)
+        self.size_bytes += size
+        while self.size_bytes > self.max_bytes:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.size_bytes -= evicted_size
+            _incr("content_store.evicted")
+        _set_gauge("content_store.bytes", self.size_bytes)
+        _set_gauge("content_store.entries", len(self.entries))
+
+    def _disk_path(self, key):
+        namespace, digest = key
+        hex_digest = digest.split(":", 1)[1]
+        return os.path.join(self.directory, namespace, hex_digest[:2], hex_digest)
+
+    def _write_disk(self, key, data):
+        path = self._disk_path(key)
+        if os.path.isfile(path):
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as handle:
+                handle.write(data)
+            os.replace(tmp_path, path)
+        except OSError as exc:
+            logger.warning("Failed to persist content %s: %s", key[1], exc)
+
+    def _read_disk(self, key):
+        try:
+            with open(self._disk_path(key), "rb") as handle:
+                return handle.read()
+        except OSError:
+            return None
+
+
+_CONTENT_STORE = ContentStore(CONTENT_STORE_MAX_BYTES, CONTENT_STORE_DIR) if CONTENT_STORE_ENABLED else None
+
+
+def _is_content_ref(value):
+    return isinstance(value, dict) and value.get("type") == CONTENT_REF_TYPE
+
+
+class ContentResolver:
+    """Expands ``{"type": "content_ref", "hash": ...}`` message bodies.
+
+    With ``PROXY_CONTENT_STORE_AUTO`` large inline bodies are stored too, so
+    later turns can reference them without an explicit upload.
+
+    Unknown hashes are collected in ``missing`` instead of raising, so the caller
+    can tell the client every body it has to re-send in a single round trip.
+    """
+
+    def __init__(self, store, namespace):
+        self.store = store
+        self.namespace = namespace
+        self.missing = []
+        self.bytes_reused = 0
+
+    def __call__(self, value):
+        if _is_content_ref(value):
+            digest = value.get("hash")
+            text = self.store.get(self.namespace, digest)
+            if text is None:
+                self.missing.append(digest)
+                _incr("content_store.misses")
+                return ""
+            size = len(text.encode("utf-8"))
+            self.bytes_reused += size
+            _incr("content_store.hits")
+            _incr("content_store.bytes_not_uploaded", size)
+            return text
+        if CONTENT_STORE_AUTO and self.namespace and isinstance(value, str) and len(value) >= CONTENT_STORE_MIN_BYTES:
+            self.store.put(self.namespace, value)
+        return value
+
+
+def _content_resolver(namespace):
+    if _CONTENT_STORE is None:
+        return None
+    return ContentResolver(_CONTENT_STORE, namespace)
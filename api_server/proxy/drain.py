@@ -0,0 +1,220 @@
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from werkzeug.wsgi import ClosingIterator
+
+from .config import DRAIN_TIMEOUT, HANDOFF_PARENT_PID, LISTEN_FD
+from .errors import _error
+from .lifecycle import _wait_ready, _warmup_failed
+from .logger import logger
+from .metrics import _incr, _set_gauge
+
+# Paths still answered while draining so probes and operators can watch the drain.
+_DRAIN_EXEMPT_PREFIXES = ("/v1/health", "/v1/ready", "/v1/metrics", "/v1/admin")
+# After the deadline, streams get this long to write their final error frame.
+_ABORT_GRACE_SECONDS = 1.0
+
+_DRAINING = threading.Event()
+_CONDITION = threading.Condition()
+_IN_FLIGHT = {"requests": 0, "streams": 0}
+_DEADLINE = None
+_SERVER = None
+_SUCCESSOR = None
+_DRAIN_THREAD = None
+
+
+def _is_draining():
+    return _DRAINING.is_set()
+
+
+def _drain_expired():
+    """True once a drain has passed its deadline; open streams stop at their next frame."""
+    return _DEADLINE is not None and time.monotonic() >= _DEADLINE
+
+
+def _drain_exempt(path):
+    return path.startswith(_DRAIN_EXEMPT_PREFIXES)
+
+
+def _draining_error():
+    _incr("drain.requests_rejected")
+    response, status = _error(
+        "The proxy is shutting down; retry the request.",
+        status=503,
+        error_type="server_error",
+        code="server_draining",
+    )
+    response.headers["Retry-After"] = "1"
+    response.headers["Connection"] = "close"
+    return response, status
+
+
+def _enter(kind):
+    with _CONDITION:
+        _IN_FLIGHT[kind] += 1
+        _set_gauge(f"drain.in_flight_{kind}", _IN_FLIGHT[kind])
+
+
+def _leave(kind):
+    with _CONDITION:
+        _IN_FLIGHT[kind] -= 1
+        _set_gauge(f"drain.in_flight_{kind}", _IN_FLIGHT[kind])
+        _CONDITION.notify_all()
+
+
+def _track_in_flight(wsgi_app):
+    """Wrap ``wsgi_app`` so a drain can wait for every response still being sent, streams included."""
+
+    def app(environ, start_response):
+        _enter("requests")
+        try:
+            body = wsgi_app(environ, start_response)
+        except BaseException:
+            _leave("requests")
+            raise
+        return ClosingIterator(body, lambda: _leave("requests"))
+
+    return app
+
+
+def _stream_started():
+    _enter("streams")
+
+
+def _stream_finished(aborted):
+    _leave("streams")
+    if _is_draining():
+        _incr("drain.streams_aborted" if aborted else "drain.streams_drained")
+
+
+def _start_drain(reason, stop_accepting=False):
+    """Stop admitting requests, fail readiness, and let open responses finish up to ``PROXY_DRAIN_TIMEOUT``.
+
+    When another process shares the listening socket (a successor, or with
+    ``stop_accepting`` the process that started this one) the accept loop
+    stops at once so it takes every new connection; otherwise connections are
+    still accepted and answered with 503 until the drain ends.
+    """
+    global _DEADLINE, _DRAIN_THREAD
+    with _CONDITION:
+        if _DRAINING.is_set():
+            return False
+        _DEADLINE = time.monotonic() + DRAIN_TIMEOUT
+        _DRAINING.set()
+        in_flight = dict(_IN_FLIGHT)
+    _incr("drain.started")
+    _set_gauge("drain.active", 1)
+    logger.info(
+        "drain.started reason=%s requests=%s streams=%s timeout=%.0fs",
+        reason,
+        in_flight["requests"],
+        in_flight["streams"],
+        DRAIN_TIMEOUT,
+    )
+    _DRAIN_THREAD = threading.Thread(
+        target=_run_drain, args=(stop_accepting or _SUCCESSOR is not None,), name="proxy-drain", daemon=True
+    )
+    _DRAIN_THREAD.start()
+    return True
+
+
+def _idle():
+    return _IN_FLIGHT["requests"] == 0 and _IN_FLIGHT["streams"] == 0
+
+
+def _run_drain(stop_accepting):
+    if _SERVER is not None and stop_accepting:
+        _SERVER.shutdown()
+    with _CONDITION:
+        idle = _CONDITION.wait_for(_idle, timeout=max(_DEADLINE - time.monotonic(), 0))
+        if not idle:
+            _CONDITION.wait_for(_idle, timeout=_ABORT_GRACE_SECONDS)
+        remaining = _IN_FLIGHT["streams"]
+        unfinished = _IN_FLIGHT["requests"]
+    if remaining:
+        # Streams still blocked on upstream are cut off when the process exits.
+        _incr("drain.streams_aborted", remaining)
+    logger.info("drain.finished clean=%s unfinished_requests=%s unfinished_streams=%s", idle, unfinished, remaining)
+    if _SERVER is not None:
+        _SERVER.shutdown()
+
+
+def _hand_off():
+    """Start a copy of this process that inherits the listening socket; it asks us to drain once ready."""
+    global _SUCCESSOR
+    if _SERVER is None or _is_draining():
+        return
+    if _SUCCESSOR is not None and _SUCCESSOR.poll() is None:
+        logger.warning("Hand-off already in progress (pid=%s).", _SUCCESSOR.pid)
+        return
+    fd = _SERVER.fileno()
+    env = dict(os.environ, PROXY_LISTEN_FD=str(fd), PROXY_HANDOFF_PARENT=str(os.getpid()))
+    try:
+        _SUCCESSOR = subprocess.Popen([sys.executable, *sys.argv], env=env, pass_fds=(fd,))
+    except OSError as exc:
+        _incr("drain.handoff_failed")
+        logger.error("Hand-off failed to start a new process: %s", exc)
+        return
+    _incr("drain.handoffs")
+    logger.info("drain.handoff successor_pid=%s fd=%s", _SUCCESSOR.pid, fd)
+    threading.Thread(target=_watch_successor, args=(_SUCCESSOR,), name="proxy-handoff-watch", daemon=True).start()
+
+
+def _watch_successor(successor):
+    code = successor.wait()
+    if not _is_draining():
+        _incr("drain.handoff_failed")
+        logger.error("Hand-off successor (pid=%s) exited with %s before taking over; still serving.", successor.pid, code)
+
+
+def _notify_parent_when_ready():
+    _wait_ready()
+    if _warmup_failed():
+        # Leave the socket to the previous process rather than take over without a working upstream.
+        logger.error("Warm-up failed; leaving the previous process (pid=%s) serving.", HANDOFF_PARENT_PID)
+        _start_drain("handoff_warmup_failed", stop_accepting=True)
+        return
+    if os.getppid() != HANDOFF_PARENT_PID:
+        logger.warning("Hand-off parent %s is gone; not signalling it.", HANDOFF_PARENT_PID)
+        return
+    logger.info("Ready; asking the previous process (pid=%s) to drain.", HANDOFF_PARENT_PID)
+    os.kill(HANDOFF_PARENT_PID, signal.SIGTERM)
+
+
+def _on_sigterm(signum, frame):
+    # Drain off the signal handler so it never waits on a lock the interrupted code holds.
+    threading.Thread(target=_start_drain, args=("sigterm",), name="proxy-drain-start", daemon=True).start()
+
+
+def _on_sigusr2(signum, frame):
+    threading.Thread(target=_hand_off, name="proxy-handoff", daemon=True).start()
+
+
+def _serve(app, host, port):
+    """Serve ``app`` until a drain completes.
+
+    SIGTERM drains; SIGUSR2 starts a successor on the same socket, which
+    sends SIGTERM here once warm. With ``PROXY_LISTEN_FD`` set the server
+    adopts that inherited socket instead of binding ``host:port``.
+    """
+    global _SERVER
+    from werkzeug.serving import make_server
+
+    _SERVER = make_server(host, port, app, threaded=True, fd=LISTEN_FD if LISTEN_FD >= 0 else None)
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, _on_sigterm)
+        if hasattr(signal, "SIGUSR2"):
+            signal.signal(signal.SIGUSR2, _on_sigusr2)
+    if HANDOFF_PARENT_PID:
+        threading.Thread(target=_notify_parent_when_ready, name="proxy-handoff-notify", daemon=True).start()
+    try:
+        _SERVER.serve_forever()
+    finally:
+        if _DRAIN_THREAD is not None:
+            _DRAIN_THREAD.join()
+        _set_gauge("drain.active", 0)
+        _SERVER.server_close()
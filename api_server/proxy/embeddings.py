@@ -0,0 +1,309 @@
+import array
+import base64
+import collections
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from concurrent.futures import Future
+
+from .config import (
+    EMBEDDINGS_BATCH_MAX_INPUTS,
+    EMBEDDINGS_BATCH_WINDOW_MS,
+    EMBEDDINGS_CACHE_DIR,
+    EMBEDDINGS_CACHE_MAX_BYTES,
+)
+from .logger import logger
+from .metrics import _add_gauge, _incr, _set_gauge
+from .upstream import _create_embeddings
+
+_DIGEST_BYTES = 32
+_MAGIC = b"F32V"
+_HEADER = struct.Struct("<4sI")
+
+
+def _packed_vector(embedding):
+    """Little-endian float32 ``bytes`` for an upstream embedding sent as base64 or as a list of floats."""
+    if isinstance(embedding, str):
+        return base64.b64decode(embedding)
+    values = array.array("f", embedding)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
+
+
+def _splittable(error):
+    """True for errors one caller's input can cause (a bad or oversized input), not upstream-wide failures."""
+    status = getattr(error, "status_code", None)
+    return status is not None and 400 <= status < 500 and status not in {408, 409, 429}
+
+
+def _vector_key(namespace, item):
+    text = item if isinstance(item, str) else json.dumps(item, separators=(",", ":"))
+    return hashlib.sha256(f"{namespace}\0{text}".encode("utf-8")).digest()
+
+
+class _MmapShelf:
+    """Append-only file of ``digest + float32 vector`` rows for one namespace, read through ``mmap``.
+
+    The file starts with a small header holding the row width; a partial row
+    left by a crash is ignored and overwritten on the next append.
+    """
+
+    def __init__(self, directory, namespace):
+        name = hashlib.sha256(namespace.encode("utf-8")).hexdigest()[:24]
+        self.path = os.path.join(directory, f"{name}.f32")
+        self.rows = {}
+        self.width = None
+        self.map = None
+        self.mapped_rows = 0
+        self.lock = threading.Lock()
+        self._load()
+
+    def _stride(self):
+        return _DIGEST_BYTES + self.width
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as handle:
+                data = handle.read()
+        except OSError:
+            return
+        if len(data) < _HEADER.size or data[:4] != _MAGIC:
+            return
+        self.width = _HEADER.unpack_from(data)[1]
+        stride = self._stride()
+        count = (len(data) - _HEADER.size) // stride
+        for row in range(count):
+            offset = _HEADER.size + row * stride
+            self.rows[data[offset:offset + _DIGEST_BYTES]] = row
+
+    def get(self, digest):
+        with self.lock:
+            row = self.rows.get(digest)
+            if row is None:
+                return None
+            if row >= self.mapped_rows:
+                self._remap_locked()
+            offset = _HEADER.size + row * self._stride() + _DIGEST_BYTES
+            return self.map[offset:offset + self.width]
+
+    def put(self, digest, vector):
+        with self.lock:
+            if digest in self.rows:
+                return
+            if self.width is None:
+                self.width = len(vector)
+                with open(self.path, "wb") as handle:
+                    handle.write(_HEADER.pack(_MAGIC, self.width))
+            elif len(vector) != self.width:
+                return
+            row = len(self.rows)
+            with open(self.path, "r+b") as handle:
+                handle.seek(_HEADER.size + row * self._stride())
+                handle.write(digest + vector)
+            self.rows[digest] = row
+
+    def _remap_locked(self):
+        if self.map is not None:
+            self.map.close()
+        with open(self.path, "rb") as handle:
+            self.map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        self.mapped_rows = (len(self.map) - _HEADER.size) // self._stride()
+
+
+class VectorCache:
+    """Content-hash cache of embedding vectors kept as packed float32 ``bytes``.
+
+    The memory tier is an LRU bounded by ``max_bytes``; with ``directory`` set,
+    vectors are also written to per-namespace memory-mapped shelves that
+    survive eviction and restarts.
+    """
+
+    def __init__(self, max_bytes, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.entries = collections.OrderedDict()
+        self.size_bytes = 0
+        self.shelves = {}
+        self.lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self, namespace, digest):
+        key = (namespace, digest)
+        with self.lock:
+            vector = self.entries.get(key)
+            if vector is not None:
+                self.entries.move_to_end(key)
+                return vector
+        if not self.directory:
+            return None
+        vector = self._shelf(namespace).get(digest)
+        if vector is not None:
+            _incr("embeddings.cache_disk_hits")
+            with self.lock:
+                self._insert_locked(key, vector)
+        return vector
+
+    def put(self, namespace, digest, vector):
+        with self.lock:
+            if (namespace, digest) in self.entries:
+                return
+            self._insert_locked((namespace, digest), vector)
+        if self.directory:
+            try:
+                self._shelf(namespace).put(digest, vector)
+            except OSError as exc:
+                logger.warning("Failed to persist embedding vector: %s", exc)
+
+    def _shelf(self, namespace):
+        with self.lock:
+            shelf = self.shelves.get(namespace)
+            if shelf is None:
+                shelf = _MmapShelf(self.directory, namespace)
+                self.shelves[namespace] = shelf
+            return shelf
+
+    def _insert_locked(self, key, vector):
+        if len(vector) > self.max_bytes:
+            return
+        self.entries[key] = vector
+        self.size_bytes += len(vector)
+        while self.size_bytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size_bytes -= len(evicted)
+            _incr("embeddings.cache_evicted")
+        _set_gauge("embeddings.cache_bytes", self.size_bytes)
+
+
+class _Batch:
+    __slots__ = ("client", "params", "inputs", "waiters", "full")
+
+    def __init__(self, client, params):
+        self.client = client
+        self.params = params
+        self.inputs = []
+        self.waiters = []
+        self.full = threading.Event()
+
+
+class EmbeddingBatcher:
+    """Merges concurrent embedding calls for the same upstream client and params into one request.
+
+    The caller that opens a batch waits up to ``window`` seconds (or until the
+    batch reaches ``max_inputs``) for others to join, then sends it. Each
+    caller gets back its own slice of vectors.
+    """
+
+    def __init__(self, max_inputs, window):
+        self.max_inputs = max(max_inputs, 1)
+        self.window = window
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def embed(self, client, params, inputs):
+        """Return ``(vectors, prompt_tokens)`` for ``inputs``: packed float32 ``bytes`` per input."""
+        key = (id(client), json.dumps(params, sort_keys=True))
+        future = Future()
+        with self.lock:
+            batch = self.pending.get(key)
+            if batch is not None and len(batch.inputs) + len(inputs) > self.max_inputs:
+                self._close_locked(key, batch)
+                batch = None
+            leader = batch is None
+            if leader:
+                batch = _Batch(client, params)
+                self.pending[key] = batch
+            batch.waiters.append((future, len(batch.inputs), len(inputs)))
+            batch.inputs.extend(inputs)
+            if len(batch.inputs) >= self.max_inputs:
+                self._close_locked(key, batch)
+        if leader:
+            if self.window > 0:
+                batch.full.wait(self.window)
+            with self.lock:
+                self._close_locked(key, batch)
+            self._send(batch)
+        return future.result()
+
+    def _close_locked(self, key, batch):
+        batch.full.set()
+        if self.pending.get(key) is batch:
+            del self.pending[key]
+
+    def _send(self, batch):
+        _incr("embeddings.batched_inputs", len(batch.inputs))
+        try:
+            vectors, total_tokens = _request_embeddings(batch.client, batch.params, batch.inputs)
+        except Exception as exc:
+            if len(batch.waiters) > 1 and _splittable(exc):
+                # One caller's input can fail the merged call; send each caller's inputs on their own.
+                _incr("embeddings.batches_split")
+                self._send_each(batch)
+                return
+            for future, _, _ in batch.waiters:
+                future.set_exception(exc)
+            return
+        total_inputs = len(batch.inputs)
+        for future, start, count in batch.waiters:
+            tokens = round(total_tokens * count / total_inputs) if total_inputs else 0
+            future.set_result((vectors[start:start + count], tokens))
+
+    def _send_each(self, batch):
+        for future, start, count in batch.waiters:
+            try:
+                future.set_result(_request_embeddings(batch.client, batch.params, batch.inputs[start:start + count]))
+            except Exception as exc:
+                future.set_exception(exc)
+
+
+def _request_embeddings(client, params, inputs):
+    """One upstream embeddings call; returns ``(vectors, prompt_tokens)`` with vectors in input order."""
+    _incr("embeddings.upstream_calls")
+    _add_gauge("embeddings.in_flight", 1)
+    try:
+        response = _create_embeddings(client, dict(params, input=inputs, encoding_format="base64"))
+    finally:
+        _add_gauge("embeddings.in_flight", -1)
+    vectors = [None] * len(inputs)
+    for item in response.data:
+        vectors[item.index] = _packed_vector(item.embedding)
+    usage = getattr(response, "usage", None)
+    return vectors, getattr(usage, "prompt_tokens", 0) or 0
+
+
+_VECTOR_CACHE = VectorCache(EMBEDDINGS_CACHE_MAX_BYTES, EMBEDDINGS_CACHE_DIR) if EMBEDDINGS_CACHE_MAX_BYTES > 0 else None
+_BATCHER = EmbeddingBatcher(EMBEDDINGS_BATCH_MAX_INPUTS, EMBEDDINGS_BATCH_WINDOW_MS / 1000.0)
+
+
+def _embed_inputs(client, params, inputs, scope):
+    """Embed ``inputs`` through the cache and batcher; returns ``(vectors, prompt_tokens)``.
+
+    ``scope`` names the caller and upstream; cached vectors are never shared across scopes.
+    """
+    namespace = f"{scope}:{params['model']}:{params.get('dimensions') or ''}"
+    vectors = [None] * len(inputs)
+    keys = [None] * len(inputs)
+    todo = []
+    for index, item in enumerate(inputs):
+        if _VECTOR_CACHE is not None:
+            keys[index] = _vector_key(namespace, item)
+            vectors[index] = _VECTOR_CACHE.get(namespace, keys[index])
+        if vectors[index] is None:
+            todo.append(index)
+    _incr("embeddings.inputs", len(inputs))
+    _incr("embeddings.cache_hits", len(inputs) - len(todo))
+    prompt_tokens = 0
+    for offset in range(0, len(todo), _BATCHER.max_inputs):
+        chunk = todo[offset:offset + _BATCHER.max_inputs]
+        computed, tokens = _BATCHER.embed(client, params, [inputs[index] for index in chunk])
+        prompt_tokens += tokens
+        for index, vector in zip(chunk, computed):
+            vectors[index] = vector
+            if _VECTOR_CACHE is not None:
+                _VECTOR_CACHE.put(namespace, keys[index], vector)
+    return vectors, prompt_tokens
@@ -1,4 +1,8 @@
 import json
+import math
+import re
+import time
+from email.utils import parsedate_to_datetime
 
 from flask import jsonify
 
@@ -14,6 +18,81 @@ def _error_payload(message, error_type="proxy_error", code=None, param=None):
     return payload
 
 
+_DURATION_PART_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class UpstreamOverloadedError(Exception):
+    """Raised when the proxy sheds load before calling upstream."""
+
+    status_code = 503
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.message = message
+        self.retry_after = retry_after
+        self.body = _error_payload(message, error_type="rate_limit_error", code="proxy_overloaded")
+
+
+class DeadlineExceededError(Exception):
+    """Raised when the caller's deadline passes before the upstream call finished."""
+
+    status_code = 504
+
+    def __init__(self, message="The request deadline passed before upstream answered."):
+        super().__init__(message)
+        self.message = message
+        self.body = _error_payload(message, error_type="timeout_error", code="deadline_exceeded")
+
+
+class UpstreamStreamError(Exception):
+    """Raised when an upstream event stream fails, stalls or ends without a final response."""
+
+    def __init__(self, message, status_code=502, code=None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.body = _error_payload(message, error_type="upstream_error", code=code)
+
+
+def _parse_duration(value):
+    parts = _DURATION_PART_RE.findall(value or "")
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _retry_after_seconds(error):
+    explicit = getattr(error, "retry_after", None)
+    if explicit is not None:
+        return explicit
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            try:
+                return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+            except (TypeError, ValueError):
+                pass
+    for kind in ("requests", "tokens"):
+        if headers.get(f"x-ratelimit-remaining-{kind}") == "0":
+            reset = _parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+            if reset is not None:
+                return reset
+    return None
+
+
 def _error(message, status=400, error_type="proxy_error", code=None, param=None):
     payload = _error_payload(message, error_type=error_type, code=code, param=param)
     return jsonify(payload), status
@@ -35,4 +114,8 @@ def _stream_error_payload(error):
 
 def _handle_upstream_error(error):
     payload, status = _stream_error_payload(error)
-    return jsonify(payload), status
+    response = jsonify(payload)
+    retry_after = _retry_after_seconds(error)
+    if retry_after is not None and status in {429, 503}:
+        response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response, status
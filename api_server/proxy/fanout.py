@@ -0,0 +1,111 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import FANOUT_MAX_WORKERS, MAX_N
+from .errors import _error
+from .metrics import _incr
+from .retries import _bind_deadline
+
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def _fanout_executor():
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=FANOUT_MAX_WORKERS, thread_name_prefix="fanout")
+        return _EXECUTOR
+
+
+def _requested_n(payload):
+    """Pop ``n`` from a chat body; returns ``(n, error_response)``."""
+    n = payload.pop("n", None)
+    if n is None:
+        return 1, None
+    if isinstance(n, bool) or not isinstance(n, int) or n < 1:
+        return None, _error(
+            "n must be a positive integer.", status=400, error_type="invalid_request_error", param="n"
+        )
+    if n > MAX_N:
+        return None, _error(
+            f"n must be at most {MAX_N}.", status=400, error_type="invalid_request_error", param="n"
+        )
+    return n, None
+
+
+def _fan_out(call, n):
+    """Run ``call()`` ``n`` times concurrently and return the results in order.
+
+    One call runs on the caller's thread and the rest on the fan-out pool. If
+    any call fails, the first error is raised and results that hold a stream
+    are closed.
+    """
+    _incr("fanout.requests")
+    _incr("fanout.upstream_calls", n)
+    futures = [_fanout_executor().submit(_bind_deadline(call)) for _ in range(n - 1)]
+    first = None
+    try:
+        first = call()
+        return [first] + [future.result() for future in futures]
+    except Exception:
+        for future in futures:
+            future.cancel()
+        leftovers = [first]
+        leftovers.extend(
+            future.result() for future in futures if not future.cancelled() and future.exception() is None
+        )
+        for result in leftovers:
+            close = getattr(result, "close", None)
+            if close is not None:
+                close()
+        raise
+
+
+def _deferred_stream(open_stream):
+    """Open ``open_stream()`` on first iteration, from the thread that then reads it."""
+    stream = open_stream()
+    try:
+        yield from stream
+    finally:
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+
+
+def _fan_out_streams(open_stream, n):
+    """Open ``n`` streams for one request; returns them in order.
+
+    The first is opened here, so an upstream error still becomes an HTTP
+    error. The rest open lazily on the threads that read them: each stream is
+    drained as soon as it opens and frees its limiter permit when done, so
+    streams waiting for a permit never wait on streams nobody is reading.
+    """
+    _incr("fanout.requests")
+    _incr("fanout.upstream_calls", n)
+    first = open_stream()
+    return [first] + [_deferred_stream(_bind_deadline(open_stream)) for _ in range(n - 1)]
+
+
+def _merge_chat_completions(bodies):
+    """Combine single-choice chat completions into one body with indexed ``choices``.
+
+    Every choice answered the same prompt, so ``prompt_tokens`` is counted
+    once; completion tokens are summed.
+    """
+    merged = dict(bodies[0])
+    merged["choices"] = []
+    usage = {}
+    for index, body in enumerate(bodies):
+        for choice in body.get("choices") or []:
+            merged["choices"].append(dict(choice, index=index))
+        for key, value in (body.get("usage") or {}).items():
+            if key in {"prompt_tokens", "total_tokens"} or not isinstance(value, int):
+                usage.setdefault(key, value)
+            else:
+                usage[key] = usage.get(key, 0) + value
+    if isinstance(usage.get("prompt_tokens"), int) and isinstance(usage.get("completion_tokens"), int):
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+    if usage:
+        merged["usage"] = usage
+    return merged
@@ -0,0 +1,5 @@
+def _field(obj, name):
+    """Read an event attribute without ``model_dump``-ing the whole SDK object."""
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
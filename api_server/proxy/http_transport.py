@@ -0,0 +1,37 @@
+import gzip
+
+import httpx
+from openai import DEFAULT_CONNECTION_LIMITS, DefaultHttpxClient
+
+from .config import UPSTREAM_COMPRESS_MIN_BYTES
+from .metrics import _incr
+
+_COMPRESSIBLE_METHODS = {"POST", "PUT", "PATCH"}
+
+
+class _CompressingTransport(httpx.HTTPTransport):
+    """Gzip large upstream request bodies; only useful when the upstream accepts ``Content-Encoding``."""
+
+    def handle_request(self, request):
+        if request.method in _COMPRESSIBLE_METHODS and "content-encoding" not in request.headers:
+            body = request.read()
+            if len(body) >= UPSTREAM_COMPRESS_MIN_BYTES:
+                compressed = gzip.compress(body, compresslevel=6)
+                headers = request.headers.copy()
+                headers.pop("content-length", None)
+                headers["Content-Encoding"] = "gzip"
+                request = httpx.Request(
+                    request.method,
+                    request.url,
+                    headers=headers,
+                    content=compressed,
+                    extensions=request.extensions,
+                )
+                _incr("upstream_compression.requests")
+                _incr("upstream_compression.bytes_saved", len(body) - len(compressed))
+        return super().handle_request(request)
+
+
+def _compressing_http_client():
+    # httpx ignores the client's ``limits`` when given a transport, so the SDK's pool limits go on the transport.
+    return DefaultHttpxClient(transport=_CompressingTransport(limits=DEFAULT_CONNECTION_LIMITS))
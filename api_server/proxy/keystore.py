@@ -0,0 +1,256 @@
+import collections
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .config import AUTH_CACHE_SIZE, KEYSTORE_PATH, KEYSTORE_RELOAD_INTERVAL, PROXY_API_KEYS
+from .logger import logger
+from .metrics import _incr, _set_gauge
+
+_MAX_TOKEN_PARAMS = ("max_tokens", "max_completion_tokens", "max_output_tokens")
+_SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+
+class KeyStoreError(Exception):
+    pass
+
+
+def _key_digest(token):
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _digest_set(tokens):
+    """SHA-256 digests of ``tokens``, so membership checks hash the caller's token instead of comparing strings."""
+    return frozenset(_key_digest(token) for token in tokens)
+
+
+class KeyPolicy:
+    """What one proxy API key may do: upstream key, allowed models, default params and limits."""
+
+    __slots__ = ("key_sha256", "name", "upstream_key", "allowed_models", "default_params", "limits")
+
+    def __init__(self, key_sha256, name=None, upstream_key=None, allowed_models=None, default_params=None, limits=None):
+        self.key_sha256 = key_sha256
+        self.name = name
+        self.upstream_key = upstream_key or None
+        self.allowed_models = tuple(allowed_models) if allowed_models else None
+        self.default_params = dict(default_params or {})
+        self.limits = dict(limits or {})
+
+    def allows_model(self, model):
+        if self.allowed_models is None:
+            return True
+        model = str(model or "")
+        for allowed in self.allowed_models:
+            if allowed == model or (allowed.endswith("*") and model.startswith(allowed[:-1])):
+                return True
+        return False
+
+    def apply(self, payload):
+        """Fill default params and clamp token limits in place; return an error message or None."""
+        if not self.allows_model(payload.get("model")):
+            return f"Model {payload.get('model')!r} is not allowed for this API key."
+        for name, value in self.default_params.items():
+            payload.setdefault(name, value)
+        max_tokens = self.limits.get("max_tokens")
+        if max_tokens:
+            for name in _MAX_TOKEN_PARAMS:
+                value = payload.get(name)
+                if isinstance(value, int) and value > max_tokens:
+                    payload[name] = max_tokens
+        return None
+
+
+def _policy_from_entry(entry):
+    if isinstance(entry, str):
+        entry = {"key": entry}
+    if not isinstance(entry, dict):
+        raise KeyStoreError(f"Key entries must be strings or objects, got {type(entry).__name__}.")
+    digest = entry.get("key_sha256")
+    if not digest and entry.get("key"):
+        digest = _key_digest(entry["key"])
+    if not isinstance(digest, str) or len(digest) != 64:
+        raise KeyStoreError("Each key entry needs `key` or a 64-character `key_sha256`.")
+    return KeyPolicy(
+        digest.lower(),
+        name=entry.get("name"),
+        upstream_key=entry.get("upstream_key"),
+        allowed_models=entry.get("allowed_models"),
+        default_params=entry.get("default_params"),
+        limits=entry.get("limits"),
+    )
+
+
+def _json_column(row, name):
+    value = row[name] if name in row.keys() else None
+    return json.loads(value) if value else None
+
+
+def _load_sqlite(path):
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    connection.row_factory = sqlite3.Row
+    try:
+        rows = connection.execute("SELECT * FROM api_keys").fetchall()
+    finally:
+        connection.close()
+    entries = []
+    for row in rows:
+        columns = row.keys()
+        entries.append(
+            {
+                "key": row["key"] if "key" in columns else None,
+                "key_sha256": row["key_sha256"] if "key_sha256" in columns else None,
+                "name": row["name"] if "name" in columns else None,
+                "upstream_key": row["upstream_key"] if "upstream_key" in columns else None,
+                "allowed_models": _json_column(row, "allowed_models"),
+                "default_params": _json_column(row, "default_params"),
+                "limits": _json_column(row, "limits"),
+            }
+        )
+    return entries
+
+
+def _load_entries(path):
+    if path.endswith(_SQLITE_SUFFIXES):
+        return _load_sqlite(path)
+    with open(path, "r", encoding="utf-8") as handle:
+        data = json.load(handle)
+    if isinstance(data, dict):
+        data = data.get("keys", [])
+    if not isinstance(data, list):
+        raise KeyStoreError("Key file must be a JSON list or an object with a `keys` list.")
+    return data
+
+
+class KeyStore:
+    """Proxy API keys indexed by SHA-256, with a bounded LRU of recently used keys."""
+
+    def __init__(self, policies, source=None, mtime=None):
+        self.policies = {policy.key_sha256: policy for policy in policies}
+        self.source = source
+        self.mtime = mtime
+        self.loaded_at = time.time()
+        self.decisions = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.policies)
+
+    def lookup(self, token):
+        """Return the :class:`KeyPolicy` for ``token``, or None if it is not a valid key.
+
+        Only valid keys are cached, by digest, so neither raw tokens nor a
+        stream of invalid ones are held in memory.
+        """
+        digest = _key_digest(token)
+        with self.lock:
+            policy = self.decisions.get(digest)
+            if policy is not None:
+                self.decisions.move_to_end(digest)
+        if policy is not None:
+            _incr("auth.cache_hits")
+            return policy
+        _incr("auth.cache_misses")
+        policy = self.policies.get(digest)
+        if policy is not None:
+            with self.lock:
+                self.decisions[digest] = policy
+                while len(self.decisions) > AUTH_CACHE_SIZE:
+                    self.decisions.popitem(last=False)
+        return policy
+
+
+def _build_keystore():
+    entries = list(PROXY_API_KEYS)
+    mtime = None
+    if KEYSTORE_PATH:
+        mtime = os.stat(KEYSTORE_PATH).st_mtime
+        entries.extend(_load_entries(KEYSTORE_PATH))
+    policies = [_policy_from_entry(entry) for entry in entries]
+    return KeyStore(policies, KEYSTORE_PATH, mtime)
+
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+_NEXT_CHECK = 0.0
+_LOAD_ERROR = None
+_RATE_LOCK = threading.Lock()
+_RATE_MINUTE = None
+_RATE_WINDOWS = {}
+
+
+def _reload_keystore():
+    """Load the key store again; on failure the previous store stays active and the error is raised."""
+    global _STORE, _LOAD_ERROR
+    try:
+        store = _build_keystore()
+    except (OSError, ValueError, sqlite3.Error, KeyStoreError) as exc:
+        _incr("keystore.reload_failed")
+        raise KeyStoreError(f"Failed to load key store {KEYSTORE_PATH}: {exc}") from exc
+    with _STORE_LOCK:
+        _STORE = store
+        _LOAD_ERROR = None
+    _incr("keystore.reloads")
+    _set_gauge("keystore.keys", len(store))
+    logger.info("keystore.loaded keys=%s source=%s", len(store), store.source or "PROXY_API_KEYS")
+    return store
+
+
+def _source_changed(store):
+    try:
+        return os.stat(KEYSTORE_PATH).st_mtime != store.mtime
+    except OSError:
+        return False
+
+
+def _keystore():
+    """Return the active key store, reloading it when the key file changed.
+
+    Raises :class:`KeyStoreError` while no store has loaded yet. A failed
+    first load is retried at most every ``PROXY_KEYSTORE_RELOAD_INTERVAL``
+    seconds (with ``0``, only by an explicit reload), not on every request.
+    """
+    global _NEXT_CHECK, _LOAD_ERROR
+    store = _STORE
+    if store is None:
+        now = time.monotonic()
+        error = _LOAD_ERROR
+        if error is not None and (KEYSTORE_RELOAD_INTERVAL <= 0 or now < _NEXT_CHECK):
+            raise error
+        _NEXT_CHECK = now + KEYSTORE_RELOAD_INTERVAL
+        try:
+            return _reload_keystore()
+        except KeyStoreError as exc:
+            logger.exception("Key store unavailable.")
+            _LOAD_ERROR = exc
+            raise
+    if KEYSTORE_PATH and KEYSTORE_RELOAD_INTERVAL > 0:
+        now = time.monotonic()
+        if now >= _NEXT_CHECK:
+            _NEXT_CHECK = now + KEYSTORE_RELOAD_INTERVAL
+            if _source_changed(store):
+                try:
+                    store = _reload_keystore()
+                except KeyStoreError:
+                    logger.exception("Keeping the previous key store.")
+    return store
+
+
+def _admit_request(policy):
+    """Count a request against the key's ``requests_per_minute`` limit; False once it is exceeded."""
+    global _RATE_MINUTE
+    limit = policy.limits.get("requests_per_minute")
+    if not limit:
+        return True
+    minute = int(time.time() // 60)
+    with _RATE_LOCK:
+        if minute != _RATE_MINUTE:
+            # Fixed one-minute windows: counts from earlier minutes are never read again.
+            _RATE_WINDOWS.clear()
+            _RATE_MINUTE = minute
+        count = _RATE_WINDOWS.get(policy.key_sha256, 0) + 1
+        _RATE_WINDOWS[policy.key_sha256] = count
+    return count <= limit
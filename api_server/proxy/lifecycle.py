@@ -0,0 +1,92 @@
+import threading
+import time
+
+from .config import (
+    IMPORT_BUDGET_MS,
+    PROXY_FORWARD_AUTH_HEADER,
+    WARMUP_CONNECT,
+    WARMUP_ENABLED,
+    WARMUP_MAX_WAIT,
+    WARMUP_RETRY_INTERVAL,
+    WARMUP_TIMEOUT,
+    get_config,
+)
+from .logger import logger
+from .metrics import _incr, _set_gauge
+
+_READY = threading.Event()
+_WARMUP_LOCK = threading.Lock()
+_WARMUP_STARTED = False
+_WARMUP_FAILED = False
+
+
+def _is_ready():
+    return _READY.is_set()
+
+
+def _wait_ready(timeout=None):
+    return _READY.wait(timeout)
+
+
+def _warmup_failed():
+    """True when warm-up gave up after ``PROXY_WARMUP_MAX_WAIT`` and readiness was flipped regardless."""
+    return _WARMUP_FAILED
+
+
+def _check_import_budget(start):
+    import_ms = (time.perf_counter() - start) * 1000.0
+    _set_gauge("startup.import_ms", round(import_ms, 2))
+    if IMPORT_BUDGET_MS and import_ms > IMPORT_BUDGET_MS:
+        logger.warning("Proxy import took %.2f ms, over the %.0f ms budget.", import_ms, IMPORT_BUDGET_MS)
+    return import_ms
+
+
+def _warm_up():
+    global _WARMUP_FAILED
+    from .client import _get_client
+    from .upstream import _list_models
+
+    start = time.perf_counter()
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            import openai
+
+            api_key = get_config().openai_api_key
+            if not PROXY_FORWARD_AUTH_HEADER and api_key:
+                client = _get_client(api_key)
+                if WARMUP_CONNECT:
+                    # Any HTTP answer (even 401/404) proves the pooled connection is established.
+                    try:
+                        _list_models(client.with_options(timeout=WARMUP_TIMEOUT))
+                    except openai.APIStatusError:
+                        pass
+            break
+        except Exception as exc:  # pragma: no cover - upstream may simply be unreachable yet
+            logger.warning("Warm-up attempt %s failed: %s", attempt, exc)
+            if WARMUP_MAX_WAIT > 0 and time.perf_counter() - start + WARMUP_RETRY_INTERVAL > WARMUP_MAX_WAIT:
+                _WARMUP_FAILED = True
+                break
+            time.sleep(WARMUP_RETRY_INTERVAL)
+    duration_ms = (time.perf_counter() - start) * 1000.0
+    _set_gauge("startup.warmup_ms", round(duration_ms, 2))
+    if _WARMUP_FAILED:
+        _incr("startup.warmup_failed")
+        logger.error("Warm-up gave up after %s attempts (%.2f ms); serving without a warm connection.", attempt, duration_ms)
+    else:
+        logger.info("Proxy ready after warm-up (%.2f ms, attempts=%s)", duration_ms, attempt)
+    _READY.set()
+
+
+def _start_warmup():
+    """Prime the SDK import and upstream connection in the background, then flip readiness."""
+    global _WARMUP_STARTED
+    with _WARMUP_LOCK:
+        if _WARMUP_STARTED:
+            return
+        _WARMUP_STARTED = True
+    if not WARMUP_ENABLED:
+        _READY.set()
+        return
+    threading.Thread(target=_warm_up, name="proxy-warmup", daemon=True).start()
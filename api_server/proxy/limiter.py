@@ -0,0 +1,189 @@
+import threading
+import time
+
+from .config import (
+    ADAPTIVE_LIMIT_BACKOFF,
+    ADAPTIVE_LIMIT_ENABLED,
+    ADAPTIVE_LIMIT_INITIAL,
+    ADAPTIVE_LIMIT_MAX,
+    ADAPTIVE_LIMIT_MAX_QUEUE,
+    ADAPTIVE_LIMIT_MIN,
+    ADAPTIVE_LIMIT_QUEUE_TIMEOUT,
+    ADAPTIVE_LIMIT_TOLERANCE,
+)
+from .errors import UpstreamOverloadedError, _retry_after_seconds
+from .metrics import _incr, _set_gauge
+
+_SHORT_ALPHA = 0.2
+_LONG_ALPHA = 0.01
+_DECREASE_SMOOTHING = 0.2
+_WARMUP_SAMPLES = 20
+
+
+class _LatencyTracker:
+    """Short-term smoothed latency against a long-term average baseline.
+
+    Comparing two averages of the same distribution keeps the gradient near 1
+    for a healthy upstream whose latencies simply vary a lot; only a sustained
+    rise of the recent average over the long-term one lowers it.
+    """
+
+    def __init__(self):
+        self.baseline = None
+        self.smoothed = None
+        self.samples = 0
+
+    def add(self, latency):
+        self.samples += 1
+        if self.smoothed is None:
+            self.baseline = self.smoothed = latency
+            return
+        self.smoothed += _SHORT_ALPHA * (latency - self.smoothed)
+        self.baseline += _LONG_ALPHA * (latency - self.baseline)
+
+    def gradient(self):
+        if self.samples < _WARMUP_SAMPLES or not self.baseline or not self.smoothed:
+            return 1.0
+        return min(1.0, self.baseline * ADAPTIVE_LIMIT_TOLERANCE / self.smoothed)
+
+
+class _Permit:
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.start = time.monotonic()
+        self.released = False
+
+    def observe(self, latency=None, kind="latency"):
+        if latency is None:
+            latency = time.monotonic() - self.start
+        self.limiter._observe(latency, kind)
+
+    def release(self, error=None):
+        if self.released:
+            return
+        self.released = True
+        self.limiter._release(error)
+
+
+class _NullPermit:
+    def observe(self, latency=None, kind="latency"):
+        return None
+
+    def release(self, error=None):
+        return None
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit for upstream calls.
+
+    The limit grows by roughly one slot per round of fully used permits while
+    latency stays within ``tolerance`` of its baseline, shrinks proportionally
+    when latency rises, and is cut by ``backoff`` on 429/5xx or transport errors.
+    ``Retry-After`` hints pause new admissions until they expire.
+    """
+
+    def __init__(self, initial, min_limit, max_limit, queue_timeout, max_queue, backoff):
+        self.min_limit = max(min_limit, 1)
+        self.max_limit = max(max_limit, self.min_limit)
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+        self.backoff = backoff
+        self.in_flight = 0
+        self.waiting = 0
+        self.blocked_until = 0.0
+        self.trackers = {}
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        deadline = time.monotonic() + self.queue_timeout
+        with self.cond:
+            if self.max_queue and self.waiting >= self.max_queue:
+                _incr("upstream.limiter_rejected")
+                raise UpstreamOverloadedError("Upstream request queue is full.", retry_after=1.0)
+            self.waiting += 1
+            self._publish()
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self.blocked_until > deadline:
+                        _incr("upstream.limiter_rejected")
+                        raise UpstreamOverloadedError(
+                            "Upstream is rate limited.",
+                            retry_after=self.blocked_until - now,
+                        )
+                    if now >= self.blocked_until and self.in_flight < int(self.limit):
+                        break
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        _incr("upstream.limiter_rejected")
+                        raise UpstreamOverloadedError(
+                            "Timed out waiting for upstream capacity.",
+                            retry_after=max(self.blocked_until - now, 1.0),
+                        )
+                    wait = remaining
+                    if self.blocked_until > now:
+                        wait = min(wait, self.blocked_until - now)
+                    self.cond.wait(wait)
+                self.in_flight += 1
+            finally:
+                self.waiting -= 1
+                self._publish()
+        return _Permit(self)
+
+    def _observe(self, latency, kind):
+        with self.cond:
+            tracker = self.trackers.get(kind)
+            if tracker is None:
+                tracker = self.trackers[kind] = _LatencyTracker()
+            tracker.add(latency)
+            gradient = tracker.gradient()
+            if gradient < 1.0:
+                self.limit = max(self.min_limit, self.limit * (1.0 - _DECREASE_SMOOTHING * (1.0 - gradient)))
+            elif self.in_flight >= int(self.limit) - 1:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._publish()
+
+    def _release(self, error):
+        overloaded = error is not None and _is_overload(error)
+        retry_after = _retry_after_seconds(error) if overloaded else None
+        with self.cond:
+            self.in_flight -= 1
+            if overloaded:
+                _incr("upstream.overload")
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                if retry_after:
+                    self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            self._publish()
+            self.cond.notify_all()
+
+    def _publish(self):
+        _set_gauge("upstream.limit", int(self.limit))
+        _set_gauge("upstream.in_flight", self.in_flight)
+        _set_gauge("upstream.queue_depth", self.waiting)
+
+
+def _is_overload(error):
+    status = getattr(error, "status_code", None)
+    if status is None:
+        # Connection failures and timeouts carry no status and signal saturation too.
+        return type(error).__name__ in {"APIConnectionError", "APITimeoutError"}
+    return status == 429 or status >= 500
+
+
+_UPSTREAM_LIMITER = None
+if ADAPTIVE_LIMIT_ENABLED:
+    _UPSTREAM_LIMITER = AdaptiveLimiter(
+        ADAPTIVE_LIMIT_INITIAL,
+        ADAPTIVE_LIMIT_MIN,
+        ADAPTIVE_LIMIT_MAX,
+        ADAPTIVE_LIMIT_QUEUE_TIMEOUT,
+        ADAPTIVE_LIMIT_MAX_QUEUE,
+        ADAPTIVE_LIMIT_BACKOFF,
+    )
+
+
+def _acquire_upstream_permit():
+    if _UPSTREAM_LIMITER is None:
+        return _NullPermit()
+    return _UPSTREAM_LIMITER.acquire()
@@ -1,17 +1,6 @@
 import json
-import time
-
-from flask import g, request
-
-from .config import (
-    LOG_MAX_CHARS,
-    LOG_PAYLOAD_MAX_CHARS,
-    LOG_PAYLOAD_MAX_DEPTH,
-    LOG_PAYLOAD_MAX_ITEMS,
-    LOG_PAYLOADS,
-    LOG_STREAM_EVENTS,
-    LOG_TOOL_CALLS,
-)
+
+from .config import get_config
 from .logger import logger
 
 
@@ -19,18 +8,20 @@ def _truncate_log(value):
     if value is None:
         return ""
     text = value if isinstance(value, str) else str(value)
-    if len(text) <= LOG_MAX_CHARS:
+    limit = get_config().log_max_chars
+    if len(text) <= limit:
         return text
-    return f"{text[:LOG_MAX_CHARS]}...<truncated>"
+    return f"{text[:limit]}...<truncated>"
 
 
 def _truncate_payload(value):
     if value is None:
         return ""
     text = value if isinstance(value, str) else str(value)
-    if len(text) <= LOG_PAYLOAD_MAX_CHARS:
+    limit = get_config().log_payload_max_chars
+    if len(text) <= limit:
         return text
-    return f"{text[:LOG_PAYLOAD_MAX_CHARS]}...<truncated>"
+    return f"{text[:limit]}...<truncated>"
 
 
 def _safe_json_dumps(value):
@@ -41,7 +32,9 @@ def _safe_json_dumps(value):
 
 
 def _summarize_payload(value, depth=0):
-    if depth >= LOG_PAYLOAD_MAX_DEPTH:
+    config = get_config()
+    max_items = config.log_payload_max_items
+    if depth >= config.log_payload_max_depth:
         return "<max_depth>"
     if value is None or isinstance(value, (bool, int, float)):
         return value
@@ -53,22 +46,22 @@ def _summarize_payload(value, depth=0):
         result = {}
         items = list(value.items())
         for idx, (key, val) in enumerate(items):
-            if idx >= LOG_PAYLOAD_MAX_ITEMS:
-                result["<truncated_keys>"] = len(items) - LOG_PAYLOAD_MAX_ITEMS
+            if idx >= max_items:
+                result["<truncated_keys>"] = len(items) - max_items
                 break
             result[str(key)] = _summarize_payload(val, depth + 1)
         return result
     if isinstance(value, (list, tuple)):
         items = list(value)
-        summarized = [_summarize_payload(item, depth + 1) for item in items[:LOG_PAYLOAD_MAX_ITEMS]]
-        if len(items) > LOG_PAYLOAD_MAX_ITEMS:
-            summarized.append(f"<truncated_items:{len(items) - LOG_PAYLOAD_MAX_ITEMS}>")
+        summarized = [_summarize_payload(item, depth + 1) for item in items[:max_items]]
+        if len(items) > max_items:
+            summarized.append(f"<truncated_items:{len(items) - max_items}>")
         return summarized
     return _truncate_payload(str(value))
 
 
 def _log_payload(label, payload):
-    if not LOG_PAYLOADS:
+    if not get_config().log_payloads:
         return
     summarized = _summarize_payload(payload)
     text = _safe_json_dumps(summarized)
@@ -76,7 +69,7 @@ def _log_payload(label, payload):
 
 
 def _log_stream_event(label, payload):
-    if not LOG_STREAM_EVENTS:
+    if not get_config().log_stream_events:
         return
     summarized = _summarize_payload(payload)
     text = _safe_json_dumps(summarized)
@@ -84,7 +77,7 @@ def _log_stream_event(label, payload):
 
 
 def _log_tool_call(name, arguments, call_id, source):
-    if not LOG_TOOL_CALLS:
+    if not get_config().log_tool_calls:
         return
     logger.info(
         "Tool call (%s) name=%s call_id=%s arguments=%s",
@@ -94,16 +87,3 @@ def _log_tool_call(name, arguments, call_id, source):
         _truncate_log(arguments),
     )
 
-
-def _log_request_complete(status_code, stream=False):
-    start_time = getattr(g, "start_time", None)
-    duration_ms = (time.time() - start_time) * 1000.0 if start_time else 0.0
-    logger.info(
-        "request.complete request_id=%s method=%s path=%s status=%s duration_ms=%.2f stream=%s",
-        getattr(g, "request_id", None),
-        request.method,
-        request.path,
-        status_code,
-        duration_ms,
-        stream,
-    )
@@ -0,0 +1,25 @@
+import threading
+
+_LOCK = threading.Lock()
+_COUNTERS = {}
+_GAUGES = {}
+
+
+def _incr(name, value=1):
+    with _LOCK:
+        _COUNTERS[name] = _COUNTERS.get(name, 0) + value
+
+
+def _set_gauge(name, value):
+    with _LOCK:
+        _GAUGES[name] = value
+
+
+def _add_gauge(name, delta):
+    with _LOCK:
+        _GAUGES[name] = _GAUGES.get(name, 0) + delta
+
+
+def _metrics_snapshot():
+    with _LOCK:
+        return {"counters": dict(_COUNTERS), "gauges": dict(_GAUGES)}
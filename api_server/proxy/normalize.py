@@ -2,8 +2,11 @@ import json
 import time
 import uuid
 
-from .config import PROXY_TOOL_SCHEMA_OVERRIDES, _DEFAULT_TOOL_SCHEMAS
-from .logging_utils import _log_tool_call
+from .config import get_config
+from .logger import logger
+from .logging_utils import _log_payload, _log_tool_call
+from .timing import _span
+from .tokens import _apply_context_policy
 
 
 def _schema_is_empty(schema):
@@ -29,10 +32,7 @@ def _schema_is_empty(schema):
 def _get_tool_schema_override(name):
     if not name:
         return None
-    override = PROXY_TOOL_SCHEMA_OVERRIDES.get(name)
-    if isinstance(override, dict) and override:
-        return override
-    return _DEFAULT_TOOL_SCHEMAS.get(name)
+    return get_config().tool_schemas.get(name)
 
 
 def _normalize_tool_definitions(tools):
@@ -85,7 +85,20 @@ def _ensure_json_str(value, default=""):
         return str(value)
 
 
-def _convert_chat_messages_to_responses_input(messages):
+def _resolve_message_content(content, resolve_content):
+    if resolve_content is None:
+        return content
+    if isinstance(content, list):
+        parts = []
+        for part in content:
+            if isinstance(part, dict) and part.get("type") == "content_ref":
+                part = {"type": "text", "text": resolve_content(part)}
+            parts.append(part)
+        return parts
+    return resolve_content(content)
+
+
+def _convert_chat_messages_to_responses_input(messages, resolve_content=None):
     input_items = []
     call_id_by_name = {}
     call_id_counter = 0
@@ -103,7 +116,7 @@ def _convert_chat_messages_to_responses_input(messages):
         role = msg.get("role")
         tool_calls = msg.get("tool_calls")
         if tool_calls:
-            content = msg.get("content")
+            content = _resolve_message_content(msg.get("content"), resolve_content)
             if content:
                 input_items.append({"role": "assistant", "content": content})
             for call in tool_calls:
@@ -128,7 +141,7 @@ def _convert_chat_messages_to_responses_input(messages):
 
         function_call = msg.get("function_call")
         if function_call:
-            content = msg.get("content")
+            content = _resolve_message_content(msg.get("content"), resolve_content)
             if content:
                 input_items.append({"role": "assistant", "content": content})
             if isinstance(function_call, dict):
@@ -154,7 +167,7 @@ def _convert_chat_messages_to_responses_input(messages):
                 call_id = call_id_by_name.get(msg["name"])
             if not call_id:
                 call_id = next_call_id()
-            output = msg.get("content")
+            output = _resolve_message_content(msg.get("content"), resolve_content)
             if output is None:
                 output = ""
             if not isinstance(output, str):
@@ -168,7 +181,7 @@ def _convert_chat_messages_to_responses_input(messages):
             )
             continue
 
-        item = {"role": role, "content": msg.get("content")}
+        item = {"role": role, "content": _resolve_message_content(msg.get("content"), resolve_content)}
         if "name" in msg:
             item["name"] = msg["name"]
         if "metadata" in msg:
@@ -178,7 +191,7 @@ def _convert_chat_messages_to_responses_input(messages):
     return input_items
 
 
-def _normalize_chat_payload_for_responses(payload):
+def _normalize_chat_payload_for_responses(payload, resolve_content=None):
     if not isinstance(payload, dict):
         return payload
 
@@ -187,7 +200,7 @@ def _normalize_chat_payload_for_responses(payload):
     if "messages" in data and "input" not in data:
         messages = data.get("messages")
         if isinstance(messages, list):
-            data["input"] = _convert_chat_messages_to_responses_input(messages)
+            data["input"] = _convert_chat_messages_to_responses_input(messages, resolve_content)
         else:
             data["input"] = messages
     data.pop("messages", None)
@@ -236,8 +249,6 @@ def _normalize_chat_payload_for_responses(payload):
         data.pop("reasoning_effort", None)
 
     if "n" in data:
-        from .logger import logger
-
         logger.warning("Responses API does not support n; ignoring.")
         data.pop("n", None)
 
@@ -245,18 +256,60 @@ def _normalize_chat_payload_for_responses(payload):
 
 
 def _apply_param_rules(payload):
-    from .config import OPENAI_PARAM_DEFAULTS, OPENAI_PARAM_DROP, OPENAI_PARAM_OVERRIDES
-
+    config = get_config()
     data = dict(payload or {})
-    for key in OPENAI_PARAM_DROP:
+    for key in config.param_drop:
         data.pop(key, None)
-    for key, value in OPENAI_PARAM_DEFAULTS.items():
+    for key, value in config.param_defaults.items():
         data.setdefault(key, value)
-    for key, value in OPENAI_PARAM_OVERRIDES.items():
-        data[key] = value
+    data.update(config.param_overrides)
     return data
 
 
+def _prepare_responses_request(payload, resolve_content=None, stats=None):
+    """Run an incoming chat/responses body through normalization, param rules and the context policy.
+
+    Returns ``(payload, return_chat)`` where ``return_chat`` tells whether the
+    caller expects a Chat Completions shaped result. ``resolve_content`` expands
+    ``content_ref`` message bodies (see :mod:`.content_store`); ``stats``
+    receives the token estimate (see :mod:`.tokens`).
+    """
+    return_chat = isinstance(payload, dict) and "messages" in payload
+    _log_payload("incoming.raw", payload)
+    with _span("normalize"):
+        payload = _normalize_chat_payload_for_responses(payload, resolve_content)
+    _log_payload("incoming.normalized", payload)
+    _log_payload("incoming.input_summary", payload.get("input") if isinstance(payload, dict) else None)
+    with _span("param_rules"):
+        payload = _apply_param_rules(payload)
+    # After param rules, so the window and output reserve are those of the model and limits actually sent.
+    payload = _apply_context_policy(payload, stats)
+    _log_payload("incoming.final", payload)
+    return payload, return_chat
+
+
+def _prepare_chat_request(payload, resolve_content=None):
+    """Prepare a Chat Completions body for an upstream that serves Chat Completions natively.
+
+    Only ``content_ref`` expansion and param rules are applied; messages are
+    otherwise passed through untouched.
+    """
+    _log_payload("incoming.raw", payload)
+    if resolve_content is not None and isinstance(payload.get("messages"), list):
+        with _span("normalize"):
+            payload = dict(payload)
+            payload["messages"] = [
+                dict(msg, content=_resolve_message_content(msg.get("content"), resolve_content))
+                if isinstance(msg, dict) and msg.get("content") is not None
+                else msg
+                for msg in payload["messages"]
+            ]
+    with _span("param_rules"):
+        payload = _apply_param_rules(payload)
+    _log_payload("incoming.final", payload)
+    return payload
+
+
 def _serialize_model(obj):
     if hasattr(obj, "model_dump"):
         return obj.model_dump()
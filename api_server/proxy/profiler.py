@@ -0,0 +1,114 @@
+import collections
+import os
+import sys
+import threading
+import time
+
+from .metrics import _incr, _set_gauge
+
+
+class ProfilerBusyError(Exception):
+    pass
+
+
+def _frame_label(code):
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class SamplingProfiler:
+    """Statistical profiler that samples every thread's stack with ``sys._current_frames``.
+
+    Stacks are aggregated as collapsed lines (``root;...;leaf count``) that
+    flamegraph.pl and speedscope read directly. With ``match_header`` set, only
+    threads registered through :meth:`track`/:meth:`untrack` are sampled.
+    """
+
+    def __init__(self, interval, match_header=None):
+        self.interval = interval
+        self.match_header = match_header
+        self.only_threads = bool(match_header)
+        self.tracked = set()
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.sample_seconds = 0.0
+        self.wall_seconds = 0.0
+        self.stop_event = threading.Event()
+
+    def track(self, ident):
+        self.tracked.add(ident)
+
+    def untrack(self, ident):
+        self.tracked.discard(ident)
+
+    def sample(self):
+        start = time.perf_counter()
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        tracked = self.tracked if self.only_threads else None
+        for ident, frame in sys._current_frames().items():
+            if ident == own or (tracked is not None and ident not in tracked):
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            labels.append(names.get(ident, f"thread-{ident}"))
+            labels.reverse()
+            self.stacks[";".join(labels)] += 1
+        self.samples += 1
+        self.sample_seconds += time.perf_counter() - start
+
+    def run(self, duration):
+        deadline = time.monotonic() + duration
+        while not self.stop_event.is_set() and time.monotonic() < deadline:
+            self.sample()
+            self.stop_event.wait(self.interval)
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def overhead(self):
+        return self.sample_seconds / self.wall_seconds if self.wall_seconds > 0 else 0.0
+
+
+_ACTIVE = None
+_ACTIVE_LOCK = threading.Lock()
+
+
+def _profile(duration, interval, match_header=None):
+    """Sample for ``duration`` seconds on the calling thread and return the finished profiler.
+
+    Only one profile runs at a time; a second caller gets :class:`ProfilerBusyError`.
+    """
+    global _ACTIVE
+    profiler = SamplingProfiler(interval, match_header)
+    with _ACTIVE_LOCK:
+        if _ACTIVE is not None:
+            raise ProfilerBusyError("A profile is already running.")
+        _ACTIVE = profiler
+    _set_gauge("profiler.active", 1)
+    start = time.perf_counter()
+    try:
+        profiler.run(duration)
+    finally:
+        with _ACTIVE_LOCK:
+            _ACTIVE = None
+        _set_gauge("profiler.active", 0)
+    profiler.wall_seconds = time.perf_counter() - start
+    _incr("profiler.samples", profiler.samples)
+    return profiler
+
+
+def _track_request(headers):
+    """Register the current thread with a header-matched profile; returns True when tracked."""
+    profiler = _ACTIVE
+    if profiler is None or not profiler.only_threads or not headers.get(profiler.match_header):
+        return False
+    profiler.track(threading.get_ident())
+    return True
+
+
+def _untrack_request():
+    profiler = _ACTIVE
+    if profiler is not None:
+        profiler.untrack(threading.get_ident())
@@ -0,0 +1,118 @@
+import threading
+import time
+
+from .client import _get_client, _resolve_upstream_key
+from .config import DEFAULT_PROTOCOL, MODEL_PROTOCOLS, PROTOCOL_AUTODETECT, PROTOCOL_CATALOG_TTL
+from .logger import logger
+from .metrics import _incr
+from .normalize import _serialize_model
+from .upstream import _list_models
+
+PROTOCOL_RESPONSES = "responses"
+PROTOCOL_CHAT = "chat"
+
+_CATALOG = {}
+_CATALOG_EXPIRES = 0.0
+_CATALOG_LOCK = threading.Lock()
+_REFRESHING = False
+
+_ENDPOINT_FIELDS = ("supported_endpoints", "endpoints")
+
+
+def _configured_protocol(model):
+    if model in MODEL_PROTOCOLS:
+        return MODEL_PROTOCOLS[model]
+    best = None
+    for prefix, protocol in MODEL_PROTOCOLS.items():
+        if prefix.endswith("*") and model.startswith(prefix[:-1]):
+            if best is None or len(prefix) > len(best[0]):
+                best = (prefix, protocol)
+    return best[1] if best else None
+
+
+def _catalog_protocol(entry):
+    """Infer the protocol a catalog entry is served with, or None when it does not say.
+
+    Understands endpoint lists (``supported_endpoints``/``endpoints``) and
+    capability maps (``capabilities: {"responses": false, "chat_completion": true}``).
+    """
+    for field in _ENDPOINT_FIELDS:
+        endpoints = entry.get(field)
+        if isinstance(endpoints, list):
+            endpoints = {str(endpoint).rstrip("/") for endpoint in endpoints}
+            if any(endpoint.endswith("/responses") for endpoint in endpoints):
+                return PROTOCOL_RESPONSES
+            if any(endpoint.endswith("/chat/completions") for endpoint in endpoints):
+                return PROTOCOL_CHAT
+    capabilities = entry.get("capabilities")
+    if isinstance(capabilities, dict):
+        if capabilities.get("responses"):
+            return PROTOCOL_RESPONSES
+        if capabilities.get("chat_completion") or capabilities.get("chat_completions"):
+            return PROTOCOL_CHAT
+    return None
+
+
+def _update_catalog(models):
+    """Record the protocol of every model in a ``/v1/models`` listing."""
+    global _CATALOG, _CATALOG_EXPIRES
+    data = _serialize_model(models)
+    entries = data.get("data") if isinstance(data, dict) else None
+    if not isinstance(entries, list):
+        return
+    catalog = {}
+    for entry in entries:
+        if isinstance(entry, dict) and entry.get("id"):
+            protocol = _catalog_protocol(entry)
+            if protocol is not None:
+                catalog[entry["id"]] = protocol
+    with _CATALOG_LOCK:
+        _CATALOG = catalog
+        _CATALOG_EXPIRES = time.monotonic() + PROTOCOL_CATALOG_TTL
+
+
+def _refresh_catalog(upstream_key):
+    global _REFRESHING, _CATALOG_EXPIRES
+    try:
+        _update_catalog(_list_models(_get_client(upstream_key)))
+        _incr("protocols.catalog_refreshes")
+    except Exception as exc:  # pragma: no cover - upstream may not expose a catalog
+        _incr("protocols.catalog_failed")
+        logger.warning("Failed to refresh the model catalog for protocol detection: %s", exc)
+        with _CATALOG_LOCK:
+            _CATALOG_EXPIRES = time.monotonic() + PROTOCOL_CATALOG_TTL
+    finally:
+        _REFRESHING = False
+
+
+def _model_protocol(model, token=None):
+    """Return ``"chat"`` or ``"responses"`` for ``model``.
+
+    Explicit ``PROXY_MODEL_PROTOCOLS`` entries win, then (with autodetection)
+    the upstream catalog, then ``PROXY_DEFAULT_PROTOCOL``. A stale catalog is
+    refreshed in the background with the caller's upstream key; the request
+    never waits for it.
+    """
+    global _REFRESHING
+    model = str(model or "")
+    protocol = _configured_protocol(model)
+    if protocol is not None:
+        return protocol
+    if PROTOCOL_AUTODETECT:
+        if time.monotonic() >= _CATALOG_EXPIRES:
+            with _CATALOG_LOCK:
+                start = not _REFRESHING
+                _REFRESHING = True
+            if start:
+                try:
+                    upstream_key = _resolve_upstream_key(token)
+                except ValueError:
+                    _REFRESHING = False
+                    return DEFAULT_PROTOCOL
+                threading.Thread(
+                    target=_refresh_catalog, args=(upstream_key,), name="protocol-catalog", daemon=True
+                ).start()
+        protocol = _CATALOG.get(model)
+        if protocol is not None:
+            return protocol
+    return DEFAULT_PROTOCOL
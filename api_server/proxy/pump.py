@@ -0,0 +1,129 @@
+import queue
+import threading
+import time
+
+from .errors import UpstreamStreamError
+from .metrics import _incr
+
+IDLE = object()
+"""Yielded by :func:`_iter_with_idle` after ``tick`` seconds without an upstream item."""
+
+
+class Notice(str):
+    """Progress text mixed into an event stream; translators send it to the client as an SSE comment."""
+
+
+_QUEUE_SIZE = 64
+_PUT_POLL_SECONDS = 0.5
+_ITEM = "item"
+_END = "end"
+_ERROR = "error"
+
+
+def _close(iterable):
+    close = getattr(iterable, "close", None)
+    if close is not None:
+        close()
+
+
+def _reader(iterable, items, stop, tag=None):
+    def put(entry):
+        while not stop.is_set():
+            try:
+                items.put(entry, timeout=_PUT_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        for item in iterable:
+            if not put((_ITEM, item if tag is None else (tag, item))):
+                _close(iterable)
+                return
+        put((_END, None))
+    except BaseException as exc:  # handed to the consumer thread
+        put((_ERROR, exc))
+
+
+def _iter_with_idle(iterable, idle_timeout=None, tick=None):
+    """Iterate ``iterable`` on a helper thread so the consumer can act on silence.
+
+    Yields :data:`IDLE` after every ``tick`` seconds without an item, and raises
+    :class:`UpstreamStreamError` (504) once ``idle_timeout`` seconds pass without
+    one. With neither set, ``iterable`` is returned unchanged. Closing the
+    returned generator closes ``iterable``.
+    """
+    if not idle_timeout and not tick:
+        return iterable
+    return _pumped(iterable, idle_timeout, tick)
+
+
+def _pumped(iterable, idle_timeout, tick):
+    items = queue.Queue(maxsize=_QUEUE_SIZE)
+    stop = threading.Event()
+    threading.Thread(target=_reader, args=(iterable, items, stop), name="upstream-reader", daemon=True).start()
+    wait = min(value for value in (idle_timeout, tick) if value)
+    last_item = time.monotonic()
+    try:
+        while True:
+            try:
+                kind, value = items.get(timeout=wait)
+            except queue.Empty:
+                if idle_timeout and time.monotonic() - last_item >= idle_timeout:
+                    _incr("upstream.idle_timeouts")
+                    raise UpstreamStreamError(
+                        f"Upstream sent nothing for {idle_timeout:g} seconds.",
+                        status_code=504,
+                        code="upstream_idle_timeout",
+                    )
+                if tick:
+                    yield IDLE
+                continue
+            if kind == _ITEM:
+                last_item = time.monotonic()
+                yield value
+            elif kind == _ERROR:
+                raise value
+            else:
+                return
+    finally:
+        stop.set()
+        _close(iterable)
+
+
+def _merge_iterables(iterables, tick=None):
+    """Interleave several iterables as their items arrive, each read on its own helper thread.
+
+    Yields ``(position, item)`` pairs, and :data:`IDLE` after every ``tick``
+    seconds in which no iterable produced anything. The first error raised by
+    any iterable is re-raised; closing the generator closes them all.
+    """
+    items = queue.Queue(maxsize=_QUEUE_SIZE)
+    stop = threading.Event()
+    for position, iterable in enumerate(iterables):
+        threading.Thread(
+            target=_reader, args=(iterable, items, stop, position), name="upstream-reader", daemon=True
+        ).start()
+    remaining = len(iterables)
+    try:
+        while remaining:
+            try:
+                kind, value = items.get(timeout=tick or None)
+            except queue.Empty:
+                yield IDLE
+                continue
+            if kind == _ITEM:
+                yield value
+            elif kind == _ERROR:
+                raise value
+            else:
+                remaining -= 1
+    finally:
+        stop.set()
+        for iterable in iterables:
+            try:
+                _close(iterable)
+            except ValueError:
+                # A generator busy on its reader thread; the reader closes it once it stops.
+                pass
@@ -0,0 +1,68 @@
+import os
+import signal
+import threading
+import time
+
+from .config import CONFIG_FILE, CONFIG_RELOAD_INTERVAL, KEYSTORE_PATH, _load_config_snapshot
+from .keystore import KeyStoreError, _reload_keystore
+from .logger import logger
+from .metrics import _incr, _set_gauge
+
+_RELOAD_LOCK = threading.Lock()
+_WATCHER_STARTED = False
+
+
+def _reload_config(reason):
+    """Load a new config snapshot (and key store); a failed load keeps the current one.
+
+    Requests already running, including open streams, finish with the snapshot
+    they started with.
+    """
+    with _RELOAD_LOCK:
+        try:
+            config = _load_config_snapshot()
+        except (OSError, ValueError) as exc:
+            _incr("config.reload_failed")
+            logger.error("Config reload (%s) failed, keeping the current config: %s", reason, exc)
+            return None
+        _incr("config.reloads")
+        _set_gauge("config.version", config.version)
+        logger.info("config.reloaded version=%s reason=%s", config.version, reason)
+        if KEYSTORE_PATH:
+            try:
+                _reload_keystore()
+            except KeyStoreError as exc:
+                logger.error("%s", exc)
+        return config
+
+
+def _config_mtime():
+    try:
+        return os.stat(CONFIG_FILE).st_mtime
+    except OSError:
+        return None
+
+
+def _watch_config_file():
+    last = _config_mtime()
+    while True:
+        time.sleep(CONFIG_RELOAD_INTERVAL)
+        current = _config_mtime()
+        if current is not None and current != last:
+            last = current
+            _reload_config("file_changed")
+
+
+def _on_sighup(signum, frame):
+    # Reload off the signal handler so it never waits on a lock the interrupted code holds.
+    threading.Thread(target=_reload_config, args=("sighup",), name="proxy-config-reload", daemon=True).start()
+
+
+def _install_reload_triggers():
+    """Reload on SIGHUP and, with ``PROXY_CONFIG_FILE``, when the file changes."""
+    global _WATCHER_STARTED
+    if hasattr(signal, "SIGHUP") and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGHUP, _on_sighup)
+    if CONFIG_FILE and CONFIG_RELOAD_INTERVAL > 0 and not _WATCHER_STARTED:
+        _WATCHER_STARTED = True
+        threading.Thread(target=_watch_config_file, name="proxy-config-watch", daemon=True).start()
@@ -0,0 +1,147 @@
+import collections
+import contextvars
+import math
+import random
+import threading
+import time
+
+from .config import (
+    RETRY_AFTER_MAX,
+    RETRY_BACKOFF_BASE,
+    RETRY_BACKOFF_MAX,
+    RETRY_BUDGET_MIN,
+    RETRY_BUDGET_RATIO,
+    RETRY_BUDGET_WINDOW,
+)
+from .errors import DeadlineExceededError, UpstreamOverloadedError, _error, _retry_after_seconds
+from .metrics import _incr
+
+# Monotonic time by which the current request's upstream work must finish, or None.
+_DEADLINE = contextvars.ContextVar("proxy_deadline", default=None)
+
+
+def _requested_timeout(value):
+    """Parse a caller timeout in seconds (``X-Request-Timeout``); returns ``(seconds, error_response)``."""
+    if value is None or value == "":
+        return None, None
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        seconds = None
+    if seconds is None or isinstance(value, bool) or not math.isfinite(seconds) or seconds <= 0:
+        return None, _error(
+            "timeout must be a positive number of seconds.",
+            status=400,
+            error_type="invalid_request_error",
+            param="timeout",
+        )
+    return seconds, None
+
+
+def _start_deadline(timeout):
+    """Set (or, with None, clear) the deadline for upstream calls made by the current request."""
+    _DEADLINE.set(time.monotonic() + timeout if timeout is not None else None)
+
+
+def _remaining_time():
+    deadline = _DEADLINE.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def _bind_deadline(function):
+    """Wrap ``function`` so it runs under the current deadline on a pool thread."""
+    deadline = _DEADLINE.get()
+
+    def bound(*args, **kwargs):
+        token = _DEADLINE.set(deadline)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _DEADLINE.reset(token)
+
+    return bound
+
+
+class RetryBudget:
+    """Allows retries up to ``ratio`` of the calls made in the last ``window`` seconds, plus ``minimum``.
+
+    Counts are kept in one-second buckets, so the budget follows the recent
+    call rate: during an upstream incident retries add at most ``ratio`` to
+    the load instead of multiplying it by the per-call retry count.
+    """
+
+    def __init__(self, ratio, minimum, window):
+        self.ratio = ratio
+        self.minimum = minimum
+        self.window = window
+        self.buckets = collections.deque()
+        self.lock = threading.Lock()
+
+    def _bucket_locked(self):
+        second = int(time.monotonic())
+        while self.buckets and self.buckets[0][0] <= second - self.window:
+            self.buckets.popleft()
+        if not self.buckets or self.buckets[-1][0] != second:
+            self.buckets.append([second, 0, 0])
+        return self.buckets[-1]
+
+    def record_call(self):
+        with self.lock:
+            self._bucket_locked()[1] += 1
+
+    def try_spend(self):
+        with self.lock:
+            bucket = self._bucket_locked()
+            calls = sum(entry[1] for entry in self.buckets)
+            retries = sum(entry[2] for entry in self.buckets)
+            if retries >= self.minimum + self.ratio * calls:
+                return False
+            bucket[2] += 1
+            return True
+
+
+_RETRY_BUDGET = RetryBudget(RETRY_BUDGET_RATIO, RETRY_BUDGET_MIN, RETRY_BUDGET_WINDOW)
+
+
+def _retryable(error):
+    if isinstance(error, (UpstreamOverloadedError, DeadlineExceededError)):
+        # Shed by this proxy, or out of time: another attempt cannot help.
+        return False
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    should_retry = headers.get("x-should-retry") if headers else None
+    if should_retry in {"true", "false"}:
+        return should_retry == "true"
+    status = getattr(error, "status_code", None)
+    if status is None:
+        return type(error).__name__ in {"APIConnectionError", "APITimeoutError"}
+    return status in {408, 409, 429} or status >= 500
+
+
+def _retry_delay(error, attempt, max_retries):
+    """Seconds to wait before retry number ``attempt`` of a failed call, or None to give up.
+
+    Backoff is exponential with full jitter; an upstream ``Retry-After`` longer
+    than that is waited out instead. A retry is suppressed when it would end
+    past the caller's deadline or the proxy-wide retry budget is spent.
+    """
+    if attempt > max_retries or not _retryable(error):
+        return None
+    delay = random.uniform(0.0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** (attempt - 1)))
+    retry_after = _retry_after_seconds(error)
+    if retry_after is not None:
+        if retry_after > RETRY_AFTER_MAX:
+            _incr("upstream.retries_suppressed_retry_after")
+            return None
+        delay = max(delay, retry_after)
+    remaining = _remaining_time()
+    if remaining is not None and delay >= remaining:
+        _incr("upstream.retries_suppressed_deadline")
+        return None
+    if not _RETRY_BUDGET.try_spend():
+        _incr("upstream.retries_suppressed_budget")
+        return None
+    _incr("upstream.retries")
+    return delay
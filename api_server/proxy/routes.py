@@ -1,7 +1,13 @@
+from .routes_admin import register_admin_routes
+from .routes_batch import register_batch_routes
 from .routes_chat import register_chat_routes
+from .routes_content import register_content_routes
+from .routes_embeddings import register_embedding_routes
 from .routes_health import register_health_routes
 from .routes_hooks import register_request_hooks
+from .routes_metrics import register_metrics_routes
 from .routes_models import register_model_routes
+from .routes_ws import register_ws_routes
 
 
 def register_routes(app):
@@ -9,3 +15,9 @@ def register_routes(app):
     register_health_routes(app)
     register_model_routes(app)
     register_chat_routes(app)
+    register_embedding_routes(app)
+    register_ws_routes(app)
+    register_batch_routes(app)
+    register_content_routes(app)
+    register_metrics_routes(app)
+    register_admin_routes(app)
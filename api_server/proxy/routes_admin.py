@@ -0,0 +1,90 @@
+from flask import Response, jsonify, request
+
+from .config import PROFILER_DEFAULT_INTERVAL_MS, PROFILER_MAX_SECONDS
+from .errors import _error
+from .keystore import KeyStoreError, _reload_keystore
+from .profiler import ProfilerBusyError, _profile
+from .reload import _reload_config
+from .routes_auth import _authorize_admin_request
+from .shadow import _shadow_report
+from .stream_resume import _stream_resume_stats
+from .streaming import _live_stream_stats
+
+
+def register_admin_routes(app):
+    @app.get("/v1/admin/profile")
+    def profile():
+        _, auth_error = _authorize_admin_request()
+        if auth_error:
+            return auth_error
+        try:
+            seconds = float(request.args.get("seconds", "10"))
+            interval_ms = float(request.args.get("interval_ms", PROFILER_DEFAULT_INTERVAL_MS))
+        except ValueError:
+            return _error("seconds and interval_ms must be numbers.", status=400, error_type="invalid_request_error")
+        if not 0 < seconds <= PROFILER_MAX_SECONDS or interval_ms < 1:
+            return _error(
+                f"seconds must be in (0, {PROFILER_MAX_SECONDS:g}] and interval_ms at least 1.",
+                status=400,
+                error_type="invalid_request_error",
+            )
+        try:
+            profiler = _profile(seconds, interval_ms / 1000.0, request.args.get("header"))
+        except ProfilerBusyError as exc:
+            return _error(str(exc), status=409, error_type="invalid_request_error", code="profiler_busy")
+        if request.args.get("format") == "json":
+            return jsonify(
+                {
+                    "samples": profiler.samples,
+                    "wall_seconds": round(profiler.wall_seconds, 3),
+                    "sampling_overhead": round(profiler.overhead(), 5),
+                    "stacks": dict(profiler.stacks.most_common()),
+                }
+            )
+        return Response(
+            profiler.collapsed(),
+            mimetype="text/plain",
+            headers={
+                "X-Profile-Samples": str(profiler.samples),
+                "X-Profile-Overhead": f"{profiler.overhead():.5f}",
+            },
+        )
+
+    @app.get("/v1/admin/streams")
+    def live_streams():
+        _, auth_error = _authorize_admin_request()
+        if auth_error:
+            return auth_error
+        return jsonify(dict(_live_stream_stats(), resumable=_stream_resume_stats()))
+
+    @app.get("/v1/admin/shadow")
+    def shadow_report():
+        _, auth_error = _authorize_admin_request()
+        if auth_error:
+            return auth_error
+        try:
+            recent = int(request.args.get("recent", "20"))
+        except ValueError:
+            return _error("recent must be an integer.", status=400, error_type="invalid_request_error")
+        return jsonify(_shadow_report(max(recent, 0)))
+
+    @app.post("/v1/admin/keys/reload")
+    def reload_keys():
+        _, auth_error = _authorize_admin_request()
+        if auth_error:
+            return auth_error
+        try:
+            store = _reload_keystore()
+        except KeyStoreError as exc:
+            return _error(str(exc), status=500, error_type="config_error", code="keystore_invalid")
+        return jsonify({"keys": len(store), "source": store.source, "loaded_at": store.loaded_at})
+
+    @app.post("/v1/admin/config/reload")
+    def reload_config():
+        _, auth_error = _authorize_admin_request()
+        if auth_error:
+            return auth_error
+        config = _reload_config("admin")
+        if config is None:
+            return _error("Config reload failed; the current config stays active.", status=500, error_type="config_error")
+        return jsonify({"version": config.version, "loaded_at": config.loaded_at})
@@ -1,7 +1,19 @@
-from flask import request
+import hashlib
 
-from .config import PROXY_API_KEYS, PROXY_REQUIRE_API_KEY
+from flask import g, request
+
+from .config import PROXY_ADMIN_API_KEYS, PROXY_REQUIRE_API_KEY
 from .errors import _error
+from .keystore import KeyStoreError, _admit_request, _digest_set, _key_digest, _keystore
+from .metrics import _incr
+
+_ADMIN_KEY_DIGESTS = _digest_set(PROXY_ADMIN_API_KEYS)
+
+
+def _key_fingerprint(token):
+    if not token:
+        return None
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
 
 
 def _extract_bearer_token():
@@ -11,18 +23,83 @@ def _extract_bearer_token():
     return None
 
 
+def _lookup_key(token):
+    """Return ``(policy, error_response)`` for ``token`` without counting it against any rate limit."""
+    try:
+        store = _keystore()
+    except KeyStoreError:
+        return None, _error(
+            "Proxy API keys could not be loaded.",
+            status=500,
+            error_type="config_error",
+            code="keystore_invalid",
+        )
+    if not len(store):
+        return None, _error(
+            "Proxy API keys are not configured.",
+            status=500,
+            error_type="config_error",
+        )
+    if not token:
+        return None, _error("Missing Authorization header.", status=401, error_type="auth_error")
+    policy = store.lookup(token)
+    if policy is None:
+        return None, _error("Invalid API key.", status=403, error_type="auth_error")
+    return policy, None
+
+
 def _authorize_request(allow_unauthenticated=False):
     token = _extract_bearer_token()
+    g.key_hash = _key_fingerprint(token)
     if not PROXY_REQUIRE_API_KEY or allow_unauthenticated:
         return token, None
-    if not PROXY_API_KEYS:
+    policy, auth_error = _lookup_key(token)
+    if auth_error:
+        return token, auth_error
+    if not _admit_request(policy):
+        _incr("auth.rate_limited")
         return token, _error(
-            "Proxy API keys are not configured.",
-            status=500,
-            error_type="config_error",
+            "Request rate limit for this API key exceeded.",
+            status=429,
+            error_type="rate_limit_error",
+            code="key_rate_limited",
         )
+    g.key_policy = policy
+    return token, None
+
+
+def _enforce_key_policy(payload):
+    """Apply the caller's key policy (allowed models, default params, token caps) to a request body."""
+    policy = g.get("key_policy")
+    if policy is None or not isinstance(payload, dict):
+        return None
+    message = policy.apply(payload)
+    if message is None:
+        return None
+    return _error(message, status=403, error_type="invalid_request_error", code="model_not_allowed", param="model")
+
+
+def _is_admin_key(token):
+    return _key_digest(token) in _ADMIN_KEY_DIGESTS
+
+
+def _authorize_admin_request():
+    """Admin endpoints always require a key from PROXY_ADMIN_API_KEYS, regardless of PROXY_REQUIRE_API_KEY."""
+    token = _extract_bearer_token()
+    if not PROXY_ADMIN_API_KEYS:
+        return token, _error("Admin API is disabled (PROXY_ADMIN_API_KEYS is not set).", status=404, error_type="auth_error")
     if not token:
         return token, _error("Missing Authorization header.", status=401, error_type="auth_error")
-    if token not in PROXY_API_KEYS:
-        return token, _error("Invalid API key.", status=403, error_type="auth_error")
+    if not _is_admin_key(token):
+        return token, _error("Invalid admin API key.", status=403, error_type="auth_error")
     return token, None
+
+
+def _authorize_encoded_body():
+    """Reject a compressed body from a caller without a valid key before any CPU is spent inflating it."""
+    if not PROXY_REQUIRE_API_KEY:
+        return None
+    token = _extract_bearer_token()
+    if token and _is_admin_key(token):
+        return None
+    return _lookup_key(token)[1]
@@ -0,0 +1,235 @@
+import json
+import queue
+import threading
+import time
+import uuid
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Response, g, request, stream_with_context
+
+from .access_log import _access_context, _log_access
+from .client import _get_client, _resolve_upstream_key
+from .config import BATCH_MAX_REQUESTS, BATCH_MAX_WORKERS, BATCH_PER_KEY_CONCURRENCY, PROXY_REQUIRE_API_KEY
+from .content_store import _content_resolver
+from .errors import _error, _stream_error_payload
+from .logger import logger
+from .metrics import _add_gauge, _incr
+from .normalize import _prepare_responses_request, _responses_to_chat_completion, _serialize_model
+from .retries import _bind_deadline
+from .routes_auth import _authorize_request, _key_fingerprint
+from .tokens import ContextLengthError
+from .upstream import _create_response
+
+_BATCH_URLS = {"/v1/chat/completions", "/v1/responses"}
+_JSONL_MIMETYPES = {"application/jsonl", "application/x-ndjson", "application/x-jsonlines", "text/plain"}
+
+_EXECUTOR = None
+# Held only by running batches, so a key's entry goes away once its batches finish.
+_KEY_SEMAPHORES = weakref.WeakValueDictionary()
+_KEY_SEMAPHORES_LOCK = threading.Lock()
+
+
+def _batch_executor():
+    global _EXECUTOR
+    with _KEY_SEMAPHORES_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=max(BATCH_MAX_WORKERS, 1), thread_name_prefix="batch")
+        return _EXECUTOR
+
+
+def _key_semaphore(fingerprint):
+    """Concurrency slots shared by the batches of one API key.
+
+    Without enforced keys the bearer names no one, so each batch call gets
+    its own slots instead of sharing them with every other caller.
+    """
+    if not PROXY_REQUIRE_API_KEY or fingerprint is None:
+        return threading.BoundedSemaphore(max(BATCH_PER_KEY_CONCURRENCY, 1))
+    with _KEY_SEMAPHORES_LOCK:
+        semaphore = _KEY_SEMAPHORES.get(fingerprint)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(max(BATCH_PER_KEY_CONCURRENCY, 1))
+            _KEY_SEMAPHORES[fingerprint] = semaphore
+        return semaphore
+
+
+def _batch_item(index, line):
+    """Coerce one batch entry into ``{"custom_id", "body"}`` or ``{"custom_id", "error"}``."""
+    if not isinstance(line, dict):
+        return {"custom_id": str(index), "error": "Batch entry must be a JSON object."}
+    if "body" not in line:
+        return {"custom_id": str(index), "body": line}
+    custom_id = line.get("custom_id")
+    custom_id = str(custom_id) if custom_id is not None else str(index)
+    method = (line.get("method") or "POST").upper()
+    url = line.get("url") or "/v1/chat/completions"
+    if method != "POST" or url not in _BATCH_URLS:
+        return {"custom_id": custom_id, "error": f"Unsupported batch target {method} {url}."}
+    if not isinstance(line.get("body"), dict):
+        return {"custom_id": custom_id, "error": "Batch entry body must be a JSON object."}
+    return {"custom_id": custom_id, "body": line["body"]}
+
+
+def _parse_jsonl(text):
+    items = []
+    for index, raw in enumerate(text.splitlines()):
+        if not raw.strip():
+            continue
+        try:
+            line = json.loads(raw)
+        except json.JSONDecodeError as exc:
+            items.append({"custom_id": str(index), "error": f"Invalid JSON on line {index + 1}: {exc.msg}."})
+            continue
+        items.append(_batch_item(index, line))
+    return items
+
+
+def _read_batch_items():
+    upload = request.files.get("file")
+    if upload is not None:
+        return _parse_jsonl(upload.read().decode("utf-8"))
+    if request.mimetype in _JSONL_MIMETYPES:
+        return _parse_jsonl(request.get_data(as_text=True))
+    body = request.get_json(silent=True)
+    if isinstance(body, dict):
+        body = body.get("requests")
+    if not isinstance(body, list):
+        return None
+    return [_batch_item(index, line) for index, line in enumerate(body)]
+
+
+def _apply_key_policy(policy, item):
+    if "error" in item:
+        return item
+    message = policy.apply(item["body"])
+    if message is None:
+        return item
+    return {"custom_id": item["custom_id"], "error": message}
+
+
+def _batch_result(custom_id, status_code=None, body=None, error=None):
+    result = {
+        "id": f"batch_req_{uuid.uuid4().hex}",
+        "custom_id": custom_id,
+        "response": None,
+        "error": None,
+    }
+    if error is not None:
+        result["error"] = error
+    else:
+        result["response"] = {
+            "status_code": status_code,
+            "request_id": uuid.uuid4().hex,
+            "body": body,
+        }
+    return result
+
+
+def _run_batch_item(client, item, fingerprint):
+    if "error" in item:
+        return _batch_result(item["custom_id"], error={"code": "invalid_request", "message": item["error"]})
+    try:
+        resolve_content = _content_resolver(fingerprint)
+        payload, return_chat = _prepare_responses_request(item["body"], resolve_content)
+        if resolve_content is not None and resolve_content.missing:
+            error = {
+                "code": "content_ref_missing",
+                "message": "Referenced content is not stored: " + ", ".join(sorted(set(resolve_content.missing))),
+            }
+            return _batch_result(item["custom_id"], error=error)
+        payload.pop("stream", None)
+        response = _create_response(client, payload)
+        body = _responses_to_chat_completion(response) if return_chat else _serialize_model(response)
+        return _batch_result(item["custom_id"], status_code=200, body=body)
+    except ContextLengthError as exc:
+        return _batch_result(item["custom_id"], error={"code": "context_length_exceeded", "message": exc.message})
+    except Exception as exc:  # pragma: no cover - best effort to normalize upstream errors
+        logger.warning("Batch item %s failed: %s", item["custom_id"], exc)
+        body, status = _stream_error_payload(exc)
+        return _batch_result(item["custom_id"], status_code=status, body=body)
+
+
+def _stream_batch(client, items, fingerprint, access):
+    """Submit items under the caller's per-key permit and yield NDJSON lines as they finish."""
+    semaphore = _key_semaphore(fingerprint)
+    executor = _batch_executor()
+    results = queue.Queue()
+    remaining = iter(items)
+    exhausted = False
+    pending = 0
+    completed = 0
+    failed = 0
+    bytes_out = 0
+
+    def on_done(future):
+        semaphore.release()
+        _add_gauge("batch.in_flight", -1)
+        results.put(future)
+
+    try:
+        while not exhausted or pending:
+            permit = False
+            if not exhausted:
+                permit = semaphore.acquire(blocking=pending == 0)
+            if permit:
+                item = next(remaining, None)
+                if item is None:
+                    semaphore.release()
+                    exhausted = True
+                    continue
+                _add_gauge("batch.in_flight", 1)
+                executor.submit(_bind_deadline(_run_batch_item), client, item, fingerprint).add_done_callback(on_done)
+                pending += 1
+                continue
+            future = results.get()
+            pending -= 1
+            result = future.result()
+            completed += 1
+            if result["error"] is not None or result["response"]["status_code"] >= 400:
+                failed += 1
+            line = json.dumps(result) + "\n"
+            bytes_out += len(line)
+            yield line
+    finally:
+        _incr("batch.requests", completed)
+        _incr("batch.failed", failed)
+        logger.info(
+            "batch.complete request_id=%s items=%s completed=%s failed=%s duration_ms=%.2f",
+            access.get("request_id"),
+            len(items),
+            completed,
+            failed,
+            (time.time() - access["start_time"]) * 1000.0,
+        )
+        _log_access(access, 200, bytes_out, stream=True)
+
+
+def register_batch_routes(app):
+    @app.post("/v1/batch/chat/completions")
+    def create_batch_chat_completions():
+        token, auth_error = _authorize_request()
+        if auth_error:
+            return auth_error
+        items = _read_batch_items()
+        if items is None:
+            return _error(
+                "Expected a JSON list, {\"requests\": [...]}, or a JSONL batch input file.",
+                status=400,
+                error_type="invalid_request_error",
+            )
+        if len(items) > BATCH_MAX_REQUESTS:
+            return _error(
+                f"Batch exceeds {BATCH_MAX_REQUESTS} requests.",
+                status=413,
+                error_type="invalid_request_error",
+            )
+        policy = g.get("key_policy")
+        if policy is not None:
+            items = [_apply_key_policy(policy, item) for item in items]
+        try:
+            client = _get_client(_resolve_upstream_key(token))
+        except ValueError as exc:
+            return _error(str(exc), status=500, error_type="config_error")
+        generator = _stream_batch(client, items, _key_fingerprint(token), _access_context())
+        return Response(stream_with_context(generator), mimetype="application/x-ndjson")
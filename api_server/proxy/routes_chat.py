@@ -1,20 +1,189 @@
-import time
-import uuid
+import json
 
 from flask import Response, g, jsonify, request, stream_with_context
 
+from .access_log import _access_context, _log_access
 from .client import _get_client, _resolve_upstream_key
-from .errors import _error, _handle_upstream_error
+from .config import (
+    NONSTREAM_KEEPALIVE_INTERVAL,
+    SSE_HEARTBEAT_INTERVAL,
+    STREAM_RESUME_ENABLED,
+    UPSTREAM_IDLE_TIMEOUT,
+    UPSTREAM_STREAM_ALWAYS,
+    get_config,
+)
+from .content_store import _content_resolver
+from .errors import _error, _handle_upstream_error, _stream_error_payload
+from .fanout import _fan_out, _fan_out_streams, _merge_chat_completions, _requested_n
 from .logger import logger
+from .metrics import _incr
+from .protocols import PROTOCOL_CHAT, _model_protocol
+from .pump import _iter_with_idle
 from .logging_utils import _log_payload
 from .normalize import (
-    _apply_param_rules,
-    _normalize_chat_payload_for_responses,
+    _prepare_chat_request,
+    _prepare_responses_request,
     _responses_to_chat_completion,
     _serialize_model,
 )
-from .routes_auth import _authorize_request
-from .streaming import _safe_stream, _stream_chat_sse, _stream_sse
+from .routes_auth import _authorize_request, _enforce_key_policy, _key_fingerprint
+from .routes_content import _missing_content_error
+from .shadow import _ObservedStream, _sample_shadow
+from .stream_resume import StreamResumeError, _resume_stream, _start_resumable_stream
+from .streaming import _safe_stream, _stream_chat_fanout, _stream_chat_sse, _stream_raw_sse, _stream_sse
+from .timing import _span
+from .tokens import ContextLengthError
+from .tool_args import _tool_schemas_by_name
+from .tools import _respond_with_tools, _stream_with_tools, _tool_registry, _with_server_tools
+from .upstream import _collect_response, _create_chat_completion_raw, _create_response
+
+
+def _sse_response(stream_generator, token):
+    safe_stream = _safe_stream(stream_generator, _access_context())
+    headers = {"Cache-Control": "no-cache"}
+    if STREAM_RESUME_ENABLED:
+        stream_id, safe_stream = _start_resumable_stream(safe_stream, _key_fingerprint(token))
+        if stream_id:
+            headers["X-Stream-ID"] = stream_id
+    return Response(
+        stream_with_context(safe_stream),
+        mimetype="text/event-stream",
+        headers=headers,
+    )
+
+
+def _resume_sse_response(token):
+    try:
+        stream_id, frames = _resume_stream(request.headers.get("Last-Event-ID"), _key_fingerprint(token))
+    except StreamResumeError as exc:
+        return _error(exc.message, status=exc.status, error_type="invalid_request_error", code=exc.code)
+    return Response(
+        stream_with_context(_safe_stream(frames, _access_context())),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Stream-ID": stream_id},
+    )
+
+
+def _completion_body(response, return_chat):
+    with _span("serialize"):
+        if return_chat:
+            return _responses_to_chat_completion(response)
+        return _serialize_model(response)
+
+
+def _keepalive_json(collector, return_chat, access):
+    """Emit whitespace while the upstream stream is running, then the JSON body.
+
+    Leading whitespace is valid JSON, so clients and idle-timeout proxies see
+    bytes flowing. The 200 status is already sent, so a late upstream failure
+    is delivered as an error body.
+    """
+    status = 200
+    bytes_out = 0
+    try:
+        bytes_out += 1
+        yield " "
+        try:
+            while True:
+                try:
+                    next(collector)
+                except StopIteration as stop:
+                    body = json.dumps(_completion_body(stop.value, return_chat))
+                    break
+                _incr("nonstream.keepalives")
+                bytes_out += 1
+                yield " "
+        except Exception as exc:
+            logger.exception("Upstream error while assembling a streamed response.")
+            error_body, status = _stream_error_payload(exc)
+            body = json.dumps(error_body)
+        finally:
+            collector.close()
+        bytes_out += len(body)
+        yield body
+    except GeneratorExit:
+        status = 499
+        logger.info("Client disconnect while assembling a response request_id=%s", access.get("request_id"))
+        raise
+    finally:
+        _log_access(access, status, bytes_out)
+
+
+def _assembled_response(client, payload, return_chat):
+    """Serve a non-streaming request from an upstream event stream.
+
+    Output tokens reach the proxy as they are generated, stalls are caught by
+    ``PROXY_UPSTREAM_IDLE_TIMEOUT`` instead of one long total timeout, and an
+    upstream failure surfaces as soon as it is reported.
+    """
+    events = _iter_with_idle(
+        _create_response(client, payload, stream=True),
+        idle_timeout=UPSTREAM_IDLE_TIMEOUT,
+        tick=NONSTREAM_KEEPALIVE_INTERVAL,
+    )
+    collector = _collect_response(events)
+    try:
+        next(collector)
+    except StopIteration as stop:
+        return jsonify(_completion_body(stop.value, return_chat))
+    return Response(
+        stream_with_context(_keepalive_json(collector, return_chat, _access_context())),
+        mimetype="application/json",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+def _open_stream(client, payload, registry, tick=None):
+    if registry is not None:
+        return _stream_with_tools(client, payload, registry, tick=tick)
+    pair = _sample_shadow(payload)
+    try:
+        events = _iter_with_idle(_create_response(client, payload, stream=True), tick=tick)
+    except Exception as exc:
+        if pair is not None:
+            pair.primary_failed(str(exc))
+        raise
+    return _ObservedStream(events, pair) if pair is not None else events
+
+
+def _respond(client, payload, registry):
+    if registry is not None:
+        return _respond_with_tools(client, payload, registry)
+    pair = _sample_shadow(payload)
+    if pair is None:
+        return _create_response(client, payload)
+    try:
+        response = _create_response(client, payload)
+    except Exception as exc:
+        pair.primary_failed(str(exc))
+        raise
+    pair.primary_response(response)
+    return response
+
+
+def _chat_passthrough(payload, token, resolve_content):
+    """Serve a Chat Completions request from a Chat Completions upstream without translation.
+
+    The upstream body (or each SSE event) is forwarded as received, without
+    building SDK objects or re-encoding JSON.
+    """
+    payload = _prepare_chat_request(payload, resolve_content)
+    if resolve_content is not None and resolve_content.missing:
+        return _missing_content_error(resolve_content.missing)
+    stream = bool(payload.pop("stream", False))
+    try:
+        with _span("client"):
+            client = _get_client(_resolve_upstream_key(token))
+        if stream:
+            frames = _iter_with_idle(
+                _create_chat_completion_raw(client, payload, stream=True), tick=SSE_HEARTBEAT_INTERVAL
+            )
+            return _sse_response(_stream_raw_sse(frames), token)
+        response = _create_chat_completion_raw(client, payload)
+        return Response(response.content, status=response.status_code, mimetype="application/json")
+    except Exception as exc:  # pragma: no cover - best effort to normalize upstream errors
+        logger.exception("Upstream error on /v1/chat/completions.")
+        return _handle_upstream_error(exc)
 
 
 def register_chat_routes(app):
@@ -23,39 +192,78 @@ def register_chat_routes(app):
         token, auth_error = _authorize_request()
         if auth_error:
             return auth_error
-        payload = request.get_json(silent=True)
+        if STREAM_RESUME_ENABLED and request.headers.get("Last-Event-ID"):
+            return _resume_sse_response(token)
+        with _span("parse"):
+            payload = request.get_json(silent=True)
         if payload is None:
             return _error("Invalid or missing JSON body.", status=400, error_type="invalid_request_error")
-        return_chat = isinstance(payload, dict) and "messages" in payload
-        _log_payload("incoming.raw", payload)
-        payload = _normalize_chat_payload_for_responses(payload)
-        _log_payload("incoming.normalized", payload)
-        _log_payload("incoming.input_summary", payload.get("input") if isinstance(payload, dict) else None)
-        payload = _apply_param_rules(payload)
-        _log_payload("incoming.final", payload)
+        g.model = payload.get("model") if isinstance(payload, dict) else None
+        policy_error = _enforce_key_policy(payload)
+        if policy_error:
+            return policy_error
+        resolve_content = _content_resolver(_key_fingerprint(token))
+        if (
+            isinstance(payload, dict)
+            and "messages" in payload
+            and _model_protocol(g.model, token) == PROTOCOL_CHAT
+        ):
+            _incr("protocols.chat_passthrough")
+            return _chat_passthrough(payload, token, resolve_content)
+        n = 1
+        if isinstance(payload, dict) and "messages" in payload:
+            n, n_error = _requested_n(payload)
+            if n_error:
+                return n_error
+        stats = {}
+        try:
+            payload, return_chat = _prepare_responses_request(payload, resolve_content, stats)
+        except ContextLengthError as exc:
+            return _error(
+                exc.message,
+                status=400,
+                error_type="invalid_request_error",
+                code="context_length_exceeded",
+                param="messages",
+            )
+        finally:
+            g.estimated_tokens = stats.get("estimated_tokens")
+        if resolve_content is not None and resolve_content.missing:
+            return _missing_content_error(resolve_content.missing)
         stream = bool(payload.pop("stream", False))
-        from .config import LOG_PAYLOADS
-
-        if LOG_PAYLOADS:
+        registry = _tool_registry()
+        if registry is not None:
+            payload = _with_server_tools(payload, registry)
+        if get_config().log_payloads:
             logger.info("outgoing.stream=%s", stream)
             _log_payload("outgoing.payload", payload)
         try:
-            client = _get_client(_resolve_upstream_key(token))
+            with _span("client"):
+                client = _get_client(_resolve_upstream_key(token))
             if stream:
-                stream_iter = client.responses.create(**payload, stream=True)
-                request_id = getattr(g, "request_id", uuid.uuid4().hex)
-                start_time = getattr(g, "start_time", time.time())
-                stream_generator = _stream_chat_sse(stream_iter) if return_chat else _stream_sse(stream_iter)
-                safe_stream = _safe_stream(stream_generator, request_id, start_time, request.method, request.path)
-                return Response(
-                    stream_with_context(safe_stream),
-                    mimetype="text/event-stream",
-                    headers={"Cache-Control": "no-cache"},
-                )
-            response = client.responses.create(**payload)
-            if return_chat:
-                return jsonify(_responses_to_chat_completion(response))
-            return jsonify(_serialize_model(response))
+                if n > 1:
+                    streams = _fan_out_streams(lambda: _open_stream(client, payload, registry), n)
+                    stream_generator = _stream_chat_fanout(
+                        streams,
+                        _tool_schemas_by_name(payload.get("tools")),
+                        g.get("request_id"),
+                        tick=SSE_HEARTBEAT_INTERVAL,
+                    )
+                    return _sse_response(stream_generator, token)
+                stream_iter = _open_stream(client, payload, registry, tick=SSE_HEARTBEAT_INTERVAL)
+                if return_chat:
+                    stream_generator = _stream_chat_sse(
+                        stream_iter, _tool_schemas_by_name(payload.get("tools")), g.get("request_id")
+                    )
+                else:
+                    stream_generator = _stream_sse(stream_iter)
+                return _sse_response(stream_generator, token)
+            if n > 1:
+                responses = _fan_out(lambda: _respond(client, payload, registry), n)
+                return jsonify(_merge_chat_completions([_completion_body(item, True) for item in responses]))
+            if UPSTREAM_STREAM_ALWAYS and registry is None:
+                return _assembled_response(client, payload, return_chat)
+            return jsonify(_completion_body(_respond(client, payload, registry), return_chat))
         except Exception as exc:  # pragma: no cover - best effort to normalize upstream errors
             logger.exception("Upstream error on /v1/responses.")
             return _handle_upstream_error(exc)
@@ -65,28 +273,17 @@ def register_chat_routes(app):
         token, auth_error = _authorize_request()
         if auth_error:
             return auth_error
-        payload = request.get_json(silent=True)
+        if STREAM_RESUME_ENABLED and request.headers.get("Last-Event-ID"):
+            return _resume_sse_response(token)
+        with _span("parse"):
+            payload = request.get_json(silent=True)
         if payload is None:
             return _error("Invalid or missing JSON body.", status=400, error_type="invalid_request_error")
+        g.model = payload.get("model") if isinstance(payload, dict) else None
+        policy_error = _enforce_key_policy(payload)
+        if policy_error:
+            return policy_error
         if "reasoning_effort" in payload:
             logger.warning("Chat Completions does not support reasoning_effort; ignoring.")
             payload.pop("reasoning_effort", None)
-        payload = _apply_param_rules(payload)
-        stream = bool(payload.pop("stream", False))
-        try:
-            client = _get_client(_resolve_upstream_key(token))
-            if stream:
-                stream_iter = client.chat.completions.create(**payload, stream=True)
-                request_id = getattr(g, "request_id", uuid.uuid4().hex)
-                start_time = getattr(g, "start_time", time.time())
-                safe_stream = _safe_stream(_stream_sse(stream_iter), request_id, start_time, request.method, request.path)
-                return Response(
-                    stream_with_context(safe_stream),
-                    mimetype="text/event-stream",
-                    headers={"Cache-Control": "no-cache"},
-                )
-            response = client.chat.completions.create(**payload)
-            return jsonify(_serialize_model(response))
-        except Exception as exc:  # pragma: no cover - best effort to normalize upstream errors
-            logger.exception("Upstream error on /v1/chat/completions.")
-            return _handle_upstream_error(exc)
+        return _chat_passthrough(payload, token, _content_resolver(_key_fingerprint(token)))
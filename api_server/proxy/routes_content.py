@@ -0,0 +1,98 @@
+from flask import Response, jsonify, request
+
+from .content_store import _CONTENT_STORE, _is_valid_digest
+from .errors import _error, _error_payload
+from .routes_auth import _authorize_request, _key_fingerprint
+
+
+def _missing_content_error(missing):
+    """409 telling the client which referenced bodies must be sent again in full."""
+    payload = _error_payload(
+        "Referenced content is not stored on this proxy; re-send it inline or upload it to /v1/content.",
+        error_type="invalid_request_error",
+        code="content_ref_missing",
+    )
+    payload["error"]["missing"] = sorted(set(missing))
+    return jsonify(payload), 409
+
+
+def _store_disabled_error():
+    return _error(
+        "Content store is disabled (set PROXY_CONTENT_STORE=1).",
+        status=404,
+        error_type="invalid_request_error",
+        code="content_store_disabled",
+    )
+
+
+def _uploaded_contents():
+    if request.mimetype == "application/json":
+        body = request.get_json(silent=True)
+        if isinstance(body, dict) and isinstance(body.get("content"), str):
+            return [body["content"]], False
+        if isinstance(body, dict) and isinstance(body.get("contents"), list):
+            if all(isinstance(item, str) for item in body["contents"]):
+                return body["contents"], True
+        return None, False
+    return [request.get_data(as_text=True)], False
+
+
+def register_content_routes(app):
+    @app.post("/v1/content")
+    @app.put("/v1/content")
+    def upload_content():
+        token, auth_error = _authorize_request()
+        if auth_error:
+            return auth_error
+        if _CONTENT_STORE is None:
+            return _store_disabled_error()
+        contents, many = _uploaded_contents()
+        if contents is None:
+            return _error(
+                "Expected {\"content\": \"...\"}, {\"contents\": [...]}, or a raw text body.",
+                status=400,
+                error_type="invalid_request_error",
+            )
+        namespace = _key_fingerprint(token)
+        if namespace is None:
+            return _error(
+                "Uploading content requires an API key.",
+                status=401,
+                error_type="auth_error",
+            )
+        stored = [
+            {
+                "object": "content",
+                "hash": _CONTENT_STORE.put(namespace, text),
+                "bytes": len(text.encode("utf-8")),
+            }
+            for text in contents
+        ]
+        if many:
+            return jsonify({"object": "list", "data": stored})
+        return jsonify(stored[0])
+
+    @app.post("/v1/content/check")
+    def check_content():
+        token, auth_error = _authorize_request()
+        if auth_error:
+            return auth_error
+        if _CONTENT_STORE is None:
+            return _store_disabled_error()
+        body = request.get_json(silent=True)
+        hashes = body.get("hashes") if isinstance(body, dict) else None
+        if not isinstance(hashes, list):
+            return _error("Expected {\"hashes\": [...]}.", status=400, error_type="invalid_request_error")
+        namespace = _key_fingerprint(token)
+        missing = [digest for digest in hashes if not _CONTENT_STORE.contains(namespace, digest)]
+        return jsonify({"missing": missing})
+
+    @app.route("/v1/content/<digest>", methods=["HEAD"])
+    def head_content(digest):
+        token, auth_error = _authorize_request()
+        if auth_error:
+            return auth_error
+        if _CONTENT_STORE is None or not _is_valid_digest(digest):
+            return Response(status=404)
+        found = _CONTENT_STORE.contains(_key_fingerprint(token), digest)
+        return Response(status=200 if found else 404)
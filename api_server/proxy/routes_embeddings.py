@@ -0,0 +1,100 @@
+import array
+import base64
+import sys
+
+from flask import g, jsonify, request
+
+from .client import _get_client, _resolve_upstream_key
+from .config import get_config
+from .embeddings import _embed_inputs
+from .errors import _error, _handle_upstream_error
+from .logger import logger
+from .routes_auth import _authorize_request, _enforce_key_policy, _key_fingerprint
+from .timing import _span
+
+_ENCODINGS = {"float", "base64"}
+
+
+def _is_token_list(value):
+    return isinstance(value, list) and bool(value) and all(isinstance(token, int) for token in value)
+
+
+def _embedding_inputs(value):
+    """Return the request's inputs as a list, or None when the shape is not supported."""
+    if isinstance(value, str):
+        return [value]
+    if _is_token_list(value):
+        return [value]
+    if isinstance(value, list) and value and all(isinstance(item, str) or _is_token_list(item) for item in value):
+        return value
+    return None
+
+
+def _encode_vector(vector, encoding_format):
+    if encoding_format == "base64":
+        return base64.b64encode(vector).decode("ascii")
+    values = array.array("f", vector)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tolist()
+
+
+def register_embedding_routes(app):
+    @app.post("/v1/embeddings")
+    def create_embeddings():
+        token, auth_error = _authorize_request()
+        if auth_error:
+            return auth_error
+        with _span("parse"):
+            payload = request.get_json(silent=True)
+        if not isinstance(payload, dict):
+            return _error("Invalid or missing JSON body.", status=400, error_type="invalid_request_error")
+        g.model = payload.get("model")
+        if not g.model:
+            return _error("model is required.", status=400, error_type="invalid_request_error", param="model")
+        policy_error = _enforce_key_policy(payload)
+        if policy_error:
+            return policy_error
+        inputs = _embedding_inputs(payload.get("input"))
+        if inputs is None:
+            return _error(
+                "input must be a non-empty string, array of strings, or array of token arrays.",
+                status=400,
+                error_type="invalid_request_error",
+                param="input",
+            )
+        encoding_format = payload.get("encoding_format") or "float"
+        if encoding_format not in _ENCODINGS:
+            return _error(
+                "encoding_format must be float or base64.",
+                status=400,
+                error_type="invalid_request_error",
+                param="encoding_format",
+            )
+        params = {"model": g.model}
+        for name in ("dimensions", "user"):
+            if payload.get(name) is not None:
+                params[name] = payload[name]
+        try:
+            with _span("client"):
+                upstream_key = _resolve_upstream_key(token)
+                client = _get_client(upstream_key)
+            scope = f"{get_config().upstream[0]}|{_key_fingerprint(token)}|{_key_fingerprint(upstream_key)}"
+            with _span("embed"):
+                vectors, prompt_tokens = _embed_inputs(client, params, inputs, scope)
+        except Exception as exc:  # pragma: no cover - best effort to normalize upstream errors
+            logger.exception("Upstream error on /v1/embeddings.")
+            return _handle_upstream_error(exc)
+        with _span("serialize"):
+            data = [
+                {"object": "embedding", "index": index, "embedding": _encode_vector(vector, encoding_format)}
+                for index, vector in enumerate(vectors)
+            ]
+            return jsonify(
+                {
+                    "object": "list",
+                    "data": data,
+                    "model": g.model,
+                    "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+                }
+            )
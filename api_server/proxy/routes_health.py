@@ -1,6 +1,8 @@
 from flask import jsonify
 
 from .config import ALLOW_UNAUTHENTICATED_HEALTH
+from .drain import _is_draining
+from .lifecycle import _is_ready
 from .routes_auth import _authorize_request
 
 
@@ -11,3 +13,11 @@ def register_health_routes(app):
         if auth_error:
             return auth_error
         return jsonify({"status": "ok"})
+
+    @app.get("/v1/ready")
+    def ready():
+        if _is_draining():
+            return jsonify({"status": "draining"}), 503
+        if not _is_ready():
+            return jsonify({"status": "warming_up"}), 503
+        return jsonify({"status": "ready"})
@@ -4,12 +4,21 @@ import uuid
 from flask import g, request
 from werkzeug.exceptions import HTTPException
 
+from .access_log import _access_context, _log_access
+from .compression import RequestBodyError, _compress_response, _decompress_request_body
+from .config import REQUEST_DECOMPRESSION_ENABLED
+from .drain import _drain_exempt, _draining_error, _is_draining, _track_in_flight
 from .errors import _error
 from .logger import logger
-from .logging_utils import _log_request_complete
+from .profiler import _track_request, _untrack_request
+from .retries import _requested_timeout, _start_deadline
+from .routes_auth import _authorize_encoded_body
+from .timing import _current_recorder, _span, _start_timing
 
 
 def register_request_hooks(app):
+    app.wsgi_app = _track_in_flight(app.wsgi_app)
+
     @app.before_request
     def _start_request():
         request_id = request.headers.get("X-Request-ID") or request.headers.get("X-Request-Id")
@@ -17,16 +26,47 @@ def register_request_hooks(app):
             request_id = uuid.uuid4().hex
         g.request_id = request_id
         g.start_time = time.time()
+        _start_timing(request_id)
+        _track_request(request.headers)
+        if _is_draining() and not _drain_exempt(request.path):
+            return _draining_error()
+        timeout, timeout_error = _requested_timeout(
+            request.headers.get("X-Request-Timeout") or request.args.get("timeout")
+        )
+        if timeout_error:
+            return timeout_error
+        _start_deadline(timeout)
+        if REQUEST_DECOMPRESSION_ENABLED:
+            if request.headers.get("Content-Encoding", "").strip().lower() not in {"", "identity"}:
+                # Routes authorize after decoding; check the key first so anonymous bodies are never inflated.
+                auth_error = _authorize_encoded_body()
+                if auth_error:
+                    return auth_error
+            try:
+                with _span("decompress"):
+                    _decompress_request_body(request.environ)
+            except RequestBodyError as exc:
+                return _error(exc.message, status=exc.status, error_type="invalid_request_error")
 
     @app.after_request
     def _finalize_request(response):
         request_id = getattr(g, "request_id", None)
         if request_id:
             response.headers.setdefault("X-Request-ID", request_id)
-        if not response.is_streamed:
-            _log_request_complete(response.status_code, stream=False)
+        if response.is_streamed:
+            return _compress_response(response, request.headers.get("Accept-Encoding"))
+        with _span("compress"):
+            response = _compress_response(response, request.headers.get("Accept-Encoding"))
+        timing = _current_recorder()
+        if timing is not None:
+            response.headers["Server-Timing"] = timing.server_timing()
+        _log_access(_access_context(), response.status_code, response.calculate_content_length())
         return response
 
+    @app.teardown_request
+    def _end_request(exc=None):
+        _untrack_request()
+
     @app.errorhandler(Exception)
     def _handle_exception(error):
         if isinstance(error, HTTPException):
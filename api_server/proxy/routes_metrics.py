@@ -0,0 +1,16 @@
+from flask import jsonify
+
+from .metrics import _metrics_snapshot
+from .routes_auth import _authorize_request
+from .stream_resume import _stream_resume_totals
+
+
+def register_metrics_routes(app):
+    @app.get("/v1/metrics")
+    def metrics():
+        _, auth_error = _authorize_request()
+        if auth_error:
+            return auth_error
+        snapshot = _metrics_snapshot()
+        snapshot["stream_resume"] = _stream_resume_totals()
+        return jsonify(snapshot)
@@ -4,7 +4,9 @@ from .client import _get_client, _resolve_upstream_key
 from .errors import _handle_upstream_error
 from .logger import logger
 from .normalize import _serialize_model
+from .protocols import _update_catalog
 from .routes_auth import _authorize_request
+from .upstream import _list_models
 
 
 def register_model_routes(app):
@@ -15,7 +17,8 @@ def register_model_routes(app):
             return auth_error
         try:
             client = _get_client(_resolve_upstream_key(token))
-            models = client.models.list()
+            models = _list_models(client)
+            _update_catalog(models)
             return jsonify(_serialize_model(models))
         except Exception as exc:  # pragma: no cover - best effort to normalize upstream errors
             logger.exception("Upstream error on /v1/models.")
@@ -0,0 +1,346 @@
+import json
+import queue
+import threading
+import time
+import uuid
+
+from flask import current_app, g
+from flask_sock import Sock
+
+from .access_log import _log_access
+from .client import _get_client, _resolve_upstream_key
+from .config import PROXY_REQUIRE_API_KEY, WS_MAX_STREAMS, WS_PING_INTERVAL, WS_SEND_QUEUE
+from .content_store import _content_resolver
+from .drain import _is_draining
+from .errors import _error, _error_payload, _stream_error_payload
+from .fanout import _requested_n
+from .keystore import _admit_request
+from .logger import logger
+from .metrics import _add_gauge, _incr
+from .normalize import _prepare_chat_request, _prepare_responses_request, _serialize_model
+from .protocols import PROTOCOL_CHAT, _model_protocol
+from .pump import IDLE, Notice, _iter_with_idle
+from .retries import _requested_timeout, _start_deadline
+from .routes_auth import _authorize_request, _enforce_key_policy, _key_fingerprint, _lookup_key
+from .routes_chat import _completion_body, _open_stream, _respond
+from .routes_content import _missing_content_error
+from .streaming import _chat_chunks
+from .tokens import ContextLengthError
+from .tool_args import _tool_schemas_by_name
+from .tools import _tool_registry, _with_server_tools
+from .upstream import _create_chat_completion
+
+_PUT_POLL_SECONDS = 0.5
+_RECEIVE_POLL_SECONDS = 1.0
+# A stream whose upstream has gone quiet still notices a cancel this often.
+_CANCEL_POLL_SECONDS = 0.5
+_CLOSE = object()
+
+
+def _error_message(stream_id, result):
+    response, status = result
+    return dict(response.get_json(), id=stream_id, type="error", status=status)
+
+
+class _Connection:
+    """One authenticated WebSocket carrying many concurrent completions.
+
+    Every stream runs on its own thread and hands encoded messages to a
+    bounded outbox drained by a single sender thread. When the client reads
+    slower than its streams produce, the outbox fills and the stream threads
+    block, which in turn stops them reading upstream.
+    """
+
+    def __init__(self, ws, token, app):
+        self.ws = ws
+        self.token = token
+        self.app = app
+        self.request_id = g.get("request_id")
+        self.policy = g.get("key_policy")
+        self.key_hash = g.get("key_hash")
+        self.outbox = queue.Queue(maxsize=WS_SEND_QUEUE)
+        self.streams = {}
+        self.lock = threading.Lock()
+        self.closed = threading.Event()
+        self.sender = threading.Thread(target=self._send_loop, name="ws-sender", daemon=True)
+        self.sender.start()
+
+    def send(self, message):
+        """Queue ``message`` for the client; returns False once the connection is gone."""
+        data = json.dumps(message)
+        waited = False
+        while not self.closed.is_set():
+            try:
+                self.outbox.put(data, timeout=_PUT_POLL_SECONDS)
+                return True
+            except queue.Full:
+                if not waited:
+                    waited = True
+                    _incr("ws.backpressure_waits")
+        return False
+
+    def _send_loop(self):
+        while True:
+            data = self.outbox.get()
+            if data is _CLOSE:
+                return
+            try:
+                self.ws.send(data)
+            except Exception:
+                self.closed.set()
+                return
+
+    def start(self, stream_id, body, bytes_in, timeout=None):
+        error = None
+        with self.lock:
+            if _is_draining():
+                _incr("drain.requests_rejected")
+                error = _error(
+                    "The proxy is shutting down; open a new connection.",
+                    status=503,
+                    error_type="server_error",
+                    code="server_draining",
+                )
+            elif stream_id in self.streams:
+                error = _error("Stream id is already in use.", status=400, error_type="invalid_request_error")
+            elif len(self.streams) >= WS_MAX_STREAMS:
+                _incr("ws.rejected")
+                error = _error(
+                    f"At most {WS_MAX_STREAMS} concurrent streams per connection.",
+                    status=429,
+                    error_type="rate_limit_error",
+                    code="too_many_streams",
+                )
+            else:
+                cancel = threading.Event()
+                self.streams[stream_id] = cancel
+        if error is not None:
+            return self.send(_error_message(stream_id, error))
+        _incr("ws.requests")
+        threading.Thread(
+            target=self._run, args=(stream_id, body, bytes_in, timeout, cancel), name="ws-stream", daemon=True
+        ).start()
+        return True
+
+    def cancel(self, stream_id):
+        with self.lock:
+            cancel = self.streams.get(stream_id)
+        if cancel is not None:
+            _incr("ws.cancelled")
+            cancel.set()
+
+    def close(self):
+        self.closed.set()
+        with self.lock:
+            for cancel in self.streams.values():
+                cancel.set()
+        try:
+            self.outbox.put_nowait(_CLOSE)
+        except queue.Full:
+            pass
+
+    def _run(self, stream_id, body, bytes_in, timeout, cancel):
+        with self.app.app_context():
+            g.request_id = f"{self.request_id}:{stream_id}"
+            g.key_policy = self.policy
+            g.model = body.get("model") if isinstance(body, dict) else None
+            access = {
+                "request_id": g.request_id,
+                "start_time": time.time(),
+                "method": "WS",
+                "path": "/v1/ws",
+                "key_hash": self.key_hash,
+                "model": g.model,
+                "bytes_in": bytes_in,
+                "timing": None,
+            }
+            status = 200
+            try:
+                status = self._complete(stream_id, body, timeout, cancel, access)
+            except Exception as exc:
+                logger.exception("Upstream error on WebSocket stream %s.", g.request_id)
+                payload, status = _stream_error_payload(exc)
+                self.send(dict(payload, id=stream_id, type="error", status=status))
+            finally:
+                with self.lock:
+                    self.streams.pop(stream_id, None)
+                _log_access(access, status, stream=True)
+
+    def _complete(self, stream_id, body, timeout, cancel, access):
+        """Run one request through the HTTP pipeline and send its result; returns the status."""
+        if not isinstance(body, dict):
+            return self._fail(
+                stream_id, _error("body must be a JSON object.", status=400, error_type="invalid_request_error")
+            )
+        timeout, timeout_error = _requested_timeout(timeout)
+        if timeout_error:
+            return self._fail(stream_id, timeout_error)
+        _start_deadline(timeout)
+        if PROXY_REQUIRE_API_KEY:
+            # The key was checked at the handshake; check it again so a revoked or changed key applies to open sockets.
+            g.key_policy, auth_error = _lookup_key(self.token)
+            if auth_error:
+                return self._fail(stream_id, auth_error)
+        policy = g.get("key_policy")
+        if policy is not None and not _admit_request(policy):
+            _incr("auth.rate_limited")
+            return self._fail(
+                stream_id,
+                _error(
+                    "Request rate limit for this API key exceeded.",
+                    status=429,
+                    error_type="rate_limit_error",
+                    code="key_rate_limited",
+                ),
+            )
+        policy_error = _enforce_key_policy(body)
+        if policy_error:
+            return self._fail(stream_id, policy_error)
+        resolve_content = _content_resolver(_key_fingerprint(self.token))
+        if "messages" in body and _model_protocol(g.model, self.token) == PROTOCOL_CHAT:
+            payload = _prepare_chat_request(body, resolve_content)
+            if resolve_content is not None and resolve_content.missing:
+                return self._fail(stream_id, _missing_content_error(resolve_content.missing))
+            return self._forward_chat(stream_id, payload, cancel)
+        if "messages" in body:
+            n, n_error = _requested_n(body)
+            if n_error:
+                return self._fail(stream_id, n_error)
+            if n > 1:
+                return self._fail(
+                    stream_id,
+                    _error(
+                        "n > 1 is not supported over WebSocket; open one stream per choice.",
+                        status=400,
+                        error_type="invalid_request_error",
+                        param="n",
+                    ),
+                )
+        stats = {}
+        try:
+            payload, return_chat = _prepare_responses_request(body, resolve_content, stats)
+        except ContextLengthError as exc:
+            return self._fail(
+                stream_id,
+                _error(
+                    exc.message,
+                    status=400,
+                    error_type="invalid_request_error",
+                    code="context_length_exceeded",
+                    param="messages",
+                ),
+            )
+        access["estimated_tokens"] = stats.get("estimated_tokens")
+        if resolve_content is not None and resolve_content.missing:
+            return self._fail(stream_id, _missing_content_error(resolve_content.missing))
+        stream = bool(payload.pop("stream", False))
+        registry = _tool_registry()
+        if registry is not None:
+            payload = _with_server_tools(payload, registry)
+        client = _get_client(_resolve_upstream_key(self.token))
+        if not stream:
+            data = _completion_body(_respond(client, payload, registry), return_chat)
+            self.send({"id": stream_id, "type": "response", "data": data})
+            return 200
+        upstream = _open_stream(client, payload, registry, tick=_CANCEL_POLL_SECONDS)
+        events = upstream
+        if return_chat:
+            events = _chat_chunks(upstream, _tool_schemas_by_name(payload.get("tools")), g.request_id)
+        try:
+            for item in events:
+                if cancel.is_set():
+                    return 499
+                if item is IDLE:
+                    continue
+                if isinstance(item, Notice):
+                    message = {"id": stream_id, "type": "progress", "text": str(item)}
+                elif return_chat and "error" in item:
+                    message = dict(item, id=stream_id, type="error", status=400)
+                else:
+                    data = item if return_chat else _serialize_model(item)
+                    message = {"id": stream_id, "type": "chunk", "data": data}
+                if not self.send(message):
+                    return 499
+        finally:
+            events.close()
+            upstream.close()
+        self.send({"id": stream_id, "type": "done"})
+        return 200
+
+    def _forward_chat(self, stream_id, payload, cancel):
+        stream = bool(payload.pop("stream", False))
+        client = _get_client(_resolve_upstream_key(self.token))
+        if not stream:
+            data = _serialize_model(_create_chat_completion(client, payload))
+            self.send({"id": stream_id, "type": "response", "data": data})
+            return 200
+        chunks = _iter_with_idle(_create_chat_completion(client, payload, stream=True), tick=_CANCEL_POLL_SECONDS)
+        try:
+            for chunk in chunks:
+                if cancel.is_set():
+                    return 499
+                if chunk is IDLE:
+                    continue
+                if not self.send({"id": stream_id, "type": "chunk", "data": _serialize_model(chunk)}):
+                    return 499
+        finally:
+            chunks.close()
+        self.send({"id": stream_id, "type": "done"})
+        return 200
+
+    def _fail(self, stream_id, result):
+        message = _error_message(stream_id, result)
+        self.send(message)
+        return message["status"]
+
+
+def _serve_connection(ws, token):
+    connection = _Connection(ws, token, current_app._get_current_object())
+    _add_gauge("ws.connections", 1)
+    try:
+        while not connection.closed.is_set():
+            raw = ws.receive(timeout=_RECEIVE_POLL_SECONDS)
+            if raw is None:
+                # Once draining, close the connection as soon as its last stream ends.
+                if _is_draining() and not connection.streams:
+                    break
+                continue
+            try:
+                message = json.loads(raw)
+            except ValueError:
+                message = None
+            if not isinstance(message, dict):
+                payload = _error_payload("Messages must be JSON objects.", "invalid_request_error")
+                connection.send(dict(payload, type="error", status=400))
+                continue
+            stream_id = str(message.get("id") or uuid.uuid4().hex)
+            kind = message.get("type") or "request"
+            if kind == "cancel":
+                connection.cancel(stream_id)
+            elif kind == "request":
+                connection.start(stream_id, message.get("body"), len(raw), message.get("timeout"))
+            else:
+                connection.send(
+                    dict(
+                        _error_payload(f"Unknown message type {kind!r}.", "invalid_request_error"),
+                        id=stream_id,
+                        type="error",
+                        status=400,
+                    )
+                )
+    finally:
+        connection.close()
+        _add_gauge("ws.connections", -1)
+
+
+def register_ws_routes(app):
+    app.config.setdefault("SOCK_SERVER_OPTIONS", {"ping_interval": WS_PING_INTERVAL or None})
+    sock = Sock(app)
+
+    @sock.route("/v1/ws")
+    def completions_socket(ws):
+        token, auth_error = _authorize_request()
+        if auth_error:
+            ws.send(json.dumps(_error_message(None, auth_error)))
+            return
+        _serve_connection(ws, token)
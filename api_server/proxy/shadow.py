@@ -0,0 +1,298 @@
+import collections
+import datetime
+import difflib
+import queue
+import random
+import threading
+import time
+
+from .config import (
+    SHADOW_API_KEY,
+    SHADOW_BASE_URL,
+    SHADOW_MAX_RECORDS,
+    SHADOW_MODEL,
+    SHADOW_QUEUE_SIZE,
+    SHADOW_SAMPLE_RATE,
+    SHADOW_TIMEOUT,
+    SHADOW_WORKERS,
+)
+from .fields import _field
+from .logger import logger
+from .metrics import _incr, _set_gauge
+from .normalize import _content_to_text, _serialize_model
+from .pump import IDLE
+
+# Outputs are compared on at most this many characters so a long answer cannot stall a worker.
+_DIFF_MAX_CHARS = 8000
+_RECENT = 20
+
+
+class ShadowPair:
+    """One sampled request: the primary's observations, filled on the request path, and the payload to replay."""
+
+    __slots__ = ("payload", "started", "first_at", "completed_at", "response", "error", "done")
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.started = time.monotonic()
+        self.first_at = None
+        self.completed_at = None
+        self.response = None
+        self.error = None
+        self.done = threading.Event()
+
+    def primary_response(self, response):
+        self.completed_at = time.monotonic()
+        self.response = response
+        self.done.set()
+
+    def primary_failed(self, error):
+        self.error = error
+        self.done.set()
+
+
+_QUEUE = queue.Queue(maxsize=max(SHADOW_QUEUE_SIZE, 1))
+_RECORDS = collections.deque(maxlen=max(SHADOW_MAX_RECORDS, 1))
+_COUNTS = collections.Counter()
+_LOCK = threading.Lock()
+_CLIENT = None
+_WORKERS_STARTED = False
+
+
+def _shadow_enabled():
+    return bool(SHADOW_BASE_URL) and bool(SHADOW_API_KEY) and SHADOW_SAMPLE_RATE > 0
+
+
+def _count(name):
+    with _LOCK:
+        _COUNTS[name] += 1
+    _incr(f"shadow.{name}")
+
+
+def _sample_shadow(payload):
+    """Pick this request for mirroring with probability ``PROXY_SHADOW_SAMPLE_RATE``.
+
+    Returns the :class:`ShadowPair` the caller reports the primary result to,
+    or None. Never blocks: when the mirror queue is full the sample is dropped.
+    """
+    if not _shadow_enabled() or random.random() >= SHADOW_SAMPLE_RATE:
+        return None
+    _start_workers()
+    pair = ShadowPair(dict(payload))
+    try:
+        _QUEUE.put_nowait(pair)
+    except queue.Full:
+        _count("dropped")
+        return None
+    _count("sampled")
+    _set_gauge("shadow.queue_depth", _QUEUE.qsize())
+    return pair
+
+
+class _ObservedStream:
+    """Passes a primary event stream through, noting time to first event and the final response.
+
+    The pair is settled when the stream ends, is closed, or is garbage
+    collected, so a stream the caller never iterates cannot leave its shadow
+    worker waiting for ``PROXY_SHADOW_TIMEOUT``.
+    """
+
+    def __init__(self, events, pair):
+        self.events = iter(events)
+        self.pair = pair
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            event = next(self.events)
+        except BaseException:
+            self.close()
+            raise
+        if event is not IDLE:
+            if self.pair.first_at is None:
+                self.pair.first_at = time.monotonic()
+            if _field(event, "type") in {"response.completed", "response.incomplete"}:
+                self.pair.primary_response(_field(event, "response"))
+        return event
+
+    def close(self):
+        if not self.pair.done.is_set():
+            self.pair.primary_failed("stream ended before response.completed")
+        close = getattr(self.events, "close", None)
+        if close is not None:
+            close()
+
+    def __del__(self):
+        self.close()
+
+
+def _start_workers():
+    global _WORKERS_STARTED
+    with _LOCK:
+        if _WORKERS_STARTED:
+            return
+        _WORKERS_STARTED = True
+    for index in range(max(SHADOW_WORKERS, 1)):
+        threading.Thread(target=_worker, name=f"proxy-shadow-{index}", daemon=True).start()
+
+
+def _shadow_client():
+    global _CLIENT
+    if _CLIENT is None:
+        from openai import OpenAI
+
+        _CLIENT = OpenAI(
+            api_key=SHADOW_API_KEY,
+            base_url=SHADOW_BASE_URL,
+            timeout=SHADOW_TIMEOUT,
+            max_retries=0,
+        )
+    return _CLIENT
+
+
+def _worker():
+    while True:
+        pair = _QUEUE.get()
+        _set_gauge("shadow.queue_depth", _QUEUE.qsize())
+        try:
+            _run_pair(pair)
+        except Exception:  # pragma: no cover - a broken pair must not stop the worker
+            logger.exception("Shadow comparison failed.")
+
+
+def _call_shadow(payload):
+    started = time.monotonic()
+    first_at = None
+    response = None
+    stream = _shadow_client().responses.create(**payload, stream=True)
+    try:
+        for event in stream:
+            if first_at is None:
+                first_at = time.monotonic()
+            event_type = _field(event, "type")
+            if event_type in {"response.completed", "response.incomplete"}:
+                response = _field(event, "response")
+            elif event_type in {"response.failed", "error"}:
+                raise RuntimeError(_field(_field(event, "response"), "error") or _field(event, "message"))
+    finally:
+        stream.close()
+    return _side(started, first_at, time.monotonic(), response), response
+
+
+def _side(started, first_at, completed_at, response, error=None):
+    usage = _field(response, "usage")
+    return {
+        "ttft_ms": round((first_at - started) * 1000.0, 1) if first_at is not None else None,
+        "total_ms": round((completed_at - started) * 1000.0, 1) if completed_at is not None else None,
+        "input_tokens": _field(usage, "input_tokens"),
+        "output_tokens": _field(usage, "output_tokens"),
+        "error": error,
+    }
+
+
+def _output_summary(response):
+    texts = []
+    tools = []
+    for item in _field(response, "output") or []:
+        item = _serialize_model(item)
+        if item.get("type") == "message":
+            texts.append(_content_to_text(item.get("content")))
+        elif item.get("type") in {"function_call", "mcp_call"}:
+            tools.append(item.get("name"))
+    return "".join(texts), tools
+
+
+def _compare(primary, shadow):
+    primary_text, primary_tools = _output_summary(primary)
+    shadow_text, shadow_tools = _output_summary(shadow)
+    matcher = difflib.SequenceMatcher(None, primary_text[:_DIFF_MAX_CHARS], shadow_text[:_DIFF_MAX_CHARS])
+    return {
+        "exact": primary_text == shadow_text and primary_tools == shadow_tools,
+        "similarity": round(matcher.ratio(), 4),
+        "primary_chars": len(primary_text),
+        "shadow_chars": len(shadow_text),
+        "tool_calls_match": primary_tools == shadow_tools,
+    }
+
+
+def _run_pair(pair):
+    """Replay one sampled payload against the shadow upstream and record it next to the primary."""
+    payload = dict(pair.payload)
+    if SHADOW_MODEL:
+        payload["model"] = SHADOW_MODEL
+    try:
+        shadow, shadow_response = _call_shadow(payload)
+    except Exception as exc:
+        shadow, shadow_response = _side(0.0, None, None, None, error=str(exc)), None
+    finished = pair.done.wait(SHADOW_TIMEOUT)
+    primary = _side(pair.started, pair.first_at, pair.completed_at, pair.response, error=pair.error)
+    if not finished:
+        primary["error"] = "primary did not finish"
+    record = {
+        "ts": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="milliseconds"),
+        "model": pair.payload.get("model"),
+        "shadow_model": payload.get("model"),
+        "primary": primary,
+        "shadow": shadow,
+        "diff": None,
+    }
+    if primary["error"] is None and shadow["error"] is None:
+        record["diff"] = _compare(pair.response, shadow_response)
+        _count("completed")
+    else:
+        _count("failed")
+    with _LOCK:
+        _RECORDS.append(record)
+
+
+def _percentiles(values):
+    values = sorted(value for value in values if value is not None)
+    if not values:
+        return None
+    return {
+        "p50": values[(len(values) - 1) // 2],
+        "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+        "mean": round(sum(values) / len(values), 1),
+    }
+
+
+def _side_summary(records, side):
+    return {
+        field: _percentiles(record[side][field] for record in records)
+        for field in ("ttft_ms", "total_ms", "input_tokens", "output_tokens")
+    }
+
+
+def _shadow_report(recent=_RECENT):
+    """Summary of the recorded pairs for ``GET /v1/admin/shadow``."""
+    with _LOCK:
+        records = list(_RECORDS)
+        counts = dict(_COUNTS)
+    compared = [record for record in records if record["diff"] is not None]
+    output = None
+    if compared:
+        output = {
+            "exact_match_rate": round(sum(record["diff"]["exact"] for record in compared) / len(compared), 4),
+            "similarity_mean": round(sum(record["diff"]["similarity"] for record in compared) / len(compared), 4),
+            "tool_calls_match_rate": round(
+                sum(record["diff"]["tool_calls_match"] for record in compared) / len(compared), 4
+            ),
+        }
+    return {
+        "enabled": _shadow_enabled(),
+        "sample_rate": SHADOW_SAMPLE_RATE,
+        "base_url": SHADOW_BASE_URL,
+        "shadow_model": SHADOW_MODEL,
+        "sampled": counts.get("sampled", 0),
+        "dropped": counts.get("dropped", 0),
+        "completed": counts.get("completed", 0),
+        "failed": counts.get("failed", 0),
+        "queue_depth": _QUEUE.qsize(),
+        "pairs": len(records),
+        "primary": _side_summary(compared, "primary"),
+        "shadow": _side_summary(compared, "shadow"),
+        "output": output,
+        "recent": records[-recent:] if recent else [],
+    }
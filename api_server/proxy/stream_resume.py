@@ -0,0 +1,281 @@
+import collections
+import itertools
+import json
+import threading
+import time
+import uuid
+
+from .config import (
+    STREAM_RESUME_MAX_BYTES,
+    STREAM_RESUME_MAX_STREAMS,
+    STREAM_RESUME_TTL,
+)
+from .errors import _error_payload
+from .logger import logger
+from .metrics import _add_gauge, _incr
+
+_READER_POLL_SECONDS = 1.0
+
+_LOGS = {}
+_LOGS_LOCK = threading.Lock()
+
+
+class StreamResumeError(Exception):
+    def __init__(self, message, status=404, code="stream_not_found"):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.code = code
+
+
+class _StreamLog:
+    """Bounded, replayable record of the SSE frames produced for one stream."""
+
+    def __init__(self, stream_id, owner, max_bytes):
+        self.stream_id = stream_id
+        self.owner = owner
+        self.max_bytes = max_bytes
+        self.frames = collections.deque()
+        self.first_seq = 1
+        self.next_seq = 1
+        self.size_bytes = 0
+        self.dropped_frames = 0
+        self.done = False
+        self.created_at = time.time()
+        self.finished_at = None
+        # Next event the attached client will read; frames from here on are never evicted.
+        self.reader_seq = None
+        self.cond = threading.Condition()
+
+    def append(self, chunk):
+        """Retain ``chunk`` as the next frame.
+
+        While an attached client is behind the byte cap this blocks until it
+        reads on, so the pump slows to the client instead of dropping frames
+        it has not received.
+        """
+        waited = False
+        with self.cond:
+            before = self.size_bytes
+            self._evict_locked()
+            while self.size_bytes > self.max_bytes and self.reader_seq is not None and self.first_seq >= self.reader_seq:
+                if not waited:
+                    waited = True
+                    _incr("stream_resume.backpressure_waits")
+                self.cond.wait(_READER_POLL_SECONDS)
+                self._evict_locked()
+            frame = f"id: {self.stream_id}:{self.next_seq}\n{chunk}"
+            self.frames.append(frame)
+            self.next_seq += 1
+            self.size_bytes += len(frame)
+            self._evict_locked()
+            delta = self.size_bytes - before
+            self.cond.notify_all()
+        _add_gauge("stream_resume.retained_bytes", delta)
+
+    def _evict_locked(self):
+        limit = self.next_seq if self.reader_seq is None else self.reader_seq
+        while self.size_bytes > self.max_bytes and len(self.frames) > 1 and self.first_seq < limit:
+            self.size_bytes -= len(self.frames.popleft())
+            self.first_seq += 1
+            self.dropped_frames += 1
+
+    def detach(self):
+        with self.cond:
+            self.reader_seq = None
+            self.cond.notify_all()
+
+    def finish(self):
+        with self.cond:
+            self.done = True
+            self.finished_at = time.time()
+            self.cond.notify_all()
+
+    def expired(self, now):
+        return self.finished_at is not None and now - self.finished_at > STREAM_RESUME_TTL
+
+    def read_from(self, after_seq, attached=False):
+        seq = after_seq + 1
+        while True:
+            with self.cond:
+                while seq >= self.next_seq and not self.done:
+                    self.cond.wait(_READER_POLL_SECONDS)
+                evicted = seq < self.first_seq
+                if not evicted:
+                    pending = list(itertools.islice(self.frames, seq - self.first_seq, None))
+                    if attached:
+                        self.reader_seq = seq + len(pending)
+                        self.cond.notify_all()
+                finished = self.done
+            if evicted:
+                _incr("stream_resume.reader_evicted")
+                payload = _error_payload(
+                    "Stream events were evicted before they could be delivered.",
+                    error_type="proxy_error",
+                    code="stream_events_evicted",
+                )
+                yield f"data: {json.dumps(payload)}\n\n"
+                yield "data: [DONE]\n\n"
+                return
+            for frame in pending:
+                yield frame
+            seq += len(pending)
+            if finished and not pending:
+                return
+
+    def stats(self):
+        with self.cond:
+            return {
+                "stream_id": self.stream_id,
+                "retained_bytes": self.size_bytes,
+                "retained_frames": len(self.frames),
+                "dropped_frames": self.dropped_frames,
+                "next_event": self.next_seq,
+                "done": self.done,
+                "age_s": round(time.time() - self.created_at, 3),
+            }
+
+
+class _AttachedReader:
+    """The frames of a log for the client holding its cursor; closing or dropping the reader releases it."""
+
+    def __init__(self, log, after_seq):
+        self.log = log
+        self.frames = log.read_from(after_seq, attached=True)
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.frames)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.frames.close()
+            self.log.detach()
+
+    def __del__(self):
+        self.close()
+
+
+def _discard_log(log):
+    _LOGS.pop(log.stream_id, None)
+    with log.cond:
+        retained = log.size_bytes
+        log.frames.clear()
+        log.size_bytes = 0
+    _add_gauge("stream_resume.retained_bytes", -retained)
+    _add_gauge("stream_resume.streams", -1)
+
+
+def _sweep_expired_locked(now):
+    for log in [log for log in _LOGS.values() if log.expired(now)]:
+        _discard_log(log)
+        _incr("stream_resume.expired")
+
+
+def _register_log(owner):
+    now = time.time()
+    with _LOGS_LOCK:
+        _sweep_expired_locked(now)
+        if len(_LOGS) >= STREAM_RESUME_MAX_STREAMS:
+            finished = [log for log in _LOGS.values() if log.done and log.reader_seq is None]
+            if not finished:
+                _incr("stream_resume.rejected")
+                return None
+            oldest = min(finished, key=lambda log: log.finished_at)
+            _discard_log(oldest)
+            _incr("stream_resume.evicted")
+        log = _StreamLog(uuid.uuid4().hex, owner, STREAM_RESUME_MAX_BYTES)
+        _LOGS[log.stream_id] = log
+    _add_gauge("stream_resume.streams", 1)
+    return log
+
+
+def _pump(log, generator):
+    try:
+        for chunk in generator:
+            log.append(chunk)
+    finally:
+        log.finish()
+        stats = log.stats()
+        logger.info(
+            "stream.retained stream_id=%s frames=%s bytes=%s dropped=%s",
+            stats["stream_id"],
+            stats["retained_frames"],
+            stats["retained_bytes"],
+            stats["dropped_frames"],
+        )
+
+
+def _start_resumable_stream(generator, owner):
+    """Run ``generator`` to completion in the background and return ``(stream_id, frames)``.
+
+    The upstream stream keeps being consumed even if the client disconnects, so a
+    reconnect with ``Last-Event-ID`` can replay from the retained log. Returns
+    ``(None, generator)`` when the registry is full and the stream cannot be retained.
+    """
+    log = _register_log(owner)
+    if log is None:
+        return None, generator
+    log.reader_seq = 1
+    thread = threading.Thread(
+        target=_pump,
+        args=(log, generator),
+        name=f"stream-resume-{log.stream_id[:8]}",
+        daemon=True,
+    )
+    thread.start()
+    return log.stream_id, _AttachedReader(log, 0)
+
+
+def _parse_last_event_id(value):
+    stream_id, sep, seq = (value or "").strip().rpartition(":")
+    if not sep or not stream_id:
+        raise StreamResumeError("Malformed Last-Event-ID header.", status=400, code="invalid_last_event_id")
+    try:
+        return stream_id, int(seq)
+    except ValueError:
+        raise StreamResumeError("Malformed Last-Event-ID header.", status=400, code="invalid_last_event_id")
+
+
+def _resume_stream(last_event_id, owner):
+    stream_id, seq = _parse_last_event_id(last_event_id)
+    with _LOGS_LOCK:
+        _sweep_expired_locked(time.time())
+        log = _LOGS.get(stream_id)
+    if log is None or log.owner != owner:
+        raise StreamResumeError("Stream not found or expired.")
+    with log.cond:
+        if seq + 1 < log.first_seq:
+            raise StreamResumeError(
+                "Requested events are no longer retained for this stream.",
+                status=409,
+                code="stream_events_evicted",
+            )
+        attached = log.reader_seq is None
+        if attached:
+            log.reader_seq = seq + 1
+    _incr("stream_resume.resumed")
+    return stream_id, _AttachedReader(log, seq) if attached else log.read_from(seq)
+
+
+def _stream_resume_stats():
+    """Per-stream detail for ``GET /v1/admin/streams``; stream ids are resume capabilities, so admins only."""
+    with _LOGS_LOCK:
+        logs = list(_LOGS.values())
+    return [log.stats() for log in logs]
+
+
+def _stream_resume_totals():
+    """Aggregate counts for ``/v1/metrics``, without stream ids."""
+    stats = _stream_resume_stats()
+    return {
+        "streams": len(stats),
+        "active": sum(not item["done"] for item in stats),
+        "retained_bytes": sum(item["retained_bytes"] for item in stats),
+        "retained_frames": sum(item["retained_frames"] for item in stats),
+        "dropped_frames": sum(item["dropped_frames"] for item in stats),
+    }
@@ -1,15 +1,38 @@
 import json
+import sys
+import threading
 import time
 import uuid
+import weakref
 
-from .config import LOG_TOOL_CALLS
+from .access_log import _log_access
+from .config import FORWARD_REASONING_SUMMARY, TOOL_ARGS_VALIDATION, get_config
+from .drain import _drain_expired, _stream_finished, _stream_started
 from .logging_utils import _log_stream_event, _log_tool_call
 from .logger import logger
-from .errors import _stream_error_payload
+from .errors import _error_payload, _stream_error_payload
+from .fields import _field
+from .metrics import _incr
 from .normalize import _ensure_json_str, _serialize_model
+from .pump import IDLE, Notice, _merge_iterables
+from .tool_args import ToolArgumentAccumulator, ToolArgumentsError
 
 
-def _chat_completion_chunk(response_id, model, created, delta, finish_reason=None):
+_HEARTBEAT_FRAME = ": keepalive\n\n"
+_COMPLETED = "completed"
+_FAILED = "failed"
+
+
+def _heartbeat():
+    _incr("sse.heartbeats")
+    return _HEARTBEAT_FRAME
+
+
+def _notice_frame(notice):
+    return f": {notice}\n\n"
+
+
+def _chat_completion_chunk(response_id, model, created, delta, finish_reason=None, index=0):
     try:
         created_at = int(created) if created is not None else int(time.time())
     except (TypeError, ValueError):
@@ -21,7 +44,7 @@ def _chat_completion_chunk(response_id, model, created, delta, finish_reason=Non
         "model": model,
         "choices": [
             {
-                "index": 0,
+                "index": index,
                 "delta": delta,
                 "finish_reason": finish_reason,
             }
@@ -29,307 +52,537 @@ def _chat_completion_chunk(response_id, model, created, delta, finish_reason=Non
     }
 
 
-def _stream_chat_sse(event_iter):
-    response_id = None
-    fallback_id = f"chatcmpl-{uuid.uuid4().hex}"
-    model = None
-    created = None
-    call_id_by_output_index = {}
-    name_by_output_index = {}
-    call_index_by_id = {}
-    args_by_call_id = {}
-    name_by_call_id = {}
-    sent_args_by_output_index = set()
-    saw_tool_calls = False
-    saw_text = False
+class _ToolCallState:
+    __slots__ = ("call_id", "name", "index", "arguments", "sent_args")
 
-    for event in event_iter:
-        data = _serialize_model(event)
-        if not isinstance(data, dict):
-            continue
-        event_type = data.get("type")
-
-        if event_type == "response.created":
-            response = data.get("response") or {}
-            if isinstance(response, dict):
-                response_id = response.get("id") or response_id
-                model = response.get("model") or model
-                created = response.get("created") or response.get("created_at") or created
-            continue
+    def __init__(self, call_id, name, index):
+        self.call_id = call_id
+        self.name = name
+        self.index = index
+        self.arguments = None
+        self.sent_args = False
 
-        if event_type == "response.output_item.added":
-            item = data.get("item") or {}
-            output_index = data.get("output_index")
-            if isinstance(item, dict) and item.get("type") in {"function_call", "mcp_call"}:
-                _log_stream_event(
-                    "output_item.added",
-                    {"output_index": output_index, "item": item},
-                )
-                call_id = item.get("call_id") or item.get("id")
-                name = item.get("name")
-                arguments = _ensure_json_str(item.get("arguments"), "")
-                if output_index is not None and call_id:
-                    call_id_by_output_index[output_index] = call_id
-                    name_by_output_index[output_index] = name
-                    if call_id:
-                        name_by_call_id[call_id] = name
-                if call_id:
-                    if call_id not in call_index_by_id:
-                        call_index_by_id[call_id] = len(call_index_by_id)
-                    index = call_index_by_id[call_id]
-                    saw_tool_calls = True
-                    if arguments:
-                        args_by_call_id[call_id] = arguments
-                    chunk = _chat_completion_chunk(
-                        response_id or fallback_id,
-                        model,
-                        created,
-                        {
-                            "tool_calls": [
-                                {
-                                    "index": index,
-                                    "id": call_id,
-                                    "type": "function",
-                                    "function": {
-                                        "name": name,
-                                        "arguments": arguments,
-                                    },
-                                }
-                            ]
-                        },
-                    )
-                    yield f"data: {json.dumps(chunk)}\n\n"
-                    if output_index is not None and arguments:
-                        sent_args_by_output_index.add(output_index)
-            continue
 
-        if event_type == "response.function_call_arguments.delta":
-            output_index = data.get("output_index")
-            delta_args = _ensure_json_str(data.get("delta"), "")
-            _log_stream_event(
-                "function_call_arguments.delta",
-                {"output_index": output_index, "delta": delta_args, "item_id": data.get("item_id")},
-            )
-            call_id = call_id_by_output_index.get(output_index)
-            name = name_by_output_index.get(output_index)
-            if call_id:
-                if call_id not in call_index_by_id:
-                    call_index_by_id[call_id] = len(call_index_by_id)
-                index = call_index_by_id[call_id]
-                saw_tool_calls = True
-                if delta_args:
-                    args_by_call_id[call_id] = args_by_call_id.get(call_id, "") + delta_args
-                chunk = _chat_completion_chunk(
-                    response_id or fallback_id,
-                    model,
-                    created,
-                    {
-                        "tool_calls": [
-                            {
-                                "index": index,
-                                "id": call_id,
-                                "type": "function",
-                                "function": {
-                                    "name": name,
-                                    "arguments": delta_args,
-                                },
-                            }
-                        ]
-                    },
-                )
-                yield f"data: {json.dumps(chunk)}\n\n"
-                if output_index is not None and delta_args:
-                    sent_args_by_output_index.add(output_index)
-            continue
+class _ChatStreamState:
+    """Per-stream translation state for :func:`_stream_chat_sse`.
 
-        if event_type == "response.function_call_arguments.done":
-            output_index = data.get("output_index")
-            done_args = _ensure_json_str(data.get("arguments"), "")
-            _log_stream_event(
-                "function_call_arguments.done",
-                {"output_index": output_index, "arguments": done_args, "item_id": data.get("item_id")},
-            )
-            if output_index in sent_args_by_output_index:
-                continue
-            call_id = call_id_by_output_index.get(output_index)
-            if not call_id:
-                call_id = data.get("item_id")
-            if not call_id:
-                call_id = f"call_{len(call_index_by_id) + 1}"
-            name = name_by_output_index.get(output_index) or data.get("name")
-            if call_id and name:
-                name_by_call_id[call_id] = name
-            if call_id not in call_index_by_id:
-                call_index_by_id[call_id] = len(call_index_by_id)
-            index = call_index_by_id[call_id]
-            saw_tool_calls = True
-            if done_args:
-                args_by_call_id[call_id] = done_args
-            chunk = _chat_completion_chunk(
-                response_id or fallback_id,
-                model,
-                created,
-                {
-                    "tool_calls": [
-                        {
-                            "index": index,
-                            "id": call_id,
-                            "type": "function",
-                            "function": {
-                                "name": name,
-                                "arguments": done_args,
-                            },
-                        }
-                    ]
-                },
-            )
-            yield f"data: {json.dumps(chunk)}\n\n"
-            if output_index is not None and done_args:
-                sent_args_by_output_index.add(output_index)
-            continue
+    Tool-call records are kept only until their ``done`` event has been
+    translated; afterwards just the call's chat ``index`` is remembered.
+    """
 
-        if event_type == "response.mcp_call_arguments.delta":
-            output_index = data.get("output_index")
-            delta_args = _ensure_json_str(data.get("delta"), "")
-            _log_stream_event(
-                "mcp_call_arguments.delta",
-                {"output_index": output_index, "delta": delta_args, "item_id": data.get("item_id")},
-            )
-            call_id = call_id_by_output_index.get(output_index) or data.get("item_id")
-            name = name_by_output_index.get(output_index) or name_by_call_id.get(call_id)
-            if call_id:
-                if call_id not in call_index_by_id:
-                    call_index_by_id[call_id] = len(call_index_by_id)
-                index = call_index_by_id[call_id]
-                saw_tool_calls = True
-                if delta_args:
-                    args_by_call_id[call_id] = args_by_call_id.get(call_id, "") + delta_args
-                chunk = _chat_completion_chunk(
-                    response_id or fallback_id,
-                    model,
-                    created,
+    __slots__ = (
+        "request_id",
+        "choice_index",
+        "raw",
+        "started",
+        "tool_schemas",
+        "response_id",
+        "fallback_id",
+        "model",
+        "created",
+        "calls_by_output_index",
+        "calls_by_id",
+        "done_index_by_id",
+        "call_count",
+        "saw_tool_calls",
+        "saw_text",
+        "events",
+        "bytes_out",
+        "config",
+        "__weakref__",
+    )
+
+    def __init__(self, tool_schemas=None, request_id=None, choice_index=0, raw=False):
+        self.request_id = request_id
+        self.choice_index = choice_index
+        self.raw = raw
+        self.started = time.time()
+        self.tool_schemas = tool_schemas
+        self.response_id = None
+        self.fallback_id = f"chatcmpl-{uuid.uuid4().hex}"
+        self.model = None
+        self.created = None
+        self.calls_by_output_index = {}
+        self.calls_by_id = {}
+        self.done_index_by_id = {}
+        self.call_count = 0
+        self.saw_tool_calls = False
+        self.saw_text = False
+        self.events = 0
+        self.bytes_out = 0
+        # One snapshot per stream: a reload mid-stream does not change how it is logged.
+        self.config = get_config()
+
+    def call(self, call_id, name=None):
+        record = self.calls_by_id.get(call_id)
+        if record is None:
+            index = self.done_index_by_id.get(call_id)
+            if index is None:
+                index = self.call_count
+                self.call_count += 1
+            record = self.calls_by_id[call_id] = _ToolCallState(call_id, name, index)
+        elif name:
+            record.name = name
+        self.saw_tool_calls = True
+        return record
+
+    def finish_call(self, record, output_index=None):
+        """Release a call's accumulated arguments once its ``done`` event is out."""
+        if self.config.log_tool_calls and record.arguments is not None:
+            _log_tool_call(record.name, record.arguments.text(), record.call_id, "responses.stream")
+        self.calls_by_id.pop(record.call_id, None)
+        if output_index is not None and self.calls_by_output_index.get(output_index) is record:
+            del self.calls_by_output_index[output_index]
+        self.done_index_by_id[record.call_id] = record.index
+        record.arguments = None
+
+    def frame(self, delta, finish_reason=None):
+        chunk = _chat_completion_chunk(
+            self.response_id or self.fallback_id,
+            self.model,
+            self.created,
+            delta,
+            finish_reason=finish_reason,
+            index=self.choice_index,
+        )
+        return self.emit(chunk)
+
+    def emit(self, payload):
+        """Encode a chunk or error payload as an SSE frame, or return it as is for ``raw`` states."""
+        if self.raw:
+            return payload
+        text = f"data: {json.dumps(payload)}\n\n"
+        self.bytes_out += len(text)
+        return text
+
+    def tool_call_frame(self, record, arguments):
+        return self.frame(
+            {
+                "tool_calls": [
                     {
-                        "tool_calls": [
-                            {
-                                "index": index,
-                                "id": call_id,
-                                "type": "function",
-                                "function": {
-                                    "name": name,
-                                    "arguments": delta_args,
-                                },
-                            }
-                        ]
-                    },
-                )
-                yield f"data: {json.dumps(chunk)}\n\n"
-                if output_index is not None and delta_args:
-                    sent_args_by_output_index.add(output_index)
-            continue
+                        "index": record.index,
+                        "id": record.call_id,
+                        "type": "function",
+                        "function": {
+                            "name": record.name,
+                            "arguments": arguments,
+                        },
+                    }
+                ]
+            }
+        )
 
-        if event_type == "response.mcp_call_arguments.done":
-            output_index = data.get("output_index")
-            done_args = _ensure_json_str(data.get("arguments"), "")
-            _log_stream_event(
-                "mcp_call_arguments.done",
-                {"output_index": output_index, "arguments": done_args, "item_id": data.get("item_id")},
-            )
-            if output_index in sent_args_by_output_index:
+    def memory_bytes(self):
+        size = sys.getsizeof(self)
+        for mapping in (self.calls_by_output_index, self.calls_by_id, self.done_index_by_id):
+            size += sys.getsizeof(mapping)
+        for record in self.calls_by_id.values():
+            size += sys.getsizeof(record)
+            if record.arguments is not None:
+                size += sys.getsizeof(record.arguments.parts) + record.arguments.length
+        return size
+
+    def stats(self):
+        return {
+            "request_id": self.request_id,
+            "age_seconds": round(time.time() - self.started, 3),
+            "model": self.model,
+            "events": self.events,
+            "bytes_out": self.bytes_out,
+            "open_tool_calls": len(self.calls_by_id),
+            "memory_bytes": self.memory_bytes(),
+        }
+
+
+_LIVE_STREAMS = weakref.WeakSet()
+_LIVE_STREAMS_LOCK = threading.Lock()
+
+
+def _live_stream_stats():
+    with _LIVE_STREAMS_LOCK:
+        states = list(_LIVE_STREAMS)
+    streams = sorted((state.stats() for state in states), key=lambda item: -item["age_seconds"])
+    return {
+        "count": len(streams),
+        "memory_bytes": sum(item["memory_bytes"] for item in streams),
+        "streams": streams,
+    }
+
+
+def _new_tool_arguments(tool_schemas, name):
+    schema = (tool_schemas or {}).get(name)
+    return ToolArgumentAccumulator(schema, validate=TOOL_ARGS_VALIDATION != "off")
+
+
+def _append_tool_arguments(state, record, text):
+    if record.arguments is None:
+        record.arguments = _new_tool_arguments(state.tool_schemas, record.name)
+    try:
+        record.arguments.append(text)
+    except ToolArgumentsError as exc:
+        return exc
+    return None
+
+
+def _finish_tool_arguments(arguments):
+    """Validate completed arguments; returns ``(error, repair_suffix)``."""
+    if arguments is None or TOOL_ARGS_VALIDATION == "off":
+        return None, None
+    already_reported = arguments.error is not None
+    try:
+        arguments.finish()
+    except ToolArgumentsError as exc:
+        if TOOL_ARGS_VALIDATION == "repair":
+            suffix = arguments.repair_suffix()
+            if suffix:
+                arguments.append(suffix)
+                _incr("tool_args.repaired")
+                return None, suffix
+        if already_reported:
+            return None, None
+        return exc, None
+    return None, None
+
+
+def _tool_arguments_failure(state, call_id, name, error):
+    """Log a validation failure; returns the frames that end the stream in ``error`` mode."""
+    _incr("tool_args.invalid")
+    logger.warning(
+        "Invalid tool arguments name=%s call_id=%s offset=%s: %s",
+        name,
+        call_id,
+        error.offset,
+        error.message,
+    )
+    if TOOL_ARGS_VALIDATION != "error":
+        return None
+    payload = _error_payload(
+        f"Invalid arguments for tool {name}: {error.message}",
+        error_type="tool_arguments_error",
+        code="invalid_tool_arguments",
+        param=call_id,
+    )
+    if error.offset is not None:
+        payload["error"]["offset"] = error.offset
+    if state.raw:
+        return [payload]
+    return [state.emit(payload), "data: [DONE]\n\n"]
+
+
+def _tool_arguments_done_frames(state, record, output_index):
+    """Yield repair/error frames for a completed call and release it; returns True when the stream must end."""
+    error, suffix = _finish_tool_arguments(record.arguments)
+    if suffix:
+        yield state.tool_call_frame(record, suffix)
+    state.finish_call(record, output_index)
+    if error is not None:
+        frames = _tool_arguments_failure(state, record.call_id, record.name, error)
+        if frames:
+            yield from frames
+            return True
+    return False
+
+
+def _tool_arguments_delta_frames(state, record, output_index, arguments):
+    """Yield the chunk for an arguments delta; returns True when validation ends the stream."""
+    failure = None
+    if arguments:
+        failure = _append_tool_arguments(state, record, arguments)
+    yield state.tool_call_frame(record, arguments)
+    if output_index is not None and arguments:
+        record.sent_args = True
+    if failure is not None:
+        frames = _tool_arguments_failure(state, record.call_id, record.name, failure)
+        if frames:
+            yield from frames
+            return True
+    return False
+
+
+def _tool_arguments_done_event(state, record, output_index, done_args):
+    """Translate an arguments ``done`` event for a call whose deltas were not forwarded."""
+    if done_args:
+        record.arguments = _new_tool_arguments(state.tool_schemas, record.name)
+        record.arguments.replace(done_args)
+    yield state.tool_call_frame(record, done_args)
+    return (yield from _tool_arguments_done_frames(state, record, output_index))
+
+
+def _close_event_iter(event_iter):
+    close = getattr(event_iter, "close", None)
+    if close is not None:
+        close()
+
+
+def _stream_chat_sse(event_iter, tool_schemas=None, request_id=None):
+    state = _ChatStreamState(tool_schemas, request_id)
+    with _LIVE_STREAMS_LOCK:
+        _LIVE_STREAMS.add(state)
+    try:
+        yield from _translate_chat_events(state, event_iter)
+    finally:
+        _close_event_iter(event_iter)
+        with _LIVE_STREAMS_LOCK:
+            _LIVE_STREAMS.discard(state)
+
+
+def _stream_chat_fanout(streams, tool_schemas=None, request_id=None, tick=None):
+    """Translate several upstream streams for one request into a single chat stream.
+
+    Each stream is read on its own thread and its chunks carry its position
+    in ``streams`` as the choice ``index``; all chunks share one id. The
+    stream ends after every candidate has completed.
+    """
+    response_id = f"chatcmpl-{uuid.uuid4().hex}"
+    states = [_ChatStreamState(tool_schemas, request_id, index) for index in range(len(streams))]
+    for state in states:
+        state.response_id = response_id
+    with _LIVE_STREAMS_LOCK:
+        _LIVE_STREAMS.update(states)
+    running = set(range(len(streams)))
+    merged = _merge_iterables(streams, tick)
+    try:
+        for item in merged:
+            if item is IDLE:
+                yield _heartbeat()
                 continue
-            call_id = call_id_by_output_index.get(output_index) or data.get("item_id")
-            if not call_id:
-                call_id = f"call_{len(call_index_by_id) + 1}"
-            name = name_by_output_index.get(output_index) or name_by_call_id.get(call_id)
-            if call_id and name:
-                name_by_call_id[call_id] = name
-            if call_id not in call_index_by_id:
-                call_index_by_id[call_id] = len(call_index_by_id)
-            index = call_index_by_id[call_id]
-            saw_tool_calls = True
-            if done_args:
-                args_by_call_id[call_id] = done_args
-            chunk = _chat_completion_chunk(
-                response_id or fallback_id,
-                model,
-                created,
-                {
-                    "tool_calls": [
-                        {
-                            "index": index,
-                            "id": call_id,
-                            "type": "function",
-                            "function": {
-                                "name": name,
-                                "arguments": done_args,
-                            },
-                        }
-                    ]
-                },
-            )
-            yield f"data: {json.dumps(chunk)}\n\n"
-            if output_index is not None and done_args:
-                sent_args_by_output_index.add(output_index)
-            continue
+            index, event = item
+            if isinstance(event, Notice):
+                yield _notice_frame(event)
+                continue
+            if index not in running:
+                continue
+            outcome = yield from _translate_chat_event(states[index], event)
+            if outcome is _FAILED:
+                return
+            if outcome is _COMPLETED:
+                running.discard(index)
+                if not running:
+                    break
+        yield "data: [DONE]\n\n"
+    finally:
+        merged.close()
+        with _LIVE_STREAMS_LOCK:
+            for state in states:
+                _LIVE_STREAMS.discard(state)
 
-        if event_type == "response.output_text.delta":
-            text_delta = _ensure_json_str(data.get("delta"), "")
-            if text_delta:
-                saw_text = True
-                chunk = _chat_completion_chunk(
-                    response_id or fallback_id,
-                    model,
-                    created,
-                    {"content": text_delta},
-                )
-                yield f"data: {json.dumps(chunk)}\n\n"
-            continue
 
-        if event_type == "response.output_text.done":
-            if saw_text:
+def _chat_chunks(event_iter, tool_schemas=None, request_id=None):
+    """Translate an upstream Responses stream into chat chunk dicts.
+
+    The dict counterpart of :func:`_stream_chat_sse` for transports that do
+    their own framing: yields chunk dicts and, when tool-argument validation
+    ends the stream, an error payload. :data:`IDLE` and :class:`Notice` items
+    pass through; no ``[DONE]`` marker is produced.
+    """
+    state = _ChatStreamState(tool_schemas, request_id, raw=True)
+    with _LIVE_STREAMS_LOCK:
+        _LIVE_STREAMS.add(state)
+    try:
+        for event in event_iter:
+            if event is IDLE or isinstance(event, Notice):
+                yield event
                 continue
-            text_done = _ensure_json_str(data.get("text"), "")
-            if text_done:
-                saw_text = True
-                chunk = _chat_completion_chunk(
-                    response_id or fallback_id,
-                    model,
-                    created,
-                    {"content": text_done},
-                )
-                yield f"data: {json.dumps(chunk)}\n\n"
-            continue
+            outcome = yield from _translate_chat_event(state, event)
+            if outcome is _FAILED:
+                _close_event_iter(event_iter)
+                return
+            if outcome is _COMPLETED:
+                return
+    finally:
+        with _LIVE_STREAMS_LOCK:
+            _LIVE_STREAMS.discard(state)
 
-        if event_type == "response.completed":
-            finish_reason = "tool_calls" if saw_tool_calls else "stop"
-            if saw_tool_calls and LOG_TOOL_CALLS:
-                for call_id, args in args_by_call_id.items():
-                    name = name_by_call_id.get(call_id)
-                    _log_tool_call(name, args, call_id, "responses.stream")
-            chunk = _chat_completion_chunk(
-                response_id or fallback_id,
-                model,
-                created,
-                {},
-                finish_reason=finish_reason,
-            )
-            yield f"data: {json.dumps(chunk)}\n\n"
+
+def _translate_chat_events(state, event_iter):
+    for event in event_iter:
+        if event is IDLE:
+            yield _heartbeat()
+            continue
+        if isinstance(event, Notice):
+            yield _notice_frame(event)
+            continue
+        outcome = yield from _translate_chat_event(state, event)
+        if outcome is _FAILED:
+            _close_event_iter(event_iter)
+            return
+        if outcome is _COMPLETED:
             break
 
     yield "data: [DONE]\n\n"
 
 
+def _translate_chat_event(state, event):
+    """Yield the chunks for one upstream event.
+
+    Returns ``_COMPLETED`` after the final chunk, ``_FAILED`` once an error
+    frame (and ``[DONE]``) ended the stream, and None otherwise.
+    """
+    event_type = _field(event, "type")
+    if event_type is None:
+        return None
+    state.events += 1
+
+    if event_type == "response.created":
+        response = _field(event, "response")
+        if response is not None:
+            state.response_id = state.response_id or _field(response, "id")
+            state.model = _field(response, "model") or state.model
+            state.created = _field(response, "created") or _field(response, "created_at") or state.created
+        return None
+
+    if event_type == "response.output_item.added":
+        item = _field(event, "item")
+        output_index = _field(event, "output_index")
+        if item is not None and _field(item, "type") in {"function_call", "mcp_call"}:
+            if state.config.log_stream_events:
+                _log_stream_event(
+                    "output_item.added",
+                    {"output_index": output_index, "item": _serialize_model(item)},
+                )
+            call_id = _field(item, "call_id") or _field(item, "id")
+            if call_id:
+                record = state.call(call_id, _field(item, "name"))
+                if output_index is not None:
+                    state.calls_by_output_index[output_index] = record
+                arguments = _ensure_json_str(_field(item, "arguments"), "")
+                if (yield from _tool_arguments_delta_frames(state, record, output_index, arguments)):
+                    return _FAILED
+        return None
+
+    if event_type in {"response.function_call_arguments.delta", "response.mcp_call_arguments.delta"}:
+        output_index = _field(event, "output_index")
+        item_id = _field(event, "item_id")
+        delta_args = _ensure_json_str(_field(event, "delta"), "")
+        _log_stream_event(
+            event_type[len("response."):],
+            {"output_index": output_index, "delta": delta_args, "item_id": item_id},
+        )
+        record = state.calls_by_output_index.get(output_index)
+        if record is None and event_type == "response.mcp_call_arguments.delta" and item_id:
+            record = state.call(item_id)
+            if output_index is not None:
+                state.calls_by_output_index[output_index] = record
+        if record is not None:
+            state.saw_tool_calls = True
+            if (yield from _tool_arguments_delta_frames(state, record, output_index, delta_args)):
+                return _FAILED
+        return None
+
+    if event_type in {"response.function_call_arguments.done", "response.mcp_call_arguments.done"}:
+        output_index = _field(event, "output_index")
+        item_id = _field(event, "item_id")
+        done_args = _ensure_json_str(_field(event, "arguments"), "")
+        _log_stream_event(
+            event_type[len("response."):],
+            {"output_index": output_index, "arguments": done_args, "item_id": item_id},
+        )
+        record = state.calls_by_output_index.get(output_index)
+        if record is None and event_type == "response.mcp_call_arguments.done" and item_id:
+            record = state.calls_by_id.get(item_id)
+        if record is not None and record.sent_args:
+            if (yield from _tool_arguments_done_frames(state, record, output_index)):
+                return _FAILED
+            return None
+        name = _field(event, "name") if event_type == "response.function_call_arguments.done" else None
+        if record is None:
+            record = state.call(item_id or f"call_{state.call_count + 1}", name)
+        elif not record.name:
+            record.name = name
+        state.saw_tool_calls = True
+        if (yield from _tool_arguments_done_event(state, record, output_index, done_args)):
+            return _FAILED
+        return None
+
+    if event_type == "response.output_text.delta":
+        text_delta = _ensure_json_str(_field(event, "delta"), "")
+        if text_delta:
+            state.saw_text = True
+            yield state.frame({"content": text_delta})
+        return None
+
+    if event_type == "response.output_text.done":
+        if state.saw_text:
+            return None
+        text_done = _ensure_json_str(_field(event, "text"), "")
+        if text_done:
+            state.saw_text = True
+            yield state.frame({"content": text_done})
+        return None
+
+    if event_type == "response.reasoning_summary_text.delta":
+        if FORWARD_REASONING_SUMMARY:
+            summary_delta = _ensure_json_str(_field(event, "delta"), "")
+            if summary_delta:
+                yield state.frame({"reasoning_content": summary_delta})
+        return None
+
+    if event_type == "response.completed":
+        for record in list(state.calls_by_id.values()):
+            state.finish_call(record)
+        finish_reason = "tool_calls" if state.saw_tool_calls else "stop"
+        yield state.frame({}, finish_reason=finish_reason)
+        return _COMPLETED
+    return None
+
+
 def _stream_sse(event_iter):
     for event in event_iter:
+        if event is IDLE:
+            yield _heartbeat()
+            continue
+        if isinstance(event, Notice):
+            yield _notice_frame(event)
+            continue
         data = _serialize_model(event)
         yield f"data: {json.dumps(data)}\n\n"
     yield "data: [DONE]\n\n"
 
 
-def _safe_stream(generator, request_id, start_time, method, path):
+def _stream_raw_sse(frames):
+    """Forward upstream SSE blocks unchanged (upstream sends its own ``[DONE]``)."""
+    for frame in frames:
+        if frame is IDLE:
+            yield _heartbeat()
+            continue
+        yield frame
+
+
+def _safe_stream(generator, access):
+    """Turn stream exceptions into SSE error frames and write the access record when the stream ends."""
+    request_id = access.get("request_id")
+    method = access.get("method")
+    path = access.get("path")
     status = 200
+    bytes_out = 0
+    aborted = False
+    _stream_started()
     try:
         for chunk in generator:
+            bytes_out += len(chunk)
             yield chunk
+            if _drain_expired():
+                aborted = True
+                break
+        if aborted:
+            status = 503
+            logger.warning("Stream cut off by drain deadline request_id=%s method=%s path=%s", request_id, method, path)
+            close = getattr(generator, "close", None)
+            if close is not None:
+                close()
+            payload = _error_payload(
+                "The proxy shut down before the stream finished.", "server_error", code="server_draining"
+            )
+            yield f"data: {json.dumps(payload)}\n\n"
+            yield "data: [DONE]\n\n"
+    except GeneratorExit:
+        # The server closes the response when the client goes away mid-stream.
+        status = 499
+        logger.info("Stream client disconnect request_id=%s method=%s path=%s", request_id, method, path)
+        close = getattr(generator, "close", None)
+        if close is not None:
+            close()
+        raise
     except Exception as exc:
         if isinstance(exc, (BrokenPipeError, ConnectionResetError)):
             status = 499
@@ -351,12 +604,5 @@ def _safe_stream(generator, request_id, start_time, method, path):
         yield f"data: {json.dumps(payload)}\n\n"
         yield "data: [DONE]\n\n"
     finally:
-        duration_ms = (time.time() - start_time) * 1000.0 if start_time else 0.0
-        logger.info(
-            "request.complete request_id=%s method=%s path=%s status=%s duration_ms=%.2f stream=True",
-            request_id,
-            method,
-            path,
-            status,
-            duration_ms,
-        )
+        _stream_finished(aborted)
+        _log_access(access, status, bytes_out, stream=True)
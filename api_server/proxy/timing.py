@@ -0,0 +1,214 @@
+import contextlib
+import json
+import os
+import queue
+import threading
+import time
+import urllib.request
+import uuid
+
+from flask import g, has_app_context
+
+from .config import TIMING_ENABLED, TIMING_EXPORT, TIMING_EXPORT_PATH, TIMING_OTLP_ENDPOINT
+from .logger import logger
+from .metrics import _incr
+
+_NULL_SPAN = contextlib.nullcontext()
+_EXPORT_BATCH = 100
+_EXPORT_QUEUE = queue.Queue(maxsize=10000)
+_EXPORTER_LOCK = threading.Lock()
+_EXPORTER_STARTED = False
+
+
+class _SpanRecorder:
+    """Per-request list of ``(name, start_offset_ms, duration_ms)`` stage timings."""
+
+    def __init__(self, request_id):
+        self.request_id = request_id
+        self.start = time.perf_counter()
+        self.start_unix_ns = time.time_ns()
+        self.spans = []
+
+    def add(self, name, start, end):
+        self.spans.append((name, (start - self.start) * 1000.0, (end - start) * 1000.0))
+
+    def mark(self, name):
+        """Record a span from the start of the request until now (e.g. time to first upstream event)."""
+        now = time.perf_counter()
+        self.spans.append((name, 0.0, (now - self.start) * 1000.0))
+
+    def total_ms(self):
+        return (time.perf_counter() - self.start) * 1000.0
+
+    def server_timing(self):
+        parts = [f"{name};dur={duration:.2f}" for name, _, duration in self.spans]
+        parts.append(f"total;dur={self.total_ms():.2f}")
+        return ", ".join(parts)
+
+    def summary(self):
+        parts = [f"{name}={duration:.2f}" for name, _, duration in self.spans]
+        parts.append(f"total={self.total_ms():.2f}")
+        return " ".join(parts)
+
+    def to_record(self, method, path, status):
+        return {
+            "request_id": self.request_id,
+            "method": method,
+            "path": path,
+            "status": status,
+            "start_unix_ns": self.start_unix_ns,
+            "total_ms": round(self.total_ms(), 3),
+            "spans": [
+                {"name": name, "offset_ms": round(offset, 3), "duration_ms": round(duration, 3)}
+                for name, offset, duration in self.spans
+            ],
+        }
+
+
+class _Span:
+    __slots__ = ("recorder", "name", "start")
+
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.recorder.add(self.name, self.start, time.perf_counter())
+        return False
+
+
+def _start_timing(request_id):
+    if TIMING_ENABLED:
+        g.timing = _SpanRecorder(request_id)
+
+
+def _current_recorder():
+    if not TIMING_ENABLED or not has_app_context():
+        return None
+    return g.get("timing")
+
+
+def _span(name):
+    """Time a block as a named stage of the current request; a no-op outside request handling."""
+    recorder = _current_recorder()
+    if recorder is None:
+        return _NULL_SPAN
+    return _Span(recorder, name)
+
+
+def _export_timing(recorder, method, path, status):
+    """Queue a finished request's spans for the background exporter."""
+    if recorder is None or not TIMING_EXPORT:
+        return
+    _ensure_exporter()
+    try:
+        _EXPORT_QUEUE.put_nowait(recorder.to_record(method, path, status))
+    except queue.Full:
+        _incr("timing.export_dropped")
+
+
+def _otlp_payload(records):
+    spans = []
+    for record in records:
+        trace_id = record["request_id"] if _is_hex(record["request_id"], 32) else uuid.uuid4().hex
+        root_id = uuid.uuid4().hex[:16]
+        start_ns = record["start_unix_ns"]
+        attributes = [
+            {"key": "http.method", "value": {"stringValue": record["method"]}},
+            {"key": "http.route", "value": {"stringValue": record["path"]}},
+            {"key": "http.status_code", "value": {"intValue": record["status"]}},
+        ]
+        spans.append(
+            {
+                "traceId": trace_id,
+                "spanId": root_id,
+                "name": f"{record['method']} {record['path']}",
+                "kind": 2,
+                "startTimeUnixNano": str(start_ns),
+                "endTimeUnixNano": str(start_ns + int(record["total_ms"] * 1e6)),
+                "attributes": attributes,
+            }
+        )
+        for span in record["spans"]:
+            span_start = start_ns + int(span["offset_ms"] * 1e6)
+            spans.append(
+                {
+                    "traceId": trace_id,
+                    "spanId": uuid.uuid4().hex[:16],
+                    "parentSpanId": root_id,
+                    "name": span["name"],
+                    "kind": 1,
+                    "startTimeUnixNano": str(span_start),
+                    "endTimeUnixNano": str(span_start + int(span["duration_ms"] * 1e6)),
+                }
+            )
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "openai-proxy"}}]},
+                "scopeSpans": [{"scope": {"name": "proxy.timing"}, "spans": spans}],
+            }
+        ]
+    }
+
+
+def _is_hex(value, length):
+    if not isinstance(value, str) or len(value) != length:
+        return False
+    try:
+        int(value, 16)
+    except ValueError:
+        return False
+    return True
+
+
+def _write_records(records):
+    if TIMING_EXPORT == "otlp":
+        body = json.dumps(_otlp_payload(records)).encode("utf-8")
+        req = urllib.request.Request(
+            TIMING_OTLP_ENDPOINT,
+            data=body,
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(req, timeout=5):
+            pass
+        return
+    directory = os.path.dirname(TIMING_EXPORT_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(TIMING_EXPORT_PATH, "a", encoding="utf-8") as handle:
+        for record in records:
+            handle.write(json.dumps(record) + "\n")
+
+
+def _export_loop():
+    while True:
+        records = [_EXPORT_QUEUE.get()]
+        while len(records) < _EXPORT_BATCH:
+            try:
+                records.append(_EXPORT_QUEUE.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            _write_records(records)
+            _incr("timing.exported", len(records))
+        except Exception as exc:  # pragma: no cover - collector may be down
+            _incr("timing.export_failed", len(records))
+            logger.warning("Failed to export %s timing records: %s", len(records), exc)
+
+
+def _ensure_exporter():
+    global _EXPORTER_STARTED
+    if _EXPORTER_STARTED:
+        return
+    with _EXPORTER_LOCK:
+        if _EXPORTER_STARTED:
+            return
+        _EXPORTER_STARTED = True
+    threading.Thread(target=_export_loop, name="proxy-timing-export", daemon=True).start()
@@ -0,0 +1,287 @@
+import collections
+import hashlib
+import importlib
+import json
+import threading
+
+from .config import (
+    CONTEXT_POLICY,
+    DEFAULT_CONTEXT_WINDOW,
+    MODEL_CONTEXT_WINDOWS,
+    TOKEN_CACHE_SIZE,
+    TOKEN_ESTIMATION_ENABLED,
+    TOKENIZER,
+)
+from .logger import logger
+from .metrics import _incr
+
+_ITEM_OVERHEAD_TOKENS = 4
+_IMAGE_TOKENS = 765
+_MIN_TOOL_OUTPUT_CHARS = 512
+_KEEP_ROLES = {"system", "developer"}
+
+
+class ContextLengthError(Exception):
+    def __init__(self, message, estimated_tokens, limit):
+        super().__init__(message)
+        self.message = message
+        self.estimated_tokens = estimated_tokens
+        self.limit = limit
+
+
+def _heuristic_count(text, model=None):
+    # ~4 characters per token for ASCII text; non-ASCII characters (CJK, emoji) are ~1 token each.
+    chars = len(text)
+    if not chars:
+        return 0
+    non_ascii = 0 if text.isascii() else (len(text.encode("utf-8")) - chars) // 2
+    return (chars - non_ascii + 3) // 4 + non_ascii
+
+
+def _tiktoken_counter():
+    try:
+        import tiktoken
+    except ImportError:
+        logger.warning("PROXY_TOKENIZER=tiktoken but tiktoken is not installed; using the heuristic estimator.")
+        return _heuristic_count
+    encodings = {}
+
+    def count(text, model=None):
+        encoding = encodings.get(model)
+        if encoding is None:
+            try:
+                encoding = tiktoken.encoding_for_model(model or "")
+            except KeyError:
+                encoding = tiktoken.get_encoding("o200k_base")
+            encodings[model] = encoding
+        return len(encoding.encode(text, disallowed_special=()))
+
+    return count
+
+
+def _load_counter(spec):
+    if spec == "heuristic":
+        return _heuristic_count
+    if spec == "tiktoken":
+        return _tiktoken_counter()
+    module_name, _, attr = spec.partition(":")
+    try:
+        return getattr(importlib.import_module(module_name), attr or "count_tokens")
+    except (ImportError, AttributeError) as exc:
+        logger.warning("Failed to load PROXY_TOKENIZER=%s (%s); using the heuristic estimator.", spec, exc)
+        return _heuristic_count
+
+
+_COUNTER = None
+_COUNTER_LOCK = threading.Lock()
+
+
+def _count_text(text, model=None):
+    global _COUNTER
+    if _COUNTER is None:
+        with _COUNTER_LOCK:
+            if _COUNTER is None:
+                _COUNTER = _load_counter(TOKENIZER)
+    return _COUNTER(text, model)
+
+
+class _TokenCache:
+    """LRU of token counts keyed by a digest of the counted text, so resent history is not re-tokenized."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def count(self, text, model=None):
+        if not text:
+            return 0
+        if TOKENIZER == "heuristic":
+            # Hashing costs as much as the heuristic itself; only real tokenizers are cached.
+            return _heuristic_count(text)
+        key = (model, hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest())
+        with self.lock:
+            cached = self.entries.get(key)
+            if cached is not None:
+                self.entries.move_to_end(key)
+                _incr("tokens.cache_hits")
+                return cached
+        tokens = _count_text(text, model)
+        with self.lock:
+            self.entries[key] = tokens
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return tokens
+
+
+_TOKEN_CACHE = _TokenCache(TOKEN_CACHE_SIZE)
+
+
+def _content_texts(content):
+    if content is None:
+        return [], 0
+    if isinstance(content, str):
+        return [content], 0
+    texts = []
+    images = 0
+    for part in content if isinstance(content, list) else [content]:
+        if isinstance(part, str):
+            texts.append(part)
+        elif isinstance(part, dict):
+            if "image" in str(part.get("type") or ""):
+                images += 1
+            text = part.get("text")
+            if isinstance(text, str):
+                texts.append(text)
+    return texts, images
+
+
+def _item_texts(item):
+    if isinstance(item, str):
+        return [item], 0
+    if not isinstance(item, dict):
+        return [json.dumps(item, ensure_ascii=False, default=str)], 0
+    item_type = item.get("type")
+    if item_type == "function_call":
+        return [str(item.get("name") or ""), str(item.get("arguments") or "")], 0
+    if item_type == "function_call_output":
+        output = item.get("output")
+        return [output if isinstance(output, str) else json.dumps(output, ensure_ascii=False)], 0
+    return _content_texts(item.get("content"))
+
+
+def _estimate_item_tokens(item, model=None):
+    texts, images = _item_texts(item)
+    return _ITEM_OVERHEAD_TOKENS + images * _IMAGE_TOKENS + sum(_TOKEN_CACHE.count(text, model) for text in texts)
+
+
+def _estimate_request_tokens(data):
+    """Estimate prompt tokens of a normalized Responses payload; returns ``(total, per_item)``."""
+    model = data.get("model")
+    items = data.get("input")
+    if not isinstance(items, list):
+        items = [items] if items else []
+    per_item = [_estimate_item_tokens(item, model) for item in items]
+    fixed = 0
+    if isinstance(data.get("instructions"), str):
+        fixed += _TOKEN_CACHE.count(data["instructions"], model)
+    if data.get("tools"):
+        fixed += _TOKEN_CACHE.count(json.dumps(data["tools"], ensure_ascii=False, sort_keys=True), model)
+    return fixed + sum(per_item), per_item
+
+
+def _context_window(model):
+    if model in MODEL_CONTEXT_WINDOWS:
+        return MODEL_CONTEXT_WINDOWS[model]
+    best = None
+    for prefix, window in MODEL_CONTEXT_WINDOWS.items():
+        if prefix.endswith("*") and str(model or "").startswith(prefix[:-1]):
+            if best is None or len(prefix) > len(best[0]):
+                best = (prefix, window)
+    return best[1] if best else DEFAULT_CONTEXT_WINDOW
+
+
+def _call_ids(item):
+    if isinstance(item, dict) and item.get("type") in {"function_call", "function_call_output"}:
+        return item.get("call_id")
+    return None
+
+
+def _drop_oldest(items, per_item, excess):
+    """Drop the oldest non-system items (keeping the last one) until ``excess`` tokens are freed.
+
+    A function call and its output are dropped together so the remaining
+    history stays valid for upstream.
+    """
+    dropped = set()
+    freed = 0
+    for index in range(len(items) - 1):
+        if freed >= excess:
+            break
+        item = items[index]
+        if index in dropped or (isinstance(item, dict) and item.get("role") in _KEEP_ROLES):
+            continue
+        group = [index]
+        call_id = _call_ids(item)
+        if call_id:
+            group = [i for i, other in enumerate(items) if _call_ids(other) == call_id]
+        if len(items) - 1 in group:
+            continue
+        for i in group:
+            dropped.add(i)
+            freed += per_item[i]
+    kept = [item for i, item in enumerate(items) if i not in dropped]
+    return kept, len(dropped)
+
+
+def _truncate_tool_outputs(items, model, excess):
+    """Shorten the oldest tool outputs (keeping head and tail) until ``excess`` tokens are freed."""
+    freed = 0
+    changed = 0
+    items = list(items)
+    for index, item in enumerate(items):
+        if freed >= excess:
+            break
+        if not isinstance(item, dict) or item.get("type") != "function_call_output":
+            continue
+        output = item.get("output")
+        if not isinstance(output, str) or len(output) <= _MIN_TOOL_OUTPUT_CHARS:
+            continue
+        before = _TOKEN_CACHE.count(output, model)
+        keep = max(_MIN_TOOL_OUTPUT_CHARS, len(output) - (excess - freed) * 4 - 64)
+        if keep >= len(output):
+            continue
+        head = keep // 2
+        removed = len(output) - keep
+        truncated = (
+            f"{output[:head]}\n[... {removed} characters truncated by proxy ...]\n{output[len(output) - (keep - head):]}"
+        )
+        items[index] = dict(item, output=truncated)
+        freed += before - _TOKEN_CACHE.count(truncated, model)
+        changed += 1
+    return items, changed
+
+
+def _apply_context_policy(data, stats=None):
+    """Estimate prompt tokens and enforce ``PROXY_CONTEXT_POLICY`` on a normalized payload.
+
+    Raises :class:`ContextLengthError` when the request cannot fit. Returns the
+    (possibly trimmed) payload and records the estimate in ``stats``.
+    """
+    if not TOKEN_ESTIMATION_ENABLED and CONTEXT_POLICY == "off":
+        return data
+    total, per_item = _estimate_request_tokens(data)
+    _incr("tokens.estimated_input", total)
+    if stats is not None:
+        stats["estimated_tokens"] = total
+    window = _context_window(data.get("model"))
+    if CONTEXT_POLICY == "off" or not window:
+        return data
+    reserve = data.get("max_output_tokens") or 0
+    limit = window - reserve if isinstance(reserve, int) else window
+    if total <= limit:
+        return data
+    items = data.get("input")
+    trimmed = 0
+    if isinstance(items, list) and CONTEXT_POLICY == "drop_oldest":
+        items, trimmed = _drop_oldest(items, per_item, total - limit)
+    elif isinstance(items, list) and CONTEXT_POLICY == "truncate_tool_outputs":
+        items, trimmed = _truncate_tool_outputs(items, data.get("model"), total - limit)
+    if trimmed:
+        data = dict(data, input=items)
+        total, _ = _estimate_request_tokens(data)
+        _incr("context.trimmed")
+        _incr("context.trimmed_items", trimmed)
+        logger.info("context.trimmed policy=%s items=%s estimated_tokens=%s limit=%s", CONTEXT_POLICY, trimmed, total, limit)
+        if stats is not None:
+            stats["estimated_tokens"] = total
+            stats["trimmed_items"] = trimmed
+    if total > limit:
+        _incr("context.rejected")
+        raise ContextLengthError(
+            f"Estimated {total} input tokens exceed the {limit} tokens available for model "
+            f"{data.get('model')} (context window {window}, max_output_tokens {reserve}).",
+            total,
+            limit,
+        )
+    return data
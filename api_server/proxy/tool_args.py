@@ -0,0 +1,380 @@
+import json
+import re
+
+_STRING_BODY_RE = re.compile(r'[^"\\\x00-\x1f]+')
+_WHITESPACE_RE = re.compile(r"[ \t\r\n]+")
+_TOKEN_RE = re.compile(r"[0-9A-Za-z+\-.]+")
+_NUMBER_RE = re.compile(r"-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?")
+_LITERALS = ("true", "false", "null")
+_ESCAPES = frozenset('"\\/bfnrtu')
+_HEX = frozenset("0123456789abcdefABCDEF")
+
+# Parser expectations between tokens.
+_VALUE = "value"
+_VALUE_OR_CLOSE = "value_or_close"
+_KEY = "key"
+_KEY_OR_CLOSE = "key_or_close"
+_COLON = "colon"
+_COMMA_OR_CLOSE = "comma_or_close"
+_END = "end"
+
+_KIND_BY_CHAR = {"{": "object", "[": "array", '"': "string", "t": "boolean", "f": "boolean", "n": "null"}
+_JSON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "boolean": bool,
+    "null": type(None),
+}
+
+
+class ToolArgumentsError(Exception):
+    def __init__(self, message, offset=None):
+        super().__init__(message)
+        self.message = message
+        self.offset = offset
+
+
+class IncrementalJSONValidator:
+    """Streaming JSON syntax checker.
+
+    Chunks are fed as they arrive; syntax errors are raised at the first bad
+    character instead of after the whole document is received. Long string
+    bodies are skipped with a regex so large file-content arguments stay cheap.
+    ``on_key`` and ``on_value`` are called for members of the top-level object.
+    """
+
+    def __init__(self, on_key=None, on_value=None):
+        self.on_key = on_key
+        self.on_value = on_value
+        self.stack = []
+        self.expect = _VALUE
+        self.in_string = False
+        self.string_is_key = False
+        self.escape = False
+        self.unicode_left = 0
+        self.key_parts = []
+        self.current_key = None
+        self.token = ""
+        self.offset = 0
+
+    def feed(self, chunk):
+        i = 0
+        n = len(chunk)
+        while i < n:
+            if self.in_string:
+                i = self._feed_string(chunk, i, n)
+                continue
+            if self.token:
+                match = _TOKEN_RE.match(chunk, i)
+                if match:
+                    self.token += match.group()
+                    i = match.end()
+                    continue
+                self._finish_token(self.offset + i)
+            match = _WHITESPACE_RE.match(chunk, i)
+            if match:
+                i = match.end()
+                continue
+            self._feed_char(chunk[i], self.offset + i)
+            i += 1
+        self.offset += n
+
+    def close(self):
+        if self.token:
+            self._finish_token(self.offset)
+        if self.expect != _END or self.in_string:
+            raise ToolArgumentsError("Tool arguments ended before the JSON document was complete.", self.offset)
+
+    def _feed_string(self, chunk, i, n):
+        if self.unicode_left:
+            if chunk[i] not in _HEX:
+                raise ToolArgumentsError("Invalid \\u escape in string.", self.offset + i)
+            self.unicode_left -= 1
+            self._key_append(chunk[i])
+            return i + 1
+        if self.escape:
+            char = chunk[i]
+            if char not in _ESCAPES:
+                raise ToolArgumentsError(f"Invalid escape '\\{char}' in string.", self.offset + i)
+            self.escape = False
+            if char == "u":
+                self.unicode_left = 4
+            self._key_append(char)
+            return i + 1
+        match = _STRING_BODY_RE.match(chunk, i)
+        if match:
+            self._key_append(match.group())
+            return match.end()
+        char = chunk[i]
+        if char == '"':
+            self.in_string = False
+            if self.string_is_key:
+                self.current_key = json.loads('"' + "".join(self.key_parts) + '"')
+                self.key_parts = []
+                self.expect = _COLON
+                if self.on_key is not None and len(self.stack) == 1:
+                    self.on_key(self.current_key, self.offset + i)
+            else:
+                self._value_done()
+        elif char == "\\":
+            self.escape = True
+            self._key_append(char)
+        else:
+            raise ToolArgumentsError("Unescaped control character in string.", self.offset + i)
+        return i + 1
+
+    def _key_append(self, text):
+        if self.string_is_key:
+            self.key_parts.append(text)
+
+    def _feed_char(self, char, offset):
+        expect = self.expect
+        if expect == _COLON:
+            if char != ":":
+                raise ToolArgumentsError("Expected ':' after object key.", offset)
+            self.expect = _VALUE
+            return
+        if expect == _COMMA_OR_CLOSE:
+            if char == ",":
+                self.expect = _KEY if self.stack[-1] == "{" else _VALUE
+                return
+            self._close(char, offset)
+            return
+        if expect in (_KEY, _KEY_OR_CLOSE):
+            if char == '"':
+                self.in_string = True
+                self.string_is_key = True
+                return
+            if expect == _KEY_OR_CLOSE:
+                self._close(char, offset)
+                return
+            raise ToolArgumentsError("Expected a string object key.", offset)
+        if expect == _END:
+            raise ToolArgumentsError("Unexpected data after the JSON document.", offset)
+        if expect == _VALUE_OR_CLOSE and char == "]":
+            self._close(char, offset)
+            return
+        self._start_value(char, offset)
+
+    def _start_value(self, char, offset):
+        if self.on_value is not None and len(self.stack) == 1 and self.stack[0] == "{":
+            kind = _KIND_BY_CHAR.get(char) or ("number" if char == "-" or char.isdigit() else None)
+            if kind is not None:
+                self.on_value(self.current_key, kind, offset)
+        if char == "{":
+            self.stack.append("{")
+            self.expect = _KEY_OR_CLOSE
+        elif char == "[":
+            self.stack.append("[")
+            self.expect = _VALUE_OR_CLOSE
+        elif char == '"':
+            self.in_string = True
+            self.string_is_key = False
+        elif char == "-" or char.isalnum():
+            self.token = char
+        else:
+            raise ToolArgumentsError(f"Unexpected character {char!r}.", offset)
+
+    def _close(self, char, offset):
+        expected = "}" if self.stack and self.stack[-1] == "{" else "]"
+        if not self.stack or char != expected:
+            raise ToolArgumentsError(f"Unexpected character {char!r}.", offset)
+        self.stack.pop()
+        self._value_done()
+
+    def _finish_token(self, offset):
+        token = self.token
+        self.token = ""
+        if token not in _LITERALS and not _NUMBER_RE.fullmatch(token):
+            raise ToolArgumentsError(f"Invalid JSON value {token[:20]!r}.", offset - len(token))
+        self._value_done()
+
+    def _value_done(self):
+        self.expect = _COMMA_OR_CLOSE if self.stack else _END
+
+    def repair_suffix(self):
+        """Return the text that completes a truncated document, or ``None`` if it cannot be completed."""
+        suffix = []
+        expect = self.expect
+        if self.in_string:
+            if self.escape:
+                suffix.append("\\")
+            suffix.append("0" * self.unicode_left)
+            suffix.append('"')
+            expect = _COLON if self.string_is_key else (_COMMA_OR_CLOSE if self.stack else _END)
+        elif self.token:
+            token = self.token
+            completion = None
+            for literal in _LITERALS:
+                if literal.startswith(token):
+                    completion = literal[len(token):]
+                    break
+            if completion is None:
+                completion = "0" if token[-1] in "-+.eE" else ""
+                if not _NUMBER_RE.fullmatch(token + completion):
+                    return None
+            suffix.append(completion)
+            expect = _COMMA_OR_CLOSE if self.stack else _END
+        if expect == _COLON:
+            suffix.append(": null")
+        elif expect == _VALUE and self.stack:
+            suffix.append("null")
+        elif expect in (_KEY, _VALUE):
+            # A dangling object comma (or an empty document) cannot be completed without inventing a key.
+            return None
+        for container in reversed(self.stack):
+            suffix.append("}" if container == "{" else "]")
+        return "".join(suffix)
+
+
+def _schema_type_matches(value, expected):
+    if expected == "integer":
+        return isinstance(value, int) and not isinstance(value, bool)
+    if expected == "number":
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    python_type = _JSON_TYPES.get(expected)
+    if python_type is None:
+        return True
+    return isinstance(value, python_type)
+
+
+def _validate_schema(value, schema, path="$"):
+    """Check ``value`` against the common JSON Schema subset used by tool definitions."""
+    if not isinstance(schema, dict) or not schema:
+        return None
+    expected = schema.get("type")
+    if expected is not None:
+        types = expected if isinstance(expected, list) else [expected]
+        if not any(_schema_type_matches(value, item) for item in types):
+            return f"{path} should be of type {'/'.join(types)}."
+    enum = schema.get("enum")
+    if isinstance(enum, list) and value not in enum:
+        return f"{path} should be one of {enum}."
+    if isinstance(value, dict):
+        properties = schema.get("properties") or {}
+        for key in schema.get("required") or []:
+            if key not in value:
+                return f"{path} is missing required property '{key}'."
+        for key, item in value.items():
+            if key in properties:
+                error = _validate_schema(item, properties[key], f"{path}.{key}")
+                if error:
+                    return error
+            elif schema.get("additionalProperties") is False:
+                return f"{path} has unexpected property '{key}'."
+    elif isinstance(value, list) and isinstance(schema.get("items"), dict):
+        for index, item in enumerate(value):
+            error = _validate_schema(item, schema["items"], f"{path}[{index}]")
+            if error:
+                return error
+    return None
+
+
+def _tool_schemas_by_name(tools):
+    schemas = {}
+    for tool in tools or []:
+        if not isinstance(tool, dict) or not tool.get("name"):
+            continue
+        schema = tool.get("parameters") if tool.get("type", "function") == "function" else tool.get("input_schema")
+        if isinstance(schema, dict) and schema:
+            schemas[tool["name"]] = schema
+    return schemas
+
+
+class ToolArgumentAccumulator:
+    """Collects streamed tool-call arguments without quadratic string concatenation.
+
+    When a schema and validation are enabled, the arguments are checked as they
+    stream: syntax errors, unknown top-level properties and top-level type
+    mismatches raise :class:`ToolArgumentsError` on the delta that introduces them.
+    """
+
+    def __init__(self, schema=None, validate=False):
+        self.parts = []
+        self.length = 0
+        self.schema = schema if isinstance(schema, dict) else None
+        self.error = None
+        self.validator = None
+        if validate:
+            self.validator = IncrementalJSONValidator(on_key=self._check_key, on_value=self._check_value)
+
+    def append(self, delta):
+        if not delta:
+            return
+        self.parts.append(delta)
+        self.length += len(delta)
+        if self.validator is not None and self.error is None:
+            try:
+                self.validator.feed(delta)
+            except ToolArgumentsError as exc:
+                self._fail(exc)
+
+    def replace(self, text):
+        self.parts = [text] if text else []
+        self.length = len(text or "")
+        self.error = None
+        if self.validator is not None:
+            self.validator = IncrementalJSONValidator(on_key=self._check_key, on_value=self._check_value)
+            try:
+                self.validator.feed(text or "")
+            except ToolArgumentsError as exc:
+                self._fail(exc)
+
+    def text(self):
+        if len(self.parts) > 1:
+            self.parts = ["".join(self.parts)]
+        return self.parts[0] if self.parts else ""
+
+    def finish(self):
+        """Validate the complete document; returns the parsed arguments."""
+        if self.error is not None:
+            raise self.error
+        if self.validator is not None:
+            try:
+                self.validator.close()
+            except ToolArgumentsError as exc:
+                self._fail(exc)
+        text = self.text()
+        try:
+            value = json.loads(text) if text else {}
+        except json.JSONDecodeError as exc:
+            self._fail(ToolArgumentsError(f"Tool arguments are not valid JSON: {exc.msg}.", exc.pos))
+        error = _validate_schema(value, self.schema)
+        if error:
+            self._fail(ToolArgumentsError(error))
+        return value
+
+    def _fail(self, error):
+        # Report the first problem only; later deltas are still accumulated.
+        self.error = error
+        raise error
+
+    def repair_suffix(self):
+        # After a schema error the streaming validator stopped being fed, so re-parse the full text.
+        if self.validator is None or self.error is not None:
+            validator = IncrementalJSONValidator()
+            try:
+                validator.feed(self.text())
+            except ToolArgumentsError:
+                return None
+            return validator.repair_suffix()
+        return self.validator.repair_suffix()
+
+    def _check_key(self, key, offset):
+        schema = self.schema
+        if not schema or schema.get("additionalProperties") is not False:
+            return
+        if key not in (schema.get("properties") or {}):
+            raise ToolArgumentsError(f"$ has unexpected property '{key}'.", offset)
+
+    def _check_value(self, key, kind, offset):
+        properties = (self.schema or {}).get("properties") or {}
+        expected = (properties.get(key) or {}).get("type") if isinstance(properties.get(key), dict) else None
+        if expected is None:
+            return
+        types = expected if isinstance(expected, list) else [expected]
+        if kind == "number" and ("number" in types or "integer" in types):
+            return
+        if kind not in types:
+            raise ToolArgumentsError(f"$.{key} should be of type {'/'.join(types)}.", offset)
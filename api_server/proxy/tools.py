@@ -0,0 +1,422 @@
+import importlib
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+from .config import ENABLE_TOOL_EXECUTION, TOOL_MAX_ROUNDS, TOOL_MAX_WORKERS, TOOL_MODULE, TOOL_TIMEOUT
+from .fields import _field
+from .logger import logger
+from .metrics import _add_gauge, _incr
+from .normalize import _content_to_text, _ensure_json_str, _serialize_model
+from .pump import IDLE, Notice, _iter_with_idle
+from .upstream import _create_response
+
+
+class ToolRegistry:
+    """Server-owned tools loaded from ``PROXY_TOOL_MODULE``.
+
+    The module may define ``TOOLS``, a dict of name to callable (called with
+    the parsed arguments as keywords) or to ``{"function", "description",
+    "parameters", "timeout"}``, and/or ``execute_tool(name, arguments)`` with
+    the tools it serves listed as function definitions in ``TOOL_DEFINITIONS``.
+    """
+
+    def __init__(self, module):
+        self.functions = {}
+        self.timeouts = {}
+        self.definitions = []
+        fallback = getattr(module, "execute_tool", None)
+        for definition in getattr(module, "TOOL_DEFINITIONS", None) or []:
+            name = definition.get("name") or (definition.get("function") or {}).get("name")
+            if name and fallback is not None:
+                self.functions[name] = lambda arguments, name=name: fallback(name, arguments)
+                self.definitions.append(definition)
+        for name, spec in (getattr(module, "TOOLS", None) or {}).items():
+            if callable(spec):
+                spec = {"function": spec}
+            function = spec["function"]
+            self.functions[name] = lambda arguments, function=function: function(**arguments)
+            if spec.get("timeout") is not None:
+                self.timeouts[name] = float(spec["timeout"])
+            if spec.get("parameters") is not None:
+                self.definitions.append(
+                    {
+                        "type": "function",
+                        "name": name,
+                        "description": spec.get("description") or "",
+                        "parameters": spec["parameters"],
+                    }
+                )
+
+    def owns(self, name):
+        return name in self.functions
+
+    def timeout(self, name):
+        return self.timeouts.get(name, TOOL_TIMEOUT)
+
+    def execute(self, name, arguments):
+        _add_gauge("tools.running", 1)
+        try:
+            return self.functions[name](arguments)
+        finally:
+            _add_gauge("tools.running", -1)
+
+
+_REGISTRY = None
+_REGISTRY_LOADED = False
+_REGISTRY_LOCK = threading.Lock()
+_TOOL_SLOTS = threading.BoundedSemaphore(TOOL_MAX_WORKERS)
+
+
+class _ToolRun:
+    """One tool call on its own daemon thread, holding one of ``PROXY_TOOL_MAX_WORKERS`` slots while it runs.
+
+    An abandoned call (one past its timeout) hands its slot back at once, so a
+    hung tool never holds up later calls; its thread is left to finish alone.
+    """
+
+    def __init__(self, registry, name, arguments):
+        self.future = Future()
+        self.lock = threading.Lock()
+        self.holding = False
+        self.abandoned = False
+        thread = threading.Thread(
+            target=self._run, args=(registry, name, arguments), name=f"proxy-tool-{name}", daemon=True
+        )
+        thread.start()
+
+    def _run(self, registry, name, arguments):
+        _TOOL_SLOTS.acquire()
+        with self.lock:
+            if self.abandoned:
+                _TOOL_SLOTS.release()
+                return
+            self.holding = True
+        try:
+            result = registry.execute(name, arguments)
+        except Exception as exc:
+            self.future.set_exception(exc)
+        else:
+            self.future.set_result(result)
+        finally:
+            self._release()
+
+    def _release(self):
+        with self.lock:
+            if self.holding:
+                self.holding = False
+                _TOOL_SLOTS.release()
+
+    def abandon(self):
+        with self.lock:
+            self.abandoned = True
+        self._release()
+
+
+def _tool_registry():
+    """Return the registry, or None when tool execution is off or the module fails to load."""
+    global _REGISTRY, _REGISTRY_LOADED
+    if not ENABLE_TOOL_EXECUTION:
+        return None
+    if not _REGISTRY_LOADED:
+        with _REGISTRY_LOCK:
+            if not _REGISTRY_LOADED:
+                try:
+                    _REGISTRY = ToolRegistry(importlib.import_module(TOOL_MODULE))
+                    logger.info("Loaded %s server-side tools from %s.", len(_REGISTRY.functions), TOOL_MODULE)
+                except Exception as exc:
+                    _incr("tools.registry_failed")
+                    logger.error("Failed to load tool module %s, tool execution disabled: %s", TOOL_MODULE, exc)
+                _REGISTRY_LOADED = True
+    return _REGISTRY
+
+
+def _with_server_tools(payload, registry):
+    """Add the registry's tool definitions to ``tools``; a client tool with the same name wins."""
+    if not registry.definitions:
+        return payload
+    tools = list(payload.get("tools") or [])
+    declared = {tool.get("name") for tool in tools if isinstance(tool, dict)}
+    tools.extend(definition for definition in registry.definitions if definition.get("name") not in declared)
+    return dict(payload, tools=tools)
+
+
+def _server_calls(response, registry):
+    """Return the response's function calls when every one is server-owned, else None."""
+    calls = []
+    for item in _field(response, "output") or []:
+        if _field(item, "type") in {"function_call", "mcp_call"}:
+            if _field(item, "type") != "function_call" or not registry.owns(_field(item, "name")):
+                return None
+            calls.append(item)
+    return calls or None
+
+
+def _tool_output(future, name):
+    try:
+        output = future.result(timeout=0)
+    except Exception as exc:
+        _incr("tools.failed")
+        logger.warning("Tool %s failed: %s", name, exc)
+        return {"error": f"{type(exc).__name__}: {exc}"}, "error"
+    return output, "ok"
+
+
+def _run_tool_calls(calls, registry, tick=None):
+    """Run ``calls`` concurrently on the tool pool.
+
+    A generator: yields a :class:`Notice` as each call finishes (and
+    :data:`IDLE` every ``tick`` seconds while none does) and returns the
+    ``function_call_output`` items in call order. A call still running after
+    its timeout, which counts from submission, is reported to the model as
+    timed out and gives up its slot (see :class:`_ToolRun`).
+    """
+    submitted = time.monotonic()
+    pending = {}
+    outputs = {}
+    for call in calls:
+        call_id = _field(call, "call_id")
+        name = _field(call, "name")
+        _incr("tools.calls")
+        try:
+            arguments = json.loads(_field(call, "arguments") or "{}")
+        except ValueError as exc:
+            outputs[call_id] = {"error": f"Invalid JSON arguments: {exc}"}
+            continue
+        run = _ToolRun(registry, name, arguments)
+        pending[run.future] = (call_id, name, submitted + registry.timeout(name), run)
+    yield Notice(f"tool_calls running={len(pending)}")
+    while pending:
+        now = time.monotonic()
+        timeout = min(deadline for _, _, deadline, _ in pending.values()) - now
+        if tick:
+            timeout = min(timeout, tick)
+        done, _ = wait(pending, timeout=max(timeout, 0), return_when=FIRST_COMPLETED)
+        now = time.monotonic()
+        for future in list(pending):
+            call_id, name, deadline, run = pending[future]
+            if future in done:
+                outputs[call_id], status = _tool_output(future, name)
+            elif now >= deadline:
+                run.abandon()
+                _incr("tools.timeouts")
+                logger.warning("Tool %s timed out after %.3gs.", name, registry.timeout(name))
+                outputs[call_id], status = {"error": f"Tool {name} timed out."}, "timeout"
+            else:
+                continue
+            del pending[future]
+            yield Notice(
+                f"tool_call name={name} call_id={call_id} status={status} "
+                f"duration_ms={int((now - submitted) * 1000)}"
+            )
+        if not done and pending and tick:
+            yield IDLE
+    return [
+        {
+            "type": "function_call_output",
+            "call_id": _field(call, "call_id"),
+            "output": _ensure_json_str(outputs[_field(call, "call_id")]),
+        }
+        for call in calls
+    ]
+
+
+def _next_round_payload(payload, response, results):
+    """Append the round's assistant output and the tool results to ``input``."""
+    items = payload.get("input")
+    if isinstance(items, str):
+        items = [{"role": "user", "content": items}]
+    items = list(items or [])
+    for item in _field(response, "output") or []:
+        item = _serialize_model(item)
+        if item.get("type") == "function_call":
+            items.append(
+                {
+                    "type": "function_call",
+                    "call_id": item.get("call_id"),
+                    "name": item.get("name"),
+                    "arguments": _ensure_json_str(item.get("arguments"), "{}"),
+                }
+            )
+        elif item.get("type") == "message":
+            text = _content_to_text(item.get("content"))
+            if text:
+                items.append({"role": "assistant", "content": text})
+    items.extend(results)
+    return dict(payload, input=items)
+
+
+def _finish_rounds(calls):
+    if calls is not None:
+        _incr("tools.max_rounds")
+        logger.warning("Tool loop stopped after %s rounds; returning the pending calls to the client.", TOOL_MAX_ROUNDS)
+
+
+def _sum_usage(usages):
+    total = {}
+    for usage in usages:
+        for key, value in (usage or {}).items():
+            if isinstance(value, dict):
+                total[key] = _sum_usage([total.get(key), value])
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                total[key] = total.get(key, 0) + value
+    return total or None
+
+
+def _merged_response(response_id, rounds):
+    """The response the client sees for a multi-round tool loop.
+
+    ``rounds`` holds ``(response, shown_items)`` per round. The result is the
+    last round's response under the first round's id, with the shown output of
+    every round and usage summed over all of them.
+    """
+    merged = dict(_serialize_model(rounds[-1][0]))
+    merged["id"] = response_id
+    merged["output"] = [_serialize_model(item) for _, items in rounds for item in items]
+    merged["usage"] = _sum_usage(_serialize_model(_field(response, "usage")) for response, _ in rounds)
+    return merged
+
+
+def _drain(generator):
+    while True:
+        try:
+            next(generator)
+        except StopIteration as stop:
+            return stop.value
+
+
+def _respond_with_tools(client, payload, registry):
+    """Non-streaming tool loop: call upstream until it answers or asks for a tool the server does not own.
+
+    After several rounds the client gets one response holding the output of
+    every round, without the server-owned calls, and the usage of all of them.
+    """
+    rounds = []
+    for round_number in range(1, TOOL_MAX_ROUNDS + 1):
+        response = _create_response(client, payload)
+        calls = _server_calls(response, registry)
+        if calls is None or round_number == TOOL_MAX_ROUNDS:
+            _finish_rounds(calls)
+            if not rounds:
+                return response
+            rounds.append((response, _field(response, "output") or []))
+            return _merged_response(_field(rounds[0][0], "id"), rounds)
+        output = _field(response, "output") or []
+        rounds.append((response, [item for item in output if _field(item, "type") != "function_call"]))
+        _incr("tools.rounds")
+        results = _drain(_run_tool_calls(calls, registry))
+        payload = _next_round_payload(payload, response, results)
+
+
+def _stream_with_tools(client, payload, registry, tick=None):
+    """Streaming tool loop: one Responses event stream spanning every round.
+
+    The first round is opened before returning so an upstream error still
+    becomes an HTTP error. Events for server-owned calls are held back; when
+    the round ends the calls run and the next round starts, so the client
+    sees the text of every round, tool progress comments, and the final
+    ``response.completed``. If a round also asks for a client tool, the held
+    events are released and the stream ends there as usual.
+    """
+    events = _iter_with_idle(_create_response(client, payload, stream=True), tick=tick)
+    return _tool_rounds(client, payload, registry, tick, events)
+
+
+class _RoundNumbering:
+    """Keeps ``output_index`` and ``sequence_number`` continuous across the rounds of one stream.
+
+    Output indexes are handed out in the order items reach the client, so
+    held-back server calls leave no gaps. Events that already carry the
+    right numbers are passed through as they are.
+    """
+
+    def __init__(self):
+        self.indexes = {}
+        self.next_index = 0
+        self.next_sequence = 0
+
+    def start_round(self):
+        self.indexes = {}
+
+    def apply(self, event, **fields):
+        output_index = _field(event, "output_index")
+        if output_index is not None:
+            index = self.indexes.get(output_index)
+            if index is None:
+                index = self.indexes[output_index] = self.next_index
+                self.next_index += 1
+            fields["output_index"] = index
+        if _field(event, "sequence_number") is not None:
+            fields["sequence_number"] = self.next_sequence
+            self.next_sequence += 1
+        if all(_field(event, name) == value for name, value in fields.items()):
+            return event
+        return dict(_serialize_model(event), **fields)
+
+
+def _tool_rounds(client, payload, registry, tick, events):
+    numbering = _RoundNumbering()
+    response_id = None
+    rounds = []
+    for round_number in range(1, TOOL_MAX_ROUNDS + 1):
+        if round_number > 1:
+            events = _iter_with_idle(_create_response(client, payload, stream=True), tick=tick)
+        numbering.start_round()
+        held = []
+        held_indexes = set()
+        shown = []
+        completed = None
+        try:
+            for event in events:
+                if event is IDLE:
+                    yield IDLE
+                    continue
+                event_type = _field(event, "type")
+                if event_type == "response.created" and response_id is None:
+                    response_id = _field(_field(event, "response"), "id")
+                if event_type in {"response.created", "response.in_progress"} and round_number > 1:
+                    continue
+                output_index = _field(event, "output_index")
+                if event_type == "response.output_item.added":
+                    item = _field(event, "item")
+                    if _field(item, "type") == "function_call" and registry.owns(_field(item, "name")):
+                        held_indexes.add(output_index)
+                if output_index is not None and output_index in held_indexes:
+                    held.append(event)
+                    continue
+                if event_type == "response.completed":
+                    completed = event
+                    break
+                if event_type == "response.output_item.done":
+                    shown.append(_field(event, "item"))
+                if round_number > 1 and _field(event, "response") is not None:
+                    # response.incomplete / response.failed of a later round: report it under the stream's id.
+                    renamed = dict(_serialize_model(_field(event, "response")), id=response_id)
+                    yield numbering.apply(event, response=renamed)
+                    continue
+                yield numbering.apply(event)
+        finally:
+            close = getattr(events, "close", None)
+            if close is not None:
+                close()
+        if completed is None:
+            return
+        response = _field(completed, "response")
+        calls = _server_calls(response, registry)
+        if calls is None or round_number == TOOL_MAX_ROUNDS:
+            _finish_rounds(calls)
+            for event in held:
+                if _field(event, "type") == "response.output_item.done":
+                    shown.append(_field(event, "item"))
+                yield numbering.apply(event)
+            if round_number == 1:
+                yield numbering.apply(completed)
+            else:
+                rounds.append((response, shown))
+                yield numbering.apply(completed, response=_merged_response(response_id, rounds))
+            return
+        rounds.append((response, shown))
+        _incr("tools.rounds")
+        results = yield from _run_tool_calls(calls, registry, tick)
+        payload = _next_round_payload(payload, response, results)
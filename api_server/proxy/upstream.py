@@ -0,0 +1,225 @@
+import time
+
+from .config import get_config
+from .errors import DeadlineExceededError, UpstreamStreamError
+from .fields import _field
+from .limiter import _acquire_upstream_permit
+from .logger import logger
+from .metrics import _incr
+from .pump import IDLE
+from .retries import _RETRY_BUDGET, _remaining_time, _retry_delay
+from .timing import _current_recorder, _span
+
+# Added to the output token count when scoring a call, so the fixed prompt-processing time of
+# a short answer does not look like a slow upstream.
+_SCORE_BASE_TOKENS = 50
+# Events after which an upstream Responses stream sends nothing the proxy waits for.
+_TERMINAL_EVENTS = frozenset({"response.completed", "response.incomplete", "response.failed", "error"})
+
+
+class _LimitedStream:
+    """Upstream event iterator that holds a limiter permit until it is exhausted or closed."""
+
+    def __init__(self, stream, permit):
+        self.permit = permit
+        self.stream = stream
+        self.iterator = iter(stream)
+        self.first_event = True
+        # Captured here because the stream may be drained outside the request context.
+        self.timing = _current_recorder()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            event = next(self.iterator)
+        except StopIteration:
+            self.close()
+            raise
+        except Exception as exc:
+            self.permit.release(exc)
+            raise
+        if self.first_event:
+            self.first_event = False
+            self.permit.observe(kind="ttft")
+            if self.timing is not None:
+                self.timing.mark("first_event")
+        if _field(event, "type") in _TERMINAL_EVENTS:
+            # Translators stop reading here, so do not hold the slot until the iterator is collected.
+            self.permit.release()
+        return event
+
+    def close(self):
+        self.permit.release()
+        close = getattr(self.stream, "close", None)
+        if close is not None:
+            close()
+
+    def __del__(self):
+        self.permit.release()
+
+
+class _RawSSE:
+    """Upstream SSE body as complete ``data: ...\n\n`` blocks, without decoding the JSON inside."""
+
+    def __init__(self, http_response):
+        self.http_response = http_response
+
+    def __iter__(self):
+        lines = []
+        for line in self.http_response.iter_lines():
+            if line:
+                lines.append(line)
+            elif lines:
+                yield "\n".join(lines) + "\n\n"
+                lines = []
+        if lines:
+            yield "\n".join(lines) + "\n\n"
+
+    def close(self):
+        self.http_response.close()
+
+
+def _create_response(client, payload, stream=False):
+    """Call ``client.responses.create`` under the adaptive upstream limiter."""
+    return _limited_call(client.responses.create, payload, stream)
+
+
+def _create_chat_completion(client, payload, stream=False):
+    return _limited_call(client.chat.completions.create, payload, stream)
+
+
+def _create_embeddings(client, payload):
+    return _limited_call(client.embeddings.create, payload, False)
+
+
+def _create_chat_completion_raw(client, payload, stream=False):
+    """Chat Completions call that skips SDK parsing.
+
+    Returns the raw API response (``.content``, ``.status_code``) or, when
+    streaming, an iterator of raw SSE event blocks (see :class:`_RawSSE`).
+    """
+    return _limited_call(client.chat.completions.with_raw_response.create, payload, stream, raw=True)
+
+
+def _limited_call(create, payload, stream, raw=False):
+    _RETRY_BUDGET.record_call()
+    return _with_retries(lambda: _limited_attempt(create, payload, stream, raw))
+
+
+def _limited_attempt(create, payload, stream, raw):
+    with _span("queue"):
+        permit = _acquire_upstream_permit()
+    try:
+        options = _deadline_options()
+    except DeadlineExceededError:
+        # Released without the error: running out of the caller's time says nothing about upstream load.
+        permit.release()
+        raise
+    started = time.monotonic()
+    try:
+        with _span("upstream"):
+            if stream:
+                events = create(**payload, stream=True, **options)
+                if raw:
+                    events = _RawSSE(events.http_response)
+                return _LimitedStream(events, permit)
+            response = create(**payload, **options)
+    except Exception as exc:
+        permit.release(exc)
+        raise
+    _observe_response(permit, response, started)
+    permit.release()
+    return response
+
+
+def _output_tokens(response):
+    usage = _field(response, "usage")
+    return _field(usage, "output_tokens") or _field(usage, "completion_tokens")
+
+
+def _observe_response(permit, response, started):
+    """Score a non-streaming call on latency per output token, so long answers do not read as overload."""
+    tokens = _output_tokens(response)
+    if tokens is not None:
+        permit.observe((time.monotonic() - started) / (tokens + _SCORE_BASE_TOKENS), kind="per_output_token")
+
+
+def _deadline_options():
+    """SDK call options with a ``timeout`` bounded by the caller's deadline; raises once it has passed."""
+    remaining = _remaining_time()
+    if remaining is None:
+        return {}
+    if remaining <= 0:
+        _incr("upstream.deadline_exceeded")
+        raise DeadlineExceededError()
+    return {"timeout": min(remaining, get_config().upstream[1])}
+
+
+def _with_retries(attempt):
+    """Call ``attempt()`` and retry failures under the caller's deadline and the retry budget.
+
+    Only opening a call is retried; a stream that fails after its first event
+    is not. Upstream clients are built with ``max_retries=0``, so
+    ``OPENAI_MAX_RETRIES`` caps the retries made here.
+    """
+    max_retries = get_config().upstream[2]
+    retries = 0
+    while True:
+        try:
+            return attempt()
+        except Exception as exc:
+            remaining = _remaining_time()
+            if remaining is not None and remaining <= 0 and type(exc).__name__ == "APITimeoutError":
+                _incr("upstream.deadline_exceeded")
+                raise DeadlineExceededError() from exc
+            retries += 1
+            delay = _retry_delay(exc, retries, max_retries)
+            if delay is None:
+                raise
+            logger.info(
+                "upstream.retry attempt=%s delay_ms=%.0f status=%s error=%s",
+                retries,
+                delay * 1000.0,
+                getattr(exc, "status_code", None),
+                type(exc).__name__,
+            )
+            time.sleep(delay)
+
+
+def _list_models(client):
+    return _with_retries(lambda: client.models.list(**_deadline_options()))
+
+
+def _collect_response(event_iter):
+    """Assemble the final response object from an upstream Responses event stream.
+
+    A generator: passes :data:`IDLE` ticks through to the caller and returns the
+    response carried by ``response.completed`` (or ``response.incomplete``).
+    ``response.failed`` and ``error`` events raise :class:`UpstreamStreamError`
+    as soon as they arrive instead of after the whole output has been generated.
+    """
+    for event in event_iter:
+        if event is IDLE:
+            yield IDLE
+            continue
+        event_type = _field(event, "type")
+        if event_type in {"response.completed", "response.incomplete"}:
+            _incr("upstream.stream_assembled")
+            return _field(event, "response")
+        if event_type == "response.failed":
+            error = _field(_field(event, "response"), "error")
+            raise UpstreamStreamError(
+                _field(error, "message") or "Upstream response failed.",
+                code=_field(error, "code") or "upstream_response_failed",
+            )
+        if event_type == "error":
+            raise UpstreamStreamError(
+                _field(event, "message") or "Upstream stream error.",
+                code=_field(event, "code") or "upstream_stream_error",
+            )
+    raise UpstreamStreamError(
+        "Upstream stream ended before the response completed.",
+        code="upstream_incomplete_stream",
+    )